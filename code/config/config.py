@@ -13,43 +13,69 @@ RESULTS_FILE = "results.csv"
 RESULTS_FILEPATH = RESULTS_PATH + '/' + RESULTS_FILE
 
 from datetime import timedelta
-import ccxt
+from exchange_registry import ExchangeRegistry
 
 # Path to the base data folder
 BASE_DATA_PATH = "../data"
 
-# Exchange configuration
-EXCHANGES = {
+# Storage of the OHLCV files of the master db: "parquet" (columnar, compressed) or "csv"
+DATA_STORAGE = "parquet"
+
+# Layout of the master db: None (a file per symbol and timeframe) or "month" / "year" (a folder per symbol and
+# timeframe with a file per period, ohlcv_store.read_ohlcv only opens the periods of the requested range)
+DATA_PARTITION = None
+
+# Market metadata cache of the exchanges (utilities/market_cache.py), a folder of the data folder shared by the
+# DataManager and the live scripts, and the seconds after which the cached markets are downloaded again
+MARKETS_FOLDER = "markets"
+MARKETS_TTL = 24 * 3600
+
+# Memory budget (bytes) of the frames kept by DataManager.load, the least recently used ones are evicted beyond it
+LOAD_CACHE_MAX_BYTES = 512 * 2**20
+
+# Exchange configuration, the ccxt client of an exchange (its "exchange_object") is created the first time it is used
+# Optional keys read by utilities/throughput.py: "max_requests_per_second" (default 4x the ccxt rate limit),
+# "weight_header" and "weight_limit" (the used request weight reported by the exchange, and its limit)
+EXCHANGES = ExchangeRegistry({
     "bitget": {
-        "exchange_object": ccxt.bitget(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 200,
     },
     "binance": {
-        "exchange_object": ccxt.binance(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 9999,
+        "weight_header": "x-mbx-used-weight-1m",
+        "weight_limit": 6000,
     },
     "binanceusdm": {
-        "exchange_object": ccxt.binanceusdm(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 1000,
+        "weight_header": "x-mbx-used-weight-1m",
+        "weight_limit": 2400,
     },
     "kucoin": {
-        "exchange_object": ccxt.kucoin(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 1000,
     },
     "bybit": {
-        "exchange_object": ccxt.bybit(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 1000,
     },
     "kraken": {
-        "exchange_object": ccxt.kraken(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 1000,
     },
 
     "alpaca": {
-        "exchange_object": ccxt.alpaca(config={'enableRateLimit': True}),
+        "ccxt_config": {'enableRateLimit': True},
         "limit_size_request": 999999,
     },
-}
+})
+
+# Modules imported by the worker processes of the optimizer sweeps, and their import budget (ms),
+# see exchange_registry.check_import_budget
+WORKER_MODULES = ["utilities.optimizer", "strategies.envelope"]
+IMPORT_BUDGET_MS = 1000
 
 # Supported timeframes
 TIMEFRAMES = {
@@ -75,12 +101,16 @@ USE_PAPER_TRADING = True
 ALPACA_PAPER_URL = "https://paper-api.alpaca.markets"
 ALPACA_LIVE_URL = "https://api.alpaca.markets"
 
-# Timeframe mapping for Alpaca
-from alpaca.data.timeframe import TimeFrame
-ALPACA_TIMEFRAME_MAP = {
-    "1m": TimeFrame.Minute,
-    "5m": TimeFrame(5, TimeFrame.Minute),
-    "15m": TimeFrame(15, TimeFrame.Minute),
-    "1h": TimeFrame.Hour,
-    "1d": TimeFrame.Day,
-}
\ No newline at end of file
+# Timeframe mapping for Alpaca, built on first use (importing alpaca is slow)
+def __getattr__(name):
+    if name == "ALPACA_TIMEFRAME_MAP":
+        from alpaca.data.timeframe import TimeFrame
+        globals()[name] = {
+            "1m": TimeFrame.Minute,
+            "5m": TimeFrame(5, TimeFrame.Minute),
+            "15m": TimeFrame(15, TimeFrame.Minute),
+            "1h": TimeFrame.Hour,
+            "1d": TimeFrame.Day,
+        }
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import statistics
+import threading
+import subprocess
+from typing import Dict, List, Optional
+
+# Timings (ms) of the ccxt clients created by the registries, exchange name -> ms
+BUILD_TIMES: Dict[str, float] = {}
+
+_build_lock = threading.Lock()
+
+
+class ExchangeSettings(dict):
+    """
+    Settings of an exchange, whose ccxt client settings["exchange_object"] (and ccxt itself) is only created
+    the first time it is read, from the ccxt class of the exchange name and its "ccxt_config".
+    """
+
+    def __init__(self, name: str, settings: dict) -> None:
+        super().__init__(settings)
+        self.name = name
+
+    def __missing__(self, key):
+        if key != "exchange_object":
+            raise KeyError(key)
+        with _build_lock:
+            if key not in self:  # built by another thread meanwhile
+                started = time.perf_counter()
+                import ccxt
+                self[key] = getattr(ccxt, self.name)(config=dict(self.get("ccxt_config", {})))
+                BUILD_TIMES[self.name] = (time.perf_counter() - started) * 1000
+        return dict.__getitem__(self, key)
+
+    def is_built(self) -> bool:
+        return dict.__contains__(self, "exchange_object")
+
+
+class ExchangeRegistry(dict):
+    """
+    Supported exchanges, name -> ExchangeSettings. Listing the exchanges or reading their settings does not
+    import ccxt, only using an "exchange_object" does.
+    """
+
+    def __init__(self, exchanges: Dict[str, dict]) -> None:
+        super().__init__({name: ExchangeSettings(name, settings) for name, settings in exchanges.items()})
+
+    def built(self) -> List[str]:
+        return [name for name, settings in self.items() if settings.is_built()]
+
+
+def import_time_ms(module: str, runs: int = 3, cwd: Optional[str] = None) -> float:
+    """
+    Median time (ms) to import module in a fresh interpreter, like a spawned worker process does, with the
+    config folder on the path. cwd defaults to the code folder.
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = (
+        "import sys, time; sys.path.append('./config'); started = time.perf_counter(); "
+        f"import {module}; print((time.perf_counter() - started) * 1000)"
+    )
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def check_import_budget(modules: List[str], budget_ms: float, runs: int = 3) -> Dict[str, float]:
+    """
+    Import times (ms) of modules, see import_time_ms. Raises a ValueError listing the modules over budget_ms.
+    """
+    timings = {module: import_time_ms(module, runs) for module in modules}
+    over_budget = {module: round(ms) for module, ms in timings.items() if ms > budget_ms}
+    if over_budget:
+        raise ValueError(f"Import time over the budget of {budget_ms:.0f} ms: {over_budget}.")
+    return timings
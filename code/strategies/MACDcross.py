@@ -1,55 +1,34 @@
-import sys
 import ta
-import pandas as pd
-from datetime import datetime
+import numpy as np
 
 from . import tools as ut
 
-class Strategy:
-    def __init__(self, params, ohlcv) -> None:
-        self.params = params
-        self.data = ohlcv.copy()
+class Strategy(ut.BacktestEngine):
+    valid_engines = ut.BacktestEngine.valid_engines + ("vectorized",)
+    required_columns = ("open", "high", "low", "close")  # the candlesticks of BacktestAnalysis.plot_candlestick
 
-        self.populate_indicators()
-        self.set_trade_mode()
+    def reset_state(self):
         self.good_to_trade = True
         self.position_was_closed = False
         self.last_position_side = None
 
-    # --- Trade Mode ---
-    def set_trade_mode(self):
-        self.params.setdefault("mode", "both")
-
-        valid_modes = ("long", "short", "both")
-        if self.params["mode"] not in valid_modes:
-            raise ValueError(f"Wrong strategy mode. Can either be {', '.join(valid_modes)}.")
-
-        self.ignore_shorts = self.params["mode"] == "long"
-        self.ignore_longs = self.params["mode"] == "short"
-
-        if not self.ignore_longs:
-            self.populate_long_signals()
-        if not self.ignore_shorts:
-            self.populate_short_signals()
-
     # --- Indicators ---
     def populate_indicators(self):
         """
         Populates MACD indicators for trade decisions.
         """
-        self.data["macd"] = ta.trend.macd(self.data["close"], 
-                                          window_slow=self.params.get("slow_ma", 26), 
-                                          window_fast=self.params.get("fast_ma", 12))
-        
-        self.data["macd_signal"] = ta.trend.macd_signal(self.data["close"], 
-                                                        window_slow=self.params.get("slow_ma", 26), 
-                                                        window_fast=self.params.get("fast_ma", 12), 
-                                                        window_sign=self.params.get("signal_ma", 9))
-        
-        self.data["macd_hist"] = ta.trend.macd_diff(self.data["close"], 
-                                                    window_slow=self.params.get("slow_ma", 26), 
-                                                    window_fast=self.params.get("fast_ma", 12), 
-                                                    window_sign=self.params.get("signal_ma", 9))
+        slow = self.params.get("slow_ma", 26)
+        fast = self.params.get("fast_ma", 12)
+        sign = self.params.get("signal_ma", 9)
+
+        self.data["macd"] = self.indicator("macd", {"slow": slow, "fast": fast},
+                                           lambda: ta.trend.macd(self.data["close"], window_slow=slow, window_fast=fast))
+
+        self.data["macd_signal"] = self.indicator("macd_signal", {"slow": slow, "fast": fast, "sign": sign},
+                                                  lambda: ta.trend.macd_signal(self.data["close"], window_slow=slow, window_fast=fast, window_sign=sign))
+
+        self.data["macd_hist"] = self.indicator("macd_hist", {"slow": slow, "fast": fast, "sign": sign},
+                                                lambda: ta.trend.macd_diff(self.data["close"], window_slow=slow, window_fast=fast, window_sign=sign))
 
 
     # --- Long Entry (Golden Cross) ---
@@ -74,6 +53,54 @@ class Strategy:
     def calculate_short_sl_price(self, avg_open_price):
         return avg_open_price * (1 + self.params["stop_loss_pct"])
 
+    # --- Events ---
+    def event_columns(self):
+        return {"entry": ["long_entry", "short_entry"]}
+
+    def can_skip(self):
+        return self.good_to_trade
+
+    # --- Vectorized ---
+    vectorized_exits = ("signal", "sl")
+
+    def prepare_vectorized(self):
+        self.reenable_long_index = np.flatnonzero((self.data["macd"] > self.data["macd_signal"]).to_numpy())
+        self.reenable_short_index = np.flatnonzero((self.data["macd"] < self.data["macd_signal"]).to_numpy())
+
+    def vectorized_rules(self, side):
+        closes = self.data["close"].to_numpy(dtype=float)
+        if side == "long":
+            return {
+                "entry": "long_entry",
+                "exit": "short_entry",
+                "sl_price": self.calculate_long_sl_price(closes),
+                "tp_price": None,
+                "reasons": {"open": "Open long", "sl": "Stop Loss", "signal": "MACD Death Cross"},
+            }
+        return {
+            "entry": "short_entry",
+            "exit": "long_entry",
+            "sl_price": self.calculate_short_sl_price(closes),
+            "tp_price": None,
+            "reasons": {"open": "Open short", "sl": "Stop Loss", "signal": "MACD Golden Cross"},
+        }
+
+    def vectorized_reentry(self, side, exit_rule, bar):
+        if exit_rule != "sl":
+            return bar + 1
+        # After a stop loss evaluate_orders waits for the MACD to cross back on the side of the position
+        index = self.reenable_long_index if side == "long" else self.reenable_short_index
+        return ut.next_index(index, bar + 1)
+
+    # --- Position size ---
+    def calculate_initial_margin(self, balance, price, sl_price):
+        if "position_size_percentage" in self.params:
+            return balance * (self.params["position_size_percentage"] / 100)
+        elif "position_size_fixed_amount" in self.params:
+            return self.params["position_size_fixed_amount"]
+        else:
+            raise ValueError("Position size parameter missing: Define either 'position_size_percentage' or 'position_size_fixed_amount'.")
+
     # --- Order Evaluation (Entry & Exit) ---
     def evaluate_orders(self, time, row):
         """
@@ -107,66 +134,17 @@ class Strategy:
 
         # --- Open New Position ---
         if self.good_to_trade and not self.position_was_closed:
-            balance = self.balance
             if not self.ignore_longs and self.position.side != "short" and row["long_entry"]:
                 side = "long"
                 price = row["close"]
-                sl_price = price * (1 - self.params["stop_loss_pct"])
+                sl_price = self.calculate_long_sl_price(price)
             elif not self.ignore_shorts and self.position.side != "long" and row["short_entry"]:
                 side = "short"
                 price = row["close"]
-                sl_price = price * (1 + self.params["stop_loss_pct"])
+                sl_price = self.calculate_short_sl_price(price)
             else:
                 return
 
             self.last_position_side = side
-            if "position_size_percentage" in self.params:
-                initial_margin = balance * (self.params["position_size_percentage"] / 100)
-            elif "position_size_fixed_amount" in self.params:
-                initial_margin = self.params["position_size_fixed_amount"]
-            else:
-                raise ValueError("Position size parameter missing: Define either 'position_size_percentage' or 'position_size_fixed_amount'.")
-
-
-            self.balance -= initial_margin
-            self.position.open(time, side, initial_margin, price, f"Open {side}", sl_price=sl_price)
-
-    # --- Trade Closing ---
-    def close_trade(self, time, price, reason):
-        self.position.close(time, price, reason)
-        open_balance = self.balance
-        self.balance += self.position.initial_margin + self.position.net_pnl
-        trade_info = self.position.info()
-        trade_info["open_balance"] = open_balance
-        trade_info["close_balance"] = self.balance
-        del trade_info["tp_price"]
-        self.trades_info.append(trade_info)
-
-    # --- Backtest Execution ---
-    def run_backtest(self, initial_balance, leverage, open_fee_rate, close_fee_rate):
-        self.initial_balance = initial_balance
-        self.balance = initial_balance
-        self.position = ut.Position(leverage=leverage, open_fee_rate=open_fee_rate, close_fee_rate=close_fee_rate)
-        self.equity_update_interval = pd.Timedelta(hours=6)
-
-        self.previous_equity_update_time = datetime(1900, 1, 1)
-        self.trades_info = []
-        self.equity_record = []
-
-        for time, row in self.data.iterrows():
-            self.evaluate_orders(time, row)
-            self.previous_equity_update_time = ut.update_equity_record(
-                time, self.position, self.balance, row["close"], 
-                self.previous_equity_update_time, self.equity_update_interval, self.equity_record
-            )
-
-        self.trades_info = pd.DataFrame(self.trades_info)
-        self.equity_record = pd.DataFrame(self.equity_record).set_index("time")
-        self.final_equity = round(self.equity_record.iloc[-1]["equity"], 2)
-
-    # --- Save results ---
-    def save_equity_record(self, path):
-        self.equity_record.to_csv(path+'_equity_record.csv', header=True, index=True)
-
-    def save_trades_info(self, path):
-        self.trades_info.to_csv(path+'_trades_info.csv', header=True, index=True)
+            initial_margin = self.calculate_initial_margin(self.balance, price, sl_price)
+            self.open_trade(time, side, initial_margin, price, f"Open {side}", sl_price=sl_price)
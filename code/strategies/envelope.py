@@ -1,51 +1,33 @@
-import sys
 import ta
+import numpy as np
 import pandas as pd
-from datetime import datetime
 
 from . import tools as ut
 
 
-class Strategy:
-    def __init__(self, params, ohlcv) -> None:
-        self.params = params
-        self.data = ohlcv.copy()
+class Strategy(ut.BacktestEngine):
+    required_columns = ("open", "high", "low", "close")
 
-        self.populate_indicators()
-        self.set_trade_mode()
+    def reset_state(self):
         self.good_to_trade = True
         self.position_was_closed = False
         self.n_bands_hit = 0
         self.last_position_side = None
 
-    # --- Trade Mode ---
-    def set_trade_mode(self):
-        self.params.setdefault("mode", "both")
-
-        valid_modes = ("long", "short", "both")
-        if self.params["mode"] not in valid_modes:
-            raise ValueError(f"Wrong strategy mode. Can either be {', '.join(valid_modes)}.")
-
-        self.ignore_shorts = self.params["mode"] == "long"
-        self.ignore_longs = self.params["mode"] == "short"
-
-        if not self.ignore_longs:
-            self.populate_long_signals()
-        if not self.ignore_shorts:
-            self.populate_short_signals()
-
     # --- Indicators ---
     def populate_indicators(self):
         # https://technical-analysis-library-in-python.readthedocs.io/en/latest/ta.html
+        average_params = {"window": self.params["average_period"], "shift": 1}
         if "DCM" == self.params["average_type"]:
-            ta_obj = ta.volatility.DonchianChannel(self.data["high"], self.data["low"], self.data["close"], window=self.params["average_period"])
-            self.data["average"] = ta_obj.donchian_channel_mband().shift(1)
+            self.data["average"] = self.indicator("DCM", average_params, lambda: ta.volatility.DonchianChannel(
+                self.data["high"], self.data["low"], self.data["close"], window=self.params["average_period"]
+            ).donchian_channel_mband().shift(1))
         elif "SMA" == self.params["average_type"]:
-            self.data["average"] = ta.trend.sma_indicator(self.data["close"], window=self.params["average_period"]).shift(1)
+            self.data["average"] = self.indicator("SMA", average_params, lambda: ta.trend.sma_indicator(self.data["close"], window=self.params["average_period"]).shift(1))
         elif "EMA" == self.params["average_type"]:
-            self.data["average"] = ta.trend.ema_indicator(self.data["close"], window=self.params["average_period"]).shift(1)
+            self.data["average"] = self.indicator("EMA", average_params, lambda: ta.trend.ema_indicator(self.data["close"], window=self.params["average_period"]).shift(1))
         elif "WMA" == self.params["average_type"]:
-            self.data["average"] = ta.trend.wma_indicator(self.data["close"], window=self.params["average_period"]).shift(1)
+            self.data["average"] = self.indicator("WMA", average_params, lambda: ta.trend.wma_indicator(self.data["close"], window=self.params["average_period"]).shift(1))
         else:
             raise ValueError(f"The average type {self.params['average_type']} is not supported")
 
@@ -71,6 +53,27 @@ class Strategy:
     def calculate_short_sl_price(self, avg_open_price):
         return avg_open_price * (1 + self.params["stop_loss_pct"])
 
+    # --- Events ---
+    def event_columns(self):
+        n_envelopes = len(self.params["envelopes"])
+        return {
+            "entry": [f"open_{side}_{i + 1}" for side in ("long", "short") for i in range(n_envelopes)],
+            "long": ["close_long"],
+            "short": ["close_short"],
+        }
+
+    def can_skip(self):
+        return self.good_to_trade
+
+    def position_trigger_levels(self):
+        low_level, high_level = super().position_trigger_levels()
+        if "price_jump_pct" in self.params:  # the open can only jump past a level the low or high also reaches
+            if self.position.side == "long":
+                low_level = max(low_level, self.position.open_price * (1 - self.params['price_jump_pct']))
+            else:
+                high_level = min(high_level, self.position.open_price * (1 + self.params['price_jump_pct']))
+        return low_level, high_level
+
     # --- Positions ---
     def evaluate_orders(self, time, row):
         self.position_was_closed = False
@@ -92,8 +95,7 @@ class Strategy:
                 self.n_bands_hit = 0
                 
             elif self.position.check_for_liquidation(row):
-                print(f"Your long was liquidated on the {time} (price = {self.position.liquidation_price})")
-                sys.exit()
+                self.liquidate(time)
 
             elif row["close_long"]:
                 self.close_trade(time,  row["average"], "Exit long")
@@ -112,8 +114,7 @@ class Strategy:
                 self.n_bands_hit = 0
                 
             elif self.position.check_for_liquidation(row):
-                print(f"Your short was liquidated on the {time} (price = {self.position.liquidation_price})")
-                sys.exit()
+                self.liquidate(time)
 
             elif row["close_short"]:
                 self.close_trade(time, row["average"], "Exit short")
@@ -143,11 +144,10 @@ class Strategy:
                 elif 'position_size_fixed_amount' in self.params:  # fixed amount position size
                     initial_margin = round(self.params['position_size_fixed_amount'] / len(self.params["envelopes"]), 4)
 
-                self.balance -= initial_margin
                 self.n_bands_hit += 1
 
                 if i == 0:
-                    self.position.open(
+                    self.open_trade(
                         time,
                         side,
                         initial_margin,
@@ -156,50 +156,255 @@ class Strategy:
                         sl_price=sl_price_calc(price),
                     )
                 else:
-                    self.position.add(initial_margin, price, f"Open {side} {i + 1}")
+                    self.add_to_trade(initial_margin, price, f"Open {side} {i + 1}")
+                    self.position.sl_price = sl_price_calc(self.position.open_price)
+
+
+    def prepare_arrays(self):
+        """
+        Pulls the columns needed by evaluate_bar out of the DataFrame once, as plain python lists.
+        Band and signal columns are stored as one list per envelope, indexed by envelope then bar, and "entry" tells
+        the bars where any envelope opens a position.
+        """
+        n_envelopes = len(self.params["envelopes"])
+        n_bars = len(self.data)
+        no_signal = [False] * n_bars
+
+        def columns(prefix, enabled):
+            if not enabled:
+                return [no_signal] * n_envelopes
+            return [self.data[f"{prefix}_{i + 1}"].to_numpy().tolist() for i in range(n_envelopes)]
+
+        entry = np.zeros(n_bars, dtype=bool)
+        for side, enabled in (("long", not self.ignore_longs), ("short", not self.ignore_shorts)):
+            if enabled:
+                entry |= self.data[[f"open_{side}_{i + 1}" for i in range(n_envelopes)]].to_numpy().any(axis=1)
+
+        self.arrays = {
+            "time": self.data.index.asi8.view("M8[ns]"),  # UTC, read faster than the Timestamps of the index
+            "open": self.data["open"].to_numpy(dtype=float).tolist(),
+            "high": self.data["high"].to_numpy(dtype=float).tolist(),
+            "low": self.data["low"].to_numpy(dtype=float).tolist(),
+            "close": self.data["close"].to_numpy(dtype=float).tolist(),
+            "average": self.data["average"].to_numpy(dtype=float).tolist(),
+            "close_long": self.data["close_long"].tolist() if not self.ignore_longs else [False] * n_bars,
+            "close_short": self.data["close_short"].tolist() if not self.ignore_shorts else [False] * n_bars,
+            "band_low": columns("band_low", True),
+            "band_high": columns("band_high", True),
+            "open_long": columns("open_long", not self.ignore_longs),
+            "open_short": columns("open_short", not self.ignore_shorts),
+            "entry": entry.tolist(),
+        }
+
+    def evaluate_bar(self, i):
+        """
+        Same rules as evaluate_orders, run over the arrays built by prepare_arrays for bar i.
+        """
+        a = self.arrays
+        open_price = a["open"][i]
+        close = a["close"][i]
+        average = a["average"][i]
+
+        self.position_was_closed = False
+        if not self.good_to_trade:
+            if self.last_position_side == 'long' and close > average:
+                self.good_to_trade = True
+            elif self.last_position_side == 'short' and close < average:
+                self.good_to_trade = True
+
+        if self.position.side == "long":
+            row = {"low": a["low"][i], "high": a["high"][i]}
+            if "price_jump_pct" in self.params and open_price <= self.position.open_price * (1 - self.params['price_jump_pct']):
+                self.close_trade(a["time"][i], open_price, "CA long")
+                self.good_to_trade = False
+                self.n_bands_hit = 0
+
+            elif self.position.check_for_sl(row):
+                self.close_trade(a["time"][i], self.position.sl_price, "SL long")
+                self.good_to_trade = False
+                self.n_bands_hit = 0
+
+            elif self.position.check_for_liquidation(row):
+                self.liquidate(self.data.index[i])
+
+            elif a["close_long"][i]:
+                self.close_trade(a["time"][i], average, "Exit long")
+                self.position_was_closed = True
+                self.n_bands_hit = 0
+
+        elif self.position.side == "short":
+            row = {"low": a["low"][i], "high": a["high"][i]}
+            if "price_jump_pct" in self.params and open_price >= self.position.open_price * (1 + self.params['price_jump_pct']):
+                self.close_trade(a["time"][i], open_price, "CA short")
+                self.good_to_trade = False
+                self.n_bands_hit = 0
+
+            elif self.position.check_for_sl(row):
+                self.close_trade(a["time"][i], self.position.sl_price, "SL short")
+                self.good_to_trade = False
+                self.n_bands_hit = 0
+
+            elif self.position.check_for_liquidation(row):
+                self.liquidate(self.data.index[i])
+
+            elif a["close_short"][i]:
+                self.close_trade(a["time"][i], average, "Exit short")
+                self.position_was_closed = True
+                self.n_bands_hit = 0
+
+        if self.good_to_trade and not self.position_was_closed:
+            if not a["entry"][i]:
+                return
+
+            open_long = a["open_long"]
+            open_short = a["open_short"]
+            balance = self.balance
+            for k in range(self.n_bands_hit, len(self.params["envelopes"])):
+                if not self.ignore_longs and self.position.side != "short" and open_long[k][i]:
+                    side = "long"
+                    price = a["band_low"][k][i]
+                    sl_price_calc = self.calculate_long_sl_price
+                elif not self.ignore_shorts and self.position.side != "long" and open_short[k][i]:
+                    side = "short"
+                    price = a["band_high"][k][i]
+                    sl_price_calc = self.calculate_short_sl_price
+                else:
+                    continue
+
+                self.last_position_side = side
+
+                if 'position_size_percentage' in self.params:  # total wallet fraction position size
+                    initial_margin = balance * round(self.params['position_size_percentage'] / 100 / len(self.params["envelopes"]), 4)
+
+                elif 'position_size_fixed_amount' in self.params:  # fixed amount position size
+                    initial_margin = round(self.params['position_size_fixed_amount'] / len(self.params["envelopes"]), 4)
+
+                self.n_bands_hit += 1
+
+                if k == 0:
+                    self.open_trade(
+                        a["time"][i],
+                        side,
+                        initial_margin,
+                        price,
+                        f"Open {side} {k + 1}",
+                        sl_price=sl_price_calc(price),
+                    )
+                else:
+                    self.add_to_trade(initial_margin, price, f"Open {side} {k + 1}")
                     self.position.sl_price = sl_price_calc(self.position.open_price)
 
 
-    def close_trade(self, time, price, reason):
-        self.position.close(time, price, reason)
-        open_balance = self.balance
-        self.balance += self.position.initial_margin + self.position.net_pnl
-        trade_info = self.position.info()
-        trade_info["open_balance"] = open_balance
-        trade_info["close_balance"] = self.balance
-        del trade_info["tp_price"]
-        self.trades_info.append(trade_info)
-
-    # --- Backtest ---
-    def run_backtest(self, initial_balance, leverage, open_fee_rate, close_fee_rate):
-        self.initial_balance = initial_balance
-        self.balance = initial_balance
-        self.position = ut.Position(leverage=leverage, open_fee_rate=open_fee_rate, close_fee_rate=close_fee_rate)
-        self.equity_update_interval = pd.Timedelta(hours=6)
-
-        self.previous_equity_update_time = datetime(1900, 1, 1)
-        self.trades_info = []
-        self.equity_record = []
-
-        for time, row in self.data.iterrows():
-            self.evaluate_orders(time, row)
-            self.previous_equity_update_time = ut.update_equity_record(
-                time,
-                self.position,
-                self.balance,
-                row["close"],
-                self.previous_equity_update_time,
-                self.equity_update_interval,
-                self.equity_record
-            )
-
-        self.trades_info = pd.DataFrame(self.trades_info)
-        self.equity_record = pd.DataFrame(self.equity_record).set_index("time")
-        self.final_equity = round(self.equity_record.iloc[-1]["equity"], 2)
-
-    # --- Save results ---
-    def save_equity_record(self, path):
-        self.equity_record.to_csv(path+'_equity_record.csv', header=True, index=True)
-
-    def save_trades_info(self, path):
-        self.trades_info.to_csv(path+'_trades_info.csv', header=True, index=True)
+class BatchStrategy:
+    """
+    Backtests K envelope configurations in lockstep: one Strategy per configuration, all stepped through a single
+    loop over the bars. Per bar, numpy checks over the configurations find the ones whose bands, stop loss,
+    liquidation, price jump or exit signal the bar reaches, and only those run their evaluate_bar, so each
+    configuration gets the results of its own run_backtest (with prune_liquidation).
+    The configurations must share average_type, average_period and mode; envelopes (possibly of different
+    lengths), stop_loss_pct, price_jump_pct and the position size can differ.
+
+    A configuration that gets liquidated, or breaks one of the max_drawdown / min_equity pruning rules of
+    run_backtest (see BacktestEngine), stops trading: its status tells why and its results end on that bar.
+    """
+    shared_params = ("average_type", "average_period", "mode")
+
+    def __init__(self, params_list, ohlcv) -> None:
+        self.params_list = [dict(params) for params in params_list]
+        for params in self.params_list:
+            params.setdefault("mode", "both")
+            for key in self.shared_params:
+                if params[key] != self.params_list[0][key]:
+                    raise ValueError(f"All the configurations must share the same {key}.")
+            if 'position_size_percentage' not in params and 'position_size_fixed_amount' not in params:
+                raise ValueError("Position size parameter missing: Define either 'position_size_percentage' or 'position_size_fixed_amount'.")
+
+        self.strategies = [Strategy(dict(params), ohlcv) for params in self.params_list]
+        self.data = self.strategies[0].data
+
+    def run_backtest(self, initial_balance, leverage, open_fee_rate, close_fee_rate, max_drawdown=None, min_equity=None):
+        strategies = self.strategies
+        for strategy in strategies:
+            strategy.start_backtest(initial_balance, leverage, open_fee_rate, close_fee_rate, max_drawdown=max_drawdown,
+                                    min_equity=min_equity, prune_liquidation=True)
+            strategy.prepare_arrays()
+
+        # Widest band factor left to hit, by bands hit and configuration: a bar can open or add to a position only
+        # if low <= average * factor (long) or high >= average / factor (short)
+        n_configs = len(strategies)
+        entry_factors = np.full((max(len(params["envelopes"]) for params in self.params_list) + 1, n_configs), np.nan)
+        for k, params in enumerate(self.params_list):
+            entry_factors[:len(params["envelopes"]), k] = np.maximum.accumulate([1 - e for e in params["envelopes"]][::-1])[::-1]
+        no_entry = np.full_like(entry_factors, np.nan)
+        long_factors = no_entry if strategies[0].ignore_longs else entry_factors
+        short_factors = no_entry if strategies[0].ignore_shorts else entry_factors
+
+        # Per configuration, what a bar must reach for evaluate_bar to act: low <= low_level or high >= high_level
+        # (stop loss, liquidation, price jump), low <= average * down or high >= average / up (entries, exit signals),
+        # the close above (reenable_long) or below (reenable_short) the average to trade again after a stop
+        low_level = np.full(n_configs, -np.inf)
+        high_level = np.full(n_configs, np.inf)
+        down = long_factors[0].copy()
+        up = short_factors[0].copy()
+        reenable_long = np.zeros(n_configs, dtype=bool)
+        reenable_short = np.zeros(n_configs, dtype=bool)
+
+        def update(k):
+            strategy = strategies[k]
+            side = strategy.position.side
+            good_to_trade = strategy.good_to_trade
+            over = strategy.status != "completed"  # liquidated or pruned
+            if over:
+                low_level[k], high_level[k], down[k], up[k] = -np.inf, np.inf, np.nan, np.nan
+            else:
+                low_level[k], high_level[k] = strategy.position_trigger_levels() if side else (-np.inf, np.inf)
+                down[k] = 1 if side == "short" else long_factors[strategy.n_bands_hit, k] if good_to_trade else np.nan
+                up[k] = 1 if side == "long" else short_factors[strategy.n_bands_hit, k] if good_to_trade else np.nan
+            stopped = not over and not good_to_trade
+            reenable_long[k] = stopped and strategy.last_position_side == "long"
+            reenable_short[k] = stopped and strategy.last_position_side == "short"
+
+        arrays = strategies[0].arrays
+        changed = True
+        for i, (h, l, c, average) in enumerate(zip(arrays["high"], arrays["low"], arrays["close"], arrays["average"])):
+            if changed:  # widest levels over the configurations, for a cheap check per bar
+                changed = False
+                low_trigger, high_trigger = low_level.max(), high_level.min()
+                down_factor, up_factor = np.fmax.reduce(down), np.fmax.reduce(up)
+                any_reenable_long, any_reenable_short = reenable_long.any(), reenable_short.any()
+            if not (
+                    l <= low_trigger or h >= high_trigger or l <= average * down_factor or h >= average / up_factor
+                    or (any_reenable_long and c > average) or (any_reenable_short and c < average)
+            ):
+                continue
+
+            evaluate = (l <= low_level) | (h >= high_level) | (l <= average * down) | (h >= average / up)
+            if any_reenable_long or any_reenable_short:
+                evaluate |= (reenable_long & (c > average)) | (reenable_short & (c < average))
+            for k in np.flatnonzero(evaluate).tolist():
+                strategies[k].step(i)
+                update(k)
+            changed = True
+
+        for strategy in strategies:
+            strategy.finish_backtest()
+        self.trades_info = [strategy.trades_info for strategy in strategies]
+        self.equity_record = [strategy.equity_record for strategy in strategies]
+        self.final_equity = [strategy.final_equity for strategy in strategies]
+        self.status = [strategy.status for strategy in strategies]
+
+    def result(self, k):
+        """
+        Backtested Strategy of configuration k.
+        """
+        return self.strategies[k]
+
+    def summary(self):
+        return pd.DataFrame({
+            "envelopes": [params["envelopes"] for params in self.params_list],
+            "stop_loss_pct": [params["stop_loss_pct"] for params in self.params_list],
+            "price_jump_pct": [params.get("price_jump_pct") for params in self.params_list],
+            "total_trades": [len(trades_info) for trades_info in self.trades_info],
+            "final_equity": self.final_equity,
+            "status": self.status,
+        })
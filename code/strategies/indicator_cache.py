@@ -0,0 +1,64 @@
+import hashlib
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def fingerprint(data: pd.DataFrame) -> str:
+    """
+    Hash of the index and OHLCV columns of a frame: two frames with the same prices share their indicators.
+    """
+    columns = [column for column in OHLCV_COLUMNS if column in data.columns]
+    hashed = pd.util.hash_pandas_object(data[columns], index=True).to_numpy()
+    return hashlib.blake2b(hashed.tobytes(), digest_size=16).hexdigest()
+
+
+class IndicatorCache:
+    """
+    LRU cache of indicator series keyed by (data fingerprint, indicator name, parameters).
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[Hashable, ...], pd.Series]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, data_fingerprint: str, name: str, params: Dict[str, Any], compute: Callable[[], pd.Series]) -> pd.Series:
+        key = (data_fingerprint, name, tuple(sorted(params.items())))
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+# Shared by every strategy of the process
+INDICATOR_CACHE = IndicatorCache()
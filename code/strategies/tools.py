@@ -1,7 +1,14 @@
-from datetime import datetime, timedelta
+import sys
+import copy
+import numpy as np
+import pandas as pd
+from bisect import bisect_left
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 from abc import ABC, abstractmethod
 
+from .indicator_cache import INDICATOR_CACHE, fingerprint
+
 
 class PositionBehavior(ABC):
     @abstractmethod
@@ -59,7 +66,17 @@ class ShortPositionBehavior(PositionBehavior):
         return row['high'] >= position.liquidation_price
 
 
+LONG_BEHAVIOR = LongPositionBehavior()
+SHORT_BEHAVIOR = ShortPositionBehavior()
+
+
 class Position:
+    __slots__ = (
+        "leverage", "open_fee_rate", "close_fee_rate", "side", "open_time", "close_time", "open_price", "close_price",
+        "open_reason", "close_reason", "open_fee", "close_fee", "initial_margin", "open_notional_value",
+        "close_notional_value", "amount", "net_pnl", "net_pnl_pct", "sl_price", "tp_price", "liquidation_price", "behavior",
+    )
+
     def __init__(
             self,
             leverage: Optional[int] = 1,
@@ -119,7 +136,7 @@ class Position:
         self.open_reason = open_reason
         self.sl_price = sl_price
         self.tp_price = tp_price
-        self.behavior = LongPositionBehavior() if side == "long" else ShortPositionBehavior()
+        self.behavior = LONG_BEHAVIOR if side == "long" else SHORT_BEHAVIOR
         metrics = self._calculate_opening_metrics(self.initial_margin, self.open_price)
         self.open_fee = metrics['open_fee']
         self.open_notional_value = metrics['open_notional_value']
@@ -189,28 +206,821 @@ class Position:
         return self.behavior.check_for_tp(self, row)
 
 
-def update_equity_record(
-    time: datetime,
-    position: Optional[Position],
-    balance: float,
-    price: float,
-    previous_equity_update_time: datetime,
-    equity_update_interval: timedelta,
-    equity_record: List[Dict[str, Any]]
-) -> datetime:
-
-    if time - previous_equity_update_time >= equity_update_interval:
-        equity = balance
-        if position.side:
-            unrealized_pnl = position.calculate_pnl(price, position.amount)
-            close_fee = (position.open_notional_value + unrealized_pnl) * position.close_fee_rate
-            equity += position.initial_margin + unrealized_pnl - position.open_fee - close_fee
-
-        equity_record.append({
-            "time": time,
-            "price": price,
-            "equity": equity
-        })
-
-        return time
-    return previous_equity_update_time
+class TradeLedger:
+    """
+    Closed trades of a backtest, stored column by column in numpy arrays that grow by doubling.
+    Times are kept in ns and reasons as integer codes, to_frame builds the trades_info DataFrame.
+    """
+    value_columns = (
+        "open_price", "close_price", "initial_margin", "net_pnl", "net_pnl_pct", "open_notional_value",
+        "close_notional_value", "amount", "open_fee", "close_fee", "sl_price", "tp_price", "liquidation_price",
+        "open_balance", "close_balance",
+    )
+    columns = ("open_time", "close_time", "open_reason", "close_reason") + value_columns
+
+    def __init__(self, capacity: int = 256, tz=None) -> None:
+        self.size = 0
+        self.tz = tz
+        self.reasons = []
+        self.reason_codes = {}
+        self.times = np.empty((2, capacity), dtype=np.int64)
+        self.codes = np.empty((2, capacity), dtype=np.int32)
+        self.values = np.empty((len(self.value_columns), capacity))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def reason_code(self, reason: str) -> int:
+        code = self.reason_codes.get(reason)
+        if code is None:
+            code = self.reason_codes[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        return code
+
+    def append(self, position: Position, open_balance: float, close_balance: float) -> None:
+        """
+        Records the trade of a position that has just been closed.
+        """
+        k = self.size
+        if k == self.times.shape[1]:
+            self.times = np.concatenate([self.times, np.empty_like(self.times)], axis=1)
+            self.codes = np.concatenate([self.codes, np.empty_like(self.codes)], axis=1)
+            self.values = np.concatenate([self.values, np.empty_like(self.values)], axis=1)
+
+        self.times[0, k] = pd.Timestamp(position.open_time).value
+        self.times[1, k] = pd.Timestamp(position.close_time).value
+        self.codes[0, k] = self.reason_code(position.open_reason)
+        self.codes[1, k] = self.reason_code(position.close_reason)
+        self.values[:, k] = (
+            position.open_price,
+            position.close_price,
+            position.initial_margin,
+            position.net_pnl,
+            position.net_pnl_pct,
+            position.open_notional_value,
+            position.close_notional_value,
+            position.amount,
+            position.open_fee,
+            position.close_fee,
+            np.nan if position.sl_price is None else position.sl_price,
+            np.nan if position.tp_price is None else position.tp_price,
+            position.liquidation_price,
+            open_balance,
+            close_balance,
+        )
+        self.size = k + 1
+
+    def truncate(self, close_time) -> None:
+        """
+        Forgets the trades closed after close_time.
+        """
+        self.size = int(np.searchsorted(self.times[1, :self.size], pd.Timestamp(close_time).value, side="right"))
+
+    def to_frame(self, drop: tuple = ()) -> pd.DataFrame:
+        n = self.size
+        reasons = np.array(self.reasons, dtype=object)
+        columns = {}
+        for i, name in enumerate(("open_time", "close_time")):
+            times = pd.DatetimeIndex(self.times[i, :n])
+            columns[name] = times if self.tz is None else times.tz_localize("UTC").tz_convert(self.tz)
+        for i, name in enumerate(("open_reason", "close_reason")):
+            columns[name] = reasons[self.codes[i, :n]]
+        for i, name in enumerate(self.value_columns):
+            columns[name] = self.values[i, :n]
+        return pd.DataFrame({name: columns[name] for name in self.columns if name not in drop})
+
+
+def compute_equity(position: Optional[Position], balance: float, price: float) -> float:
+    equity = balance
+    if position is not None and position.side:
+        unrealized_pnl = position.calculate_pnl(price, position.amount)
+        close_fee = (position.open_notional_value + unrealized_pnl) * position.close_fee_rate
+        equity += position.initial_margin + unrealized_pnl - position.open_fee - close_fee
+    return equity
+
+
+def pruning_breach(equity: np.ndarray, max_drawdown: Optional[float] = None, min_equity: Optional[float] = None) -> Optional[tuple]:
+    """
+    (sample, status) of the first equity sample that breaks a pruning rule, None if there is none.
+    Same rules as BacktestEngine.check_pruning.
+    """
+    breaches = []
+    if min_equity is not None:
+        breaches.append((np.flatnonzero(equity <= min_equity), "min_equity"))
+    if max_drawdown is not None:
+        peak = np.maximum.accumulate(equity)
+        breaches.append((np.flatnonzero(equity <= peak * (1 - max_drawdown)), "max_drawdown"))
+    breaches = [(int(samples[0]), status) for samples, status in breaches if len(samples)]
+    return min(breaches, key=lambda breach: breach[0], default=None)
+
+
+def next_index(index: np.ndarray, start: int, default: Optional[int] = None) -> Optional[int]:
+    """
+    First value >= start of the sorted bar index, default if there is none.
+    """
+    k = np.searchsorted(index, start)
+    return int(index[k]) if k < len(index) else default
+
+
+def first_touch(
+    lows: np.ndarray,
+    highs: np.ndarray,
+    start: int,
+    stop: int,
+    low_level: float,
+    high_level: float,
+    chunk: int = 64,
+) -> int:
+    """
+    First bar of [start, stop) where low <= low_level or high >= high_level, stop if there is none.
+    Scans by doubling chunks so that a close touch does not cost a scan of the whole range.
+    """
+    while start < stop:
+        end = min(start + chunk, stop)
+        hit = np.flatnonzero((lows[start:end] <= low_level) | (highs[start:end] >= high_level))
+        if len(hit):
+            return start + int(hit[0])
+        start = end
+        chunk *= 2
+    return stop
+
+
+class LevelSearch:
+    """
+    First bar from a start on where a series reaches a level (value <= level, or >= level with above), for many
+    (start, level) pairs at once. Keeps the minimum (maximum) of the series over spans of 2**k bars, each search
+    takes log2(bars) vector steps over all the pairs.
+    """
+
+    def __init__(self, values: np.ndarray, above: bool = False) -> None:
+        self.sign = -1.0 if above else 1.0
+        values = self.sign * np.asarray(values, dtype=float)
+        self.spans = [np.where(np.isnan(values), np.inf, values)]  # a missing value never reaches a level
+        span = 1
+        while 2 * span <= len(values):
+            self.spans.append(np.minimum(self.spans[-1][:-span], self.spans[-1][span:]))
+            span *= 2
+
+    def first(self, starts: np.ndarray, levels: np.ndarray) -> np.ndarray:
+        """
+        First bar >= starts where the series reaches levels, len(values) if there is none.
+        """
+        n_bars = len(self.spans[0])
+        bars = np.array(starts, dtype=np.int64)
+        levels = self.sign * np.asarray(levels, dtype=float)
+        for k in range(len(self.spans) - 1, -1, -1):
+            spans = self.spans[k]
+            step = 1 << k
+            # Skips the next 2**k bars of the searches that do not reach their level over them
+            skip = (bars + step <= n_bars) & (spans[np.minimum(bars, len(spans) - 1)] > levels)
+            bars += step * skip
+        return bars
+
+
+def equity_sample_bars(times_ns: List[int], interval_ns: int) -> List[int]:
+    """
+    Bars of the equity record: the first one, then the first one at least interval_ns after the previous sample.
+    """
+    bars = []
+    previous = None
+    k = 0
+    while k < len(times_ns):
+        if previous is not None:
+            k = bisect_left(times_ns, previous + interval_ns, k)
+            if k == len(times_ns):
+                break
+        bars.append(k)
+        previous = times_ns[k]
+        k += 1
+    return bars
+
+
+def position_state(bar: int, position: Position, balance: float) -> tuple:
+    """
+    Snapshot of balance and position after bar, as used by mark_to_market.
+    """
+    if not position.side:
+        return bar, balance, 0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+    return (
+        bar,
+        balance,
+        1 if position.side == "long" else -1,
+        position.amount,
+        position.open_price,
+        position.initial_margin,
+        position.open_fee,
+        position.open_notional_value,
+        position.close_fee_rate,
+    )
+
+
+def mark_to_market(states: List[tuple], bars: np.ndarray, closes: np.ndarray) -> np.ndarray:
+    """
+    Equity at the given bars, computed like compute_equity from the position_state snapshots (sorted by bar).
+    """
+    columns = np.array(states, dtype=float).T
+    state_bars, balance, side, amount, open_price, initial_margin, open_fee, open_notional_value, close_fee_rate = columns
+    k = np.searchsorted(state_bars, bars, side="right") - 1
+    price = closes[bars]
+
+    side = side[k]
+    unrealized_pnl = np.where(side > 0, amount[k] * (price - open_price[k]), amount[k] * (open_price[k] - price))
+    close_fee = (open_notional_value[k] + unrealized_pnl) * close_fee_rate[k]
+    position_value = initial_margin[k] + unrealized_pnl - open_fee[k] - close_fee
+    return np.where(side != 0, balance[k] + position_value, balance[k])
+
+
+class BacktestPruned(Exception):
+    """
+    Ends a backtest early, status tells why ("liquidated", "max_drawdown" or "min_equity").
+    """
+
+    def __init__(self, status: str) -> None:
+        super().__init__(status)
+        self.status = status
+
+
+class LazyColumns(dict):
+    """
+    Column lists of a DataFrame, converted with tolist the first time they are accessed.
+    """
+
+    def __init__(self, data: pd.DataFrame) -> None:
+        super().__init__()
+        self.data = data
+
+    def __missing__(self, key: str) -> List[Any]:
+        values = self.data[key].tolist()
+        self[key] = values
+        return values
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data.columns
+
+
+class BarView:
+    """
+    Read-only row of the column arrays of a backtest, indexed like the Series given by DataFrame.iterrows.
+    """
+    __slots__ = ("columns", "i")
+
+    def __init__(self, columns: Dict[str, List[Any]], i: int = 0) -> None:
+        self.columns = columns
+        self.i = i
+
+    def __getitem__(self, key: str) -> Any:
+        return self.columns[key][self.i]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.columns
+
+
+class BacktestEngine(ABC):
+    """
+    Owns the bar loop, the balance, the Position lifecycle and the results of a backtest.
+    Strategies populate their indicator and signal columns and decide, bar per bar, in evaluate_orders.
+
+    Engines:
+        "rows": evaluate_orders is called with each row of DataFrame.iterrows.
+        "arrays": the columns are pulled once into python lists by prepare_arrays and evaluate_bar is
+            called with the bar index. By default evaluate_bar hands a BarView to evaluate_orders.
+        "events": same as "arrays", but the loop jumps straight to the next bar where something can happen,
+            see event_columns, can_skip and position_trigger_levels.
+        "vectorized": for strategies holding a single position with levels set at the entry, only available
+            if listed in their valid_engines, see vectorized_rules. The exit of a position opened on each entry
+            bar is found beforehand with level searches over the whole arrays (see LevelSearch), the loop then
+            goes from trade to trade and evaluate_orders is not called.
+
+    Equity: the engines only snapshot position and balance on the bars that change them. The equity record
+    is then marked to market in one go, at the equity_update_interval of the strategy, and equity_curve
+    rebuilds it at any other interval.
+
+    Pruning: run_backtest can end a hopeless backtest early, when the equity record falls max_drawdown
+    below its peak or down to min_equity, and with prune_liquidation a liquidation closes the position
+    and ends the backtest instead of exiting the process. status tells how the backtest ended
+    ("completed", "liquidated", "max_drawdown" or "min_equity"), the results stop at the pruned bar.
+    """
+    equity_update_interval = pd.Timedelta(hours=6)
+    record_tp_price = False
+    valid_engines = ("rows", "arrays", "events")
+    event_scan_chunk = 64
+    # OHLCV columns read by the strategy (the engines check the position levels against the high and low and
+    # mark it to market at the close), the other columns of the ohlcv are not carried by its data
+    required_columns = ("high", "low", "close")
+
+    def __init__(self, params: Dict[str, Any], ohlcv: pd.DataFrame) -> None:
+        self.params = params
+        missing_columns = [column for column in self.required_columns if column not in ohlcv.columns]
+        if missing_columns:
+            raise ValueError(f"The ohlcv misses the columns {', '.join(missing_columns)} of the strategy.")
+        # Only the required columns, not copied: the indicator columns are added to this frame only, the OHLCV
+        # columns are shared (e.g. with the memory maps of DataManager.load_arrays)
+        self.data = pd.DataFrame({column: ohlcv[column] for column in self.required_columns}, copy=False)
+        self.data_fingerprint = None
+
+        self.populate_indicators()
+        self.set_trade_mode()
+        self.reset_state()
+
+    # --- Trade Mode ---
+    def set_trade_mode(self) -> None:
+        self.params.setdefault("mode", "both")
+
+        valid_modes = ("long", "short", "both")
+        if self.params["mode"] not in valid_modes:
+            raise ValueError(f"Wrong strategy mode. Can either be {', '.join(valid_modes)}.")
+
+        self.ignore_shorts = self.params["mode"] == "long"
+        self.ignore_longs = self.params["mode"] == "short"
+
+        if not self.ignore_longs:
+            self.populate_long_signals()
+        if not self.ignore_shorts:
+            self.populate_short_signals()
+
+    # --- Strategy hooks ---
+    @abstractmethod
+    def populate_indicators(self) -> None:
+        pass
+
+    @abstractmethod
+    def populate_long_signals(self) -> None:
+        pass
+
+    @abstractmethod
+    def populate_short_signals(self) -> None:
+        pass
+
+    @abstractmethod
+    def evaluate_orders(self, time: datetime, row) -> None:
+        pass
+
+    def indicator(self, name: str, params: Dict[str, Any], compute) -> pd.Series:
+        """
+        compute() memoized in the shared IndicatorCache, keyed by the fingerprint of the OHLCV, name and params.
+        """
+        if self.data_fingerprint is None:
+            self.data_fingerprint = fingerprint(self.data)
+        return INDICATOR_CACHE.get(self.data_fingerprint, name, params, compute)
+
+    def reset_state(self) -> None:
+        """
+        Resets the strategy specific state, called before each backtest.
+        """
+        pass
+
+    def prepare_arrays(self) -> None:
+        self.arrays = LazyColumns(self.data)
+        self.arrays_time = self.data.index
+        self._bar = BarView(self.arrays)
+
+    def evaluate_bar(self, i: int) -> None:
+        self._bar.i = i
+        self.evaluate_orders(self.arrays_time[i], self._bar)
+
+    # --- Events ---
+    def event_columns(self) -> Optional[Dict[str, List[str]]]:
+        """
+        Signal columns for the "events" engine:
+            "entry": columns that can open (or add to) a position, evaluated whatever the position.
+            "long" / "short": extra columns that can act on an open long / short position.
+        None means that every bar has to be evaluated.
+        """
+        return None
+
+    def can_skip(self) -> bool:
+        """
+        Whether bars without event can be skipped in the current strategy state.
+        """
+        return True
+
+    def position_trigger_levels(self) -> tuple:
+        """
+        (low_level, high_level) of the open position: a bar can act on it only if low <= low_level or high >= high_level.
+        """
+        levels = [self.position.sl_price, self.position.liquidation_price]
+        levels = [level for level in levels if level is not None]
+        tp_price = self.position.tp_price
+        if self.position.side == "long":
+            return max(levels, default=-np.inf), np.inf if tp_price is None else tp_price
+        return -np.inf if tp_price is None else tp_price, min(levels, default=np.inf)
+
+    def _prepare_events(self) -> None:
+        columns = self.event_columns()
+        if columns is None:
+            self._events = None
+            return
+
+        def signal_index(names):
+            names = [name for name in names if name in self.data.columns]
+            mask = self.data[names].fillna(False).astype(bool).any(axis=1) if names else pd.Series(False, index=self.data.index)
+            return np.flatnonzero(mask.to_numpy())
+
+        entry = columns.get("entry", [])
+        self._events = {
+            None: signal_index(entry),
+            "long": signal_index(entry + columns.get("long", [])),
+            "short": signal_index(entry + columns.get("short", [])),
+        }
+        self._lows = self.data["low"].to_numpy(dtype=float)
+        self._highs = self.data["high"].to_numpy(dtype=float)
+
+    def _next_event(self, start: int) -> int:
+        n_bars = len(self._times_ns)
+        if start >= n_bars or self._events is None or not self.can_skip():
+            return start
+
+        stop = next_index(self._events[self.position.side], start, n_bars)
+        if self.position.side is None:
+            return stop
+
+        low_level, high_level = self.position_trigger_levels()
+        return first_touch(self._lows, self._highs, start, stop, low_level, high_level, self.event_scan_chunk)
+
+    # --- Vectorized ---
+    # Exits of the "vectorized" engine, checked in this order on each bar of an open position, the first one that
+    # applies closes it: "sl", "liquidation" and "tp" when the low or high reaches the level of the position,
+    # "signal" when the exit column of vectorized_rules is set
+    vectorized_exits = ("sl", "liquidation", "tp", "signal")
+
+    def prepare_vectorized(self) -> None:
+        """
+        Precomputes what the strategy needs in vectorized_rules and vectorized_reentry, called before a
+        "vectorized" backtest.
+        """
+        pass
+
+    def vectorized_rules(self, side: str) -> Dict[str, Any]:
+        """
+        Positions of side for the "vectorized" engine, the same as evaluate_orders opens and closes:
+            "entry": signal column, a flat strategy opens side at the close of its bars
+            "exit": signal column, closes the position at the close of its bars
+            "sl_price" / "tp_price": array of the level of a position opened on each bar, None if there is none
+            "reasons": reason of the trades, by "open" and by exit
+        Positions are sized with calculate_initial_margin(balance, price, sl_price).
+        """
+        raise ValueError("The vectorized engine needs the vectorized_rules of the strategy.")
+
+    def vectorized_reentry(self, side: str, exit_rule: str, bar: int) -> Optional[int]:
+        """
+        First bar where a position can be opened after the position of side was closed by exit_rule on bar,
+        None if no position gets opened anymore.
+        """
+        return bar + 1
+
+    # --- Positions ---
+    def open_trade(
+            self,
+            time: datetime,
+            side: str,
+            initial_margin: float,
+            price: float,
+            reason: str,
+            sl_price: Optional[float] = None,
+            tp_price: Optional[float] = None,
+    ) -> None:
+        self.balance -= initial_margin
+        self.position.open(time, side, initial_margin, price, reason, sl_price, tp_price)
+        self._changed = True
+
+    def add_to_trade(self, initial_margin: float, price: float, reason: str) -> None:
+        self.balance -= initial_margin
+        self.position.add(initial_margin, price, reason)
+        self._changed = True
+
+    def close_trade(self, time: datetime, price: float, reason: str) -> None:
+        self.position.close(time, price, reason)
+        open_balance = self.balance
+        self.balance += self.position.initial_margin + self.position.net_pnl
+        self.ledger.append(self.position, open_balance, self.balance)
+        self._changed = True
+
+    @property
+    def trades_info(self) -> pd.DataFrame:
+        """
+        DataFrame of the closed trades, built from the ledger the first time it is accessed after a backtest.
+        """
+        if self._trades_info is None:
+            self._trades_info = self.ledger.to_frame(drop=() if self.record_tp_price else ("tp_price",))
+        return self._trades_info
+
+    # --- Pruning ---
+    def liquidate(self, time: datetime) -> None:
+        """
+        Called by the strategies when the position gets liquidated.
+        """
+        if not self.prune_liquidation:
+            print(f"Your {self.position.side} was liquidated on the {time} (price = {self.position.liquidation_price})")
+            sys.exit()
+
+        self.close_trade(time, self.position.liquidation_price, f"Liquidation {self.position.side}")
+        raise BacktestPruned("liquidated")
+
+    def check_pruning(self, equity: float) -> None:
+        """
+        Called with each value of the equity record, raises BacktestPruned if a pruning rule is broken.
+        """
+        self._equity_peak = max(self._equity_peak, equity)
+        if self.min_equity is not None and equity <= self.min_equity:
+            raise BacktestPruned("min_equity")
+        if self.max_drawdown is not None and equity <= self._equity_peak * (1 - self.max_drawdown):
+            raise BacktestPruned("max_drawdown")
+
+    # --- Backtest ---
+    def window(self, start=None, end=None) -> "BacktestEngine":
+        """
+        Copy of the strategy that backtests only the bars between the index labels start and end (both included).
+        Indicators and signals are not recomputed: they keep the values computed over the whole history,
+        so overlapping windows share them and the first bars of a window are already warmed up.
+        """
+        strategy = copy.copy(self)
+        strategy.data = self.data.loc[start:end]
+        return strategy
+
+    def run_backtest(
+            self,
+            initial_balance: float = 1000,
+            leverage: float = 1,
+            open_fee_rate: Optional[float] = None,
+            close_fee_rate: Optional[float] = None,
+            engine: str = "rows",
+            fee_rate: float = 0.001,
+            max_drawdown: Optional[float] = None,
+            min_equity: Optional[float] = None,
+            prune_liquidation: bool = False,
+    ) -> None:
+        if engine not in self.valid_engines:
+            raise ValueError(f"Wrong backtest engine. Can either be {', '.join(self.valid_engines)}.")
+
+        self.start_backtest(initial_balance, leverage, open_fee_rate, close_fee_rate, fee_rate, max_drawdown, min_equity,
+                            prune_liquidation)
+        if engine == "rows":
+            self._run_rows()
+        elif engine == "vectorized":
+            self._run_vectorized()
+        else:
+            self._run_arrays(events=engine == "events")
+        self.finish_backtest()
+
+    def start_backtest(
+            self,
+            initial_balance: float = 1000,
+            leverage: float = 1,
+            open_fee_rate: Optional[float] = None,
+            close_fee_rate: Optional[float] = None,
+            fee_rate: float = 0.001,
+            max_drawdown: Optional[float] = None,
+            min_equity: Optional[float] = None,
+            prune_liquidation: bool = False,
+    ) -> None:
+        """
+        Resets the balance, position and results before the bar loop of a backtest, see run_backtest.
+        """
+        self.reset_state()
+        self.max_drawdown = max_drawdown
+        self.min_equity = min_equity
+        self.prune_liquidation = prune_liquidation
+        self._pruning = max_drawdown is not None or min_equity is not None
+        self._equity_peak = -np.inf
+        self.status = "completed"
+        self.initial_balance = initial_balance
+        self.balance = initial_balance
+        self.position = Position(leverage=leverage, fee_rate=fee_rate, open_fee_rate=open_fee_rate, close_fee_rate=close_fee_rate)
+        self.ledger = TradeLedger(tz=self.data.index.tz)
+        self._trades_info = None
+        self._times = self.data.index
+        self._times_ns = self._times.asi8
+        self._states = [position_state(0, self.position, self.balance)]
+        self._changed = False
+        self._end_bar = len(self.data) - 1
+        self._step_bar = 0
+        if self._pruning:
+            self._check_bars = equity_sample_bars(self._times_ns.tolist(), self.equity_update_interval.value)
+            self._closes = self.data["close"].to_numpy(dtype=float).tolist()
+
+    def step(self, i: int) -> bool:
+        """
+        Evaluates bar i in a bar loop driven from outside of the strategy (see envelope.BatchStrategy), between
+        start_backtest and finish_backtest. The bars skipped since the previous step must be bars where evaluate_bar
+        does nothing. Returns False once the backtest is over (liquidated or pruned).
+        """
+        try:
+            self._after_bar(self._step_bar, i)  # the equity samples since the previous step
+            self._end_bar = self._step_bar = i
+            self.evaluate_bar(i)
+        except BacktestPruned as pruned:
+            self._prune(pruned)
+            return False
+        if self._changed:
+            self._log_state(i)
+        return True
+
+    def finish_backtest(self) -> None:
+        """
+        Marks the equity record to market after the bar loop and applies the pruning rules to it.
+        """
+        if self.status == "completed":
+            self._end_bar = len(self.data) - 1
+
+        bars = self._sample_bars(self.equity_update_interval)
+        equity = mark_to_market(self._states, bars, self._close_array())
+        if self._pruning:  # same rules as check_pruning, for the engines that do not check while looping
+            checked = len(bars) - 1 if self.status != "completed" else len(bars)
+            breach = pruning_breach(equity[:checked], self.max_drawdown, self.min_equity)
+            if breach is not None:
+                sample, self.status = breach
+                bars, equity = bars[:sample + 1], equity[:sample + 1]
+                self._end_bar = int(bars[-1])
+                self.ledger.truncate(self._times[self._end_bar])
+
+        self.equity_record = self._equity_frame(bars, equity)
+        self.final_equity = round(self.equity_record.iloc[-1]["equity"], 2)
+        self.pruned_time = None if self.status == "completed" else self.equity_record.index[-1]
+
+    def equity_curve(self, interval=None) -> pd.DataFrame:
+        """
+        Equity of the last backtest, marked to market at the close of one bar per interval ("1h", "6h", "1d",
+        a Timedelta, 0 for every bar, the equity_update_interval of the strategy by default).
+        Rebuilt from the position snapshots of the backtest, without running it again.
+        """
+        interval = self.equity_update_interval if interval is None else pd.Timedelta(interval)
+        bars = self._sample_bars(interval)
+        return self._equity_frame(bars, mark_to_market(self._states, bars, self._close_array()))
+
+    def _sample_bars(self, interval: pd.Timedelta) -> np.ndarray:
+        times_ns = self._times_ns[:self._end_bar + 1]
+        if interval.value == 0:
+            bars = np.arange(len(times_ns))
+        else:
+            bars = np.array(equity_sample_bars(times_ns.tolist(), interval.value), dtype=np.int64)
+        if self.status != "completed" and bars[-1] != self._end_bar:  # the equity record ends on the pruned bar
+            bars = np.append(bars, self._end_bar)
+        return bars
+
+    def _close_array(self) -> np.ndarray:
+        return self.data["close"].to_numpy(dtype=float)
+
+    def _equity_frame(self, bars: np.ndarray, equity: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame({
+            "time": self._times[bars],
+            "price": self._close_array()[bars],
+            "equity": equity,
+        }).set_index("time")
+
+    def _log_state(self, bar: int) -> None:
+        self._states.append(position_state(bar, self.position, self.balance))
+        self._changed = False
+
+    def _after_bar(self, i: int, stop: int) -> None:
+        """
+        Snapshots position and balance if bar i changed them, then checks the pruning rules on the
+        equity samples of [i, stop), over which position and balance do not change.
+        """
+        if self._changed:
+            self._log_state(i)
+        if self._pruning:
+            bars = self._check_bars
+            for k in bars[bisect_left(bars, i):bisect_left(bars, stop)]:
+                self._end_bar = k
+                self.check_pruning(compute_equity(self.position, self.balance, self._closes[k]))
+
+    def _prune(self, pruned: BacktestPruned) -> None:
+        if self._changed:
+            self._log_state(self._end_bar)
+        self.status = pruned.status
+
+    def _run_rows(self) -> None:
+        for i, (time, row) in enumerate(self.data.iterrows()):
+            self._end_bar = i
+            try:
+                self.evaluate_orders(time, row)
+                self._after_bar(i, i + 1)
+            except BacktestPruned as pruned:
+                self._prune(pruned)
+                break
+
+    def _run_arrays(self, events: bool = False) -> None:
+        self.prepare_arrays()
+        if events:
+            self._prepare_events()
+
+        i = 0
+        n_bars = len(self._times_ns)
+        while i < n_bars:
+            self._end_bar = i
+            try:
+                self.evaluate_bar(i)
+                next_i = self._next_event(i + 1) if events else i + 1
+                self._after_bar(i, next_i)
+            except BacktestPruned as pruned:
+                self._prune(pruned)
+                break
+            i = next_i
+
+    def _run_vectorized(self) -> None:
+        self.prepare_vectorized()
+        self._low_search = LevelSearch(self.data["low"].to_numpy(dtype=float))
+        self._high_search = LevelSearch(self.data["high"].to_numpy(dtype=float), above=True)
+        sides = [side for side, ignored in (("long", self.ignore_longs), ("short", self.ignore_shorts)) if not ignored]
+        rules = {side: self.vectorized_rules(side) for side in sides}
+        trades = {side: self._vectorized_trades(side, rules[side]) for side in sides}
+
+        # Entry bars of both sides, with the side and trade they open (a long when both sides enter, like evaluate_orders)
+        entry_bars = np.unique(np.concatenate([trades[side]["entry"] for side in sides]))
+        entry_sides = [sides[-1]] * len(entry_bars)
+        entry_trades = np.searchsorted(trades[sides[-1]]["entry"], entry_bars).tolist()
+        if len(sides) == 2:
+            longs = np.isin(entry_bars, trades["long"]["entry"])
+            entry_sides = np.where(longs, "long", "short").tolist()
+            entry_trades = np.where(longs, np.searchsorted(trades["long"]["entry"], entry_bars), entry_trades).tolist()
+        entry_bars = entry_bars.tolist()
+        trades = {side: {name: values.tolist() for name, values in trades[side].items()} for side in sides}
+        times = self._times_ns.view("M8[ns]")
+
+        n_bars = len(self._times_ns)
+        start = 0
+        try:
+            while (k := bisect_left(entry_bars, start)) < len(entry_bars):
+                side, j = entry_sides[k], entry_trades[k]
+                trade = trades[side]
+                reasons = rules[side]["reasons"]
+
+                bar = self._end_bar = trade["entry"][j]
+                price, sl_price, tp_price = trade["price"][j], trade["sl_price"][j], trade["tp_price"][j]
+                sl_price = None if np.isnan(sl_price) else sl_price
+                tp_price = None if np.isnan(tp_price) else tp_price
+                initial_margin = self.calculate_initial_margin(self.balance, price, sl_price)
+                self.open_trade(times[bar], side, initial_margin, price, reasons["open"], sl_price, tp_price)
+                self._log_state(bar)
+
+                bar = trade["exit"][j]
+                if bar == n_bars:  # still open at the end
+                    break
+                self._end_bar = bar
+                exit_rule = self.vectorized_exits[trade["exit_rule"][j]]
+                if exit_rule == "liquidation":
+                    self.liquidate(self._times[bar])  # exits, or ends the backtest with prune_liquidation
+                self.close_trade(times[bar], trade["exit_price"][j], reasons[exit_rule])
+                self._log_state(bar)
+                start = self.vectorized_reentry(side, exit_rule, bar)
+                if start is None:
+                    break
+        except BacktestPruned as pruned:
+            self._prune(pruned)
+
+    def _vectorized_trades(self, side: str, rules: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """
+        Entry bars of side and, for a position opened on each of them, its price and levels (NaN if there is none)
+        and the bar, exit rule (index in vectorized_exits) and price of its exit. The exit bar is len(data) when
+        the position is never closed.
+        """
+        closes = self._close_array()
+        n_bars = len(closes)
+
+        def signal_index(column):
+            return np.flatnonzero(self.data[column].fillna(False).to_numpy(dtype=bool))
+
+        entries = signal_index(rules["entry"])
+        prices = closes[entries]
+        behavior = LONG_BEHAVIOR if side == "long" else SHORT_BEHAVIOR
+        levels = {
+            "sl": None if rules["sl_price"] is None else np.asarray(rules["sl_price"], dtype=float)[entries],
+            "tp": None if rules["tp_price"] is None else np.asarray(rules["tp_price"], dtype=float)[entries],
+            "liquidation": behavior.calculate_liquidation_price(self.position, prices),
+        }
+
+        # First bar after the entry where each exit applies: a long is stopped by the lows and takes its profit on
+        # the highs, a short the other way round
+        starts = entries + 1
+        exit_bars, exit_prices = [], []
+        for rule in self.vectorized_exits:
+            if rule == "signal":
+                signals = np.append(signal_index(rules["exit"]), n_bars)
+                exit_bars.append(signals[np.searchsorted(signals, starts)])
+                exit_prices.append(closes[np.minimum(exit_bars[-1], n_bars - 1)])
+            elif levels[rule] is None:
+                exit_bars.append(np.full(len(entries), n_bars))
+                exit_prices.append(np.full(len(entries), np.nan))
+            else:
+                search = self._low_search if (side == "long") == (rule != "tp") else self._high_search
+                exit_bars.append(search.first(starts, levels[rule]))
+                exit_prices.append(levels[rule])
+        exit_bars = np.array(exit_bars, dtype=np.int64).reshape(len(self.vectorized_exits), len(entries))
+        exits = exit_bars.min(axis=0)
+        exit_rules = np.argmax(exit_bars == exits, axis=0)  # the first one in the order of vectorized_exits
+        return {
+            "entry": entries,
+            "price": prices,
+            "sl_price": np.full(len(entries), np.nan) if levels["sl"] is None else levels["sl"],
+            "tp_price": np.full(len(entries), np.nan) if levels["tp"] is None else levels["tp"],
+            "exit": exits,
+            "exit_rule": exit_rules,
+            "exit_price": np.choose(exit_rules, exit_prices),
+        }
+
+    # --- Save results ---
+    def save_equity_record(self, path: str) -> None:
+        self.equity_record.to_csv(path + '_equity_record.csv', header=True, index=True)
+
+    def save_trades_info(self, path: str) -> None:
+        self.trades_info.to_csv(path + '_trades_info.csv', header=True, index=True)
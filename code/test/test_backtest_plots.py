@@ -0,0 +1,78 @@
+# test_backtest_plots.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies import MACDcross, simple_sma
+from utilities import backtest_plots
+from utilities.backtest_analysis import BacktestAnalysis
+
+STRATEGIES = [
+    (simple_sma, {"fast_ma_period": 10, "slow_ma_period": 30, "trend_ma_period": 60, "position_size_percentage": 100}),
+    (MACDcross, {"stop_loss_pct": 0.3, "position_size_fixed_amount": 1000}),
+]
+
+
+class Chart:
+    """
+    Records what a JupyterChart is given.
+    """
+    frames = []
+
+    def __init__(self, **kwargs):
+        self.markers = 0
+
+    def set(self, df):
+        Chart.frames.append(df)
+
+    def create_line(self, *args, **kwargs):
+        return self
+
+    def marker(self, **kwargs):
+        self.markers += 1
+
+    def load(self):
+        pass
+
+
+def ohlcv(rows: int = 600) -> pd.DataFrame:
+    index = pd.date_range("2024-01-01", periods=rows, freq="4h", name="date")
+    close = 100 + np.random.default_rng(0).normal(0, 1, rows).cumsum()
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+@pytest.mark.parametrize("strategy_module, params", STRATEGIES)
+def test_plot_candlestick_of_a_projected_strategy(strategy_module, params, monkeypatch):
+    monkeypatch.setattr(backtest_plots, "JupyterChart", Chart)
+    Chart.frames = []
+    strategy = strategy_module.Strategy(params, ohlcv())
+    strategy.run_backtest(initial_balance=1000, leverage=1, fee_rate=0.0006)
+    assert "volume" not in strategy.data.columns
+
+    BacktestAnalysis(strategy).plot_candlestick()
+    assert {"open", "high", "low", "close"} <= set(Chart.frames[0].columns)
+
+
+def test_plot_candlestick_without_open_raises():
+    with pytest.raises(ValueError, match="open"):
+        backtest_plots.plot_candlestick(pd.DataFrame(), ohlcv().drop(columns="open"))
+
+
+def test_plot_candlestick_with_volume(monkeypatch, capsys):
+    monkeypatch.setattr(backtest_plots, "JupyterChart", Chart)
+    Chart.frames = []
+    backtest_plots.plot_candlestick(pd.DataFrame(columns=["open_time", "close_time"]), ohlcv(), show_volume=True)
+    assert "volume" in Chart.frames[0].columns
+
+    strategy = simple_sma.Strategy(dict(STRATEGIES[0][1]), ohlcv())
+    strategy.run_backtest(initial_balance=1000, leverage=1, fee_rate=0.0006)
+    BacktestAnalysis(strategy).plot_candlestick(show_volume=True)  # the projected data has no volume: no volume pane
+    assert "volume" not in Chart.frames[1].columns
+    assert "without the volume pane" in capsys.readouterr().out
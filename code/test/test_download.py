@@ -0,0 +1,158 @@
+# test_download.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import asyncio
+import time
+
+import ccxt
+import numpy as np
+import pandas as pd
+import pytest
+
+from utilities import throughput
+from utilities.data_manager import DataManager, shard_ranges
+
+INTERVAL_MS = 4 * 3600 * 1000
+
+
+class FakeExchange:
+    """
+    Serves the pages of an OHLCV history like ccxt, the last bar being the candle still open.
+    """
+    rateLimit = 1
+    markets = None
+
+    def __init__(self, ohlcv: pd.DataFrame) -> None:
+        self.rows = [[int(ms)] + values for ms, values in zip(ohlcv.index.asi8 // 10**6, ohlcv.to_numpy().tolist())]
+        self.since = []
+
+    def set_markets(self, markets):
+        self.markets = markets
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.since.append(since)
+        return [row for row in self.rows if row[0] >= since][:limit]
+
+    def parse_timeframe(self, timeframe):
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self):
+        return self.rows[-1][0] + INTERVAL_MS
+
+
+class FakeAsyncExchange:
+    """
+    Async session serving an OHLCV history per symbol, counting the requests in flight at once.
+    """
+    rateLimit = 1
+
+    def __init__(self, histories: dict, failing: tuple = ()) -> None:
+        self.exchanges = {symbol: FakeExchange(ohlcv) for symbol, ohlcv in histories.items()}
+        self.failing = failing
+        self.in_flight = self.max_in_flight = 0
+        self.closed = False
+
+    async def load_markets(self):
+        return {symbol: {"symbol": symbol} for symbol in self.exchanges}
+
+    def set_markets(self, markets):
+        self.markets = markets
+
+    async def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if symbol in self.failing:
+            raise RuntimeError(f"{symbol} is unavailable")
+        return self.exchanges[symbol].fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def parse_timeframe(self, timeframe):
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self):
+        return max(exchange.milliseconds() for exchange in self.exchanges.values())
+
+    async def close(self):
+        self.closed = True
+
+
+def ohlcv(rows: int, start: str = "2024-01-01") -> pd.DataFrame:
+    index = pd.date_range(start, periods=rows, freq="4h", name="date")
+    close = np.linspace(100, 200, rows)
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+def data_manager(tmp_path: Path, exchange) -> DataManager:
+    data = DataManager("binance", storage="parquet")
+    data.path = tmp_path
+    data.markets = {"BTC/USDT": {}}
+    data.available_symbols = ["BTC/USDT"]
+    data.exchange = exchange
+    data.controller = throughput.ThroughputController("binance", rate=1000, max_rate=1000)
+    return data
+
+
+@pytest.fixture
+def new_york_time(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_incremental_download_west_of_utc_fetches_from_the_last_stored_bar(tmp_path, new_york_time):
+    history = ohlcv(151)
+    exchange = FakeExchange(history)
+    data = data_manager(tmp_path, exchange)
+    data.save_to_master_db(history.iloc[:100], "BTC/USDT", "4h")
+
+    data.download("BTC/USDT", "4h", incremental=True)
+
+    assert exchange.since[0] == history.index[99].value // 10**6 + 1
+    pd.testing.assert_frame_equal(data.load("BTC/USDT", "4h"), history.iloc[:150], check_freq=False)
+
+
+def test_download_many_downloads_every_symbol_concurrently(tmp_path):
+    histories = {"BTC/USDT": ohlcv(500), "ETH/USDT": ohlcv(300, "2024-02-01"), "SOL/USDT": ohlcv(400)}
+    exchange = FakeAsyncExchange(histories, failing=("SOL/USDT",))
+    data = data_manager(tmp_path, FakeExchange(histories["BTC/USDT"]))
+    data.controller = throughput.ThroughputController("binance", rate=1000, max_rate=1000, page_size=100)
+    data._async_exchange = lambda: exchange
+
+    report = data.download_many(list(histories) + ["DOGE/USDT"], ["4h"], start_date="2023-12-01 00:00:00", max_concurrency=2)
+
+    assert report["symbol"].tolist() == ["BTC/USDT", "ETH/USDT", "SOL/USDT", "DOGE/USDT"]
+    assert report["rows"].tolist() == [499, 299, 0, 0]
+    assert report["error"][:2].isna().all()
+    assert "SOL/USDT is unavailable" in report["error"][2] and "DOGE/USDT" in report["error"][3]
+    assert exchange.max_in_flight == 2 and exchange.closed
+    for symbol in ("BTC/USDT", "ETH/USDT"):
+        pd.testing.assert_frame_equal(data.load(symbol, "4h"), histories[symbol].iloc[:-1], check_freq=False)
+
+
+def test_shard_ranges_split_whole_bars():
+    ranges = shard_ranges(INTERVAL_MS + 1, 10 * INTERVAL_MS + 5, INTERVAL_MS, 4)
+    assert ranges == [(2 * INTERVAL_MS, 5 * INTERVAL_MS), (5 * INTERVAL_MS, 8 * INTERVAL_MS), (8 * INTERVAL_MS, 10 * INTERVAL_MS + 5)]
+    assert shard_ranges(INTERVAL_MS, INTERVAL_MS, INTERVAL_MS, 4) == []
+
+
+def test_backfill_merges_the_shards_and_counts_the_missing_bars(tmp_path):
+    history = ohlcv(600)
+    served = history.drop(history.index[300:306])
+    exchange = FakeAsyncExchange({"BTC/USDT": served})
+    data = data_manager(tmp_path, FakeExchange(served))
+    data._async_exchange = lambda: exchange
+
+    report = data.backfill("BTC/USDT", "4h", "2023-12-01 00:00:00", "2024-05-01 00:00:00", shards=4)
+
+    assert len(report) == 4 and exchange.max_in_flight > 1
+    assert report["missing_bars"].tolist() == [0, 0, 6, 0]
+    assert report["rows"].sum() == len(served)
+    pd.testing.assert_frame_equal(data.load("BTC/USDT", "4h"), served.iloc[:-1], check_freq=False)
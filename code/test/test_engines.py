@@ -0,0 +1,144 @@
+# test_engines.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import copy
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies import MACDcross, envelope, simple_sma
+from strategies import tools as ut
+
+DATA_PATH = CODE_PATH / "data" / "4h" / "BTC-USDT.csv"
+
+# name -> (strategy module, params, run_backtest arguments)
+CASES = {
+    "env_both": (envelope, {"average_type": "DCM", "average_period": 5, "envelopes": [0.03, 0.05, 0.07], "stop_loss_pct": 0.2, "position_size_percentage": 100},
+                 {"leverage": 1, "open_fee_rate": 0.0002, "close_fee_rate": 0.0006}),
+    "env_jump": (envelope, {"average_type": "SMA", "average_period": 5, "envelopes": [0.02, 0.04, 0.06, 0.08], "stop_loss_pct": 0.1, "price_jump_pct": 0.05, "position_size_percentage": 100},
+                 {"leverage": 2, "open_fee_rate": 0.0002, "close_fee_rate": 0.0006}),
+    "env_long": (envelope, {"average_type": "EMA", "average_period": 10, "envelopes": [0.03, 0.06], "stop_loss_pct": 0.15, "position_size_fixed_amount": 500, "mode": "long"},
+                 {"leverage": 1, "open_fee_rate": 0.0002, "close_fee_rate": 0.0006}),
+    "macd": (MACDcross, {"fast_ma": 12, "slow_ma": 26, "signal_ma": 9, "stop_loss_pct": 0.05, "position_size_percentage": 100},
+             {"leverage": 1, "open_fee_rate": 0.0002, "close_fee_rate": 0.0006}),
+    "macd_fixed": (MACDcross, {"fast_ma": 20, "slow_ma": 50, "signal_ma": 9, "stop_loss_pct": 0.03, "position_size_fixed_amount": 800},
+                   {"leverage": 1, "open_fee_rate": 0.0002, "close_fee_rate": 0.0006}),
+    "sma": (simple_sma, {"fast_ma_period": 10, "slow_ma_period": 30, "trend_ma_period": 100, "position_size_percentage": 100},
+            {"leverage": 1, "fee_rate": 0.001}),
+    "sma_fixed": (simple_sma, {"fast_ma_period": 5, "slow_ma_period": 20, "trend_ma_period": 50, "position_size_fixed_amount": 500},
+                  {"leverage": 1, "fee_rate": 0.001}),
+    "sma_long": (simple_sma, {"fast_ma_period": 5, "slow_ma_period": 20, "trend_ma_period": 50, "position_size_fixed_amount": 500, "mode": "long"},
+                 {"leverage": 2, "fee_rate": 0.001}),
+    "sma_liquidated": (simple_sma, {"fast_ma_period": 10, "slow_ma_period": 30, "trend_ma_period": 100, "position_size_percentage": 100},
+                       {"leverage": 10, "fee_rate": 0.001, "prune_liquidation": True}),
+    "env_liquidated": (envelope, {"average_type": "DCM", "average_period": 5, "envelopes": [0.03, 0.05, 0.07], "stop_loss_pct": 0.2, "position_size_percentage": 100},
+                       {"leverage": 20, "open_fee_rate": 0.0002, "close_fee_rate": 0.0006, "prune_liquidation": True}),
+}
+ENGINES = ["arrays", "events", "vectorized"]
+# Total trades, final equity and net pnl of the cases before the shared BacktestEngine (iterrows in each strategy)
+GOLDEN = {
+    "env_both": (178, 1116.9, 136.31327698546107),
+    "env_jump": (337, 859.77, -108.85368320976849),
+    "env_long": (69, 1101.88, 110.45628764392488),
+    "macd": (116, 1276.15, 202.4571934988878),
+    "macd_fixed": (86, 1140.53, 140.53443568025486),
+    "sma": (45, 1371.11, 376.77538358206306),
+    "sma_fixed": (68, 1076.34, 77.34260925318736),
+    "sma_long": (47, 1479.87, 479.8697389198271),
+}
+
+
+@lru_cache(maxsize=None)
+def ohlcv() -> pd.DataFrame:
+    df = pd.read_csv(DATA_PATH, usecols=["date", "open", "high", "low", "close", "volume"], parse_dates=["date"])
+    return df.set_index("date").iloc[-3000:]
+
+
+def backtest(case: str, engine: str = "rows", **kwargs) -> ut.BacktestEngine:
+    module, params, arguments = CASES[case]
+    strategy = module.Strategy(copy.deepcopy(params), ohlcv())
+    strategy.run_backtest(engine=engine, **{**arguments, **kwargs})
+    return strategy
+
+
+@lru_cache(maxsize=None)
+def rows_backtest(case: str) -> ut.BacktestEngine:
+    return backtest(case)
+
+
+def assert_same_backtest(strategy: ut.BacktestEngine, expected: ut.BacktestEngine) -> None:
+    pd.testing.assert_frame_equal(strategy.trades_info, expected.trades_info)
+    pd.testing.assert_frame_equal(strategy.equity_record, expected.equity_record)
+    assert (strategy.final_equity, strategy.status) == (expected.final_equity, expected.status)
+
+
+@pytest.mark.parametrize("case", GOLDEN)
+def test_rows_engine_matches_the_golden_results(case):
+    strategy = rows_backtest(case)
+    n_trades, final_equity, net_pnl = GOLDEN[case]
+    assert (len(strategy.trades_info), strategy.final_equity) == (n_trades, final_equity)
+    assert strategy.trades_info["net_pnl"].sum() == pytest.approx(net_pnl, rel=1e-12)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("case", CASES)
+def test_engine_matches_the_rows_engine(case, engine):
+    if engine not in CASES[case][0].Strategy.valid_engines:
+        pytest.skip(f"{case} has no {engine} engine")
+    assert_same_backtest(backtest(case, engine), rows_backtest(case))
+
+
+@pytest.mark.parametrize("pruning", [{"max_drawdown": 0.1}, {"min_equity": 950}])
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("case", CASES)
+def test_pruned_engine_matches_the_pruned_rows_engine(case, engine, pruning):
+    if engine not in CASES[case][0].Strategy.valid_engines:
+        pytest.skip(f"{case} has no {engine} engine")
+    assert_same_backtest(backtest(case, engine, **pruning), backtest(case, **pruning))
+
+
+def test_liquidated_cases_end_on_the_liquidation():
+    for case in ("sma_liquidated", "env_liquidated"):
+        strategy = rows_backtest(case)
+        assert strategy.status == "liquidated"
+        assert strategy.trades_info["close_reason"].iloc[-1].startswith("Liquidation")
+        assert strategy.equity_record.index[-1] == strategy.trades_info["close_time"].iloc[-1]
+
+
+def test_level_search_finds_the_first_bar_reaching_the_level():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 1, 1000).cumsum()
+    starts = rng.integers(0, 1001, 500)
+    levels = values[np.minimum(starts, 999)] + rng.normal(0, 5, 500)
+
+    def expected(above):
+        reached = [np.flatnonzero(values[start:] >= level if above else values[start:] <= level) for start, level in zip(starts, levels)]
+        return [start + hits[0] if len(hits) else len(values) for start, hits in zip(starts, reached)]
+
+    assert ut.LevelSearch(values).first(starts, levels).tolist() == expected(False)
+    assert ut.LevelSearch(values, above=True).first(starts, levels).tolist() == expected(True)
+
+
+@pytest.mark.parametrize("mode, leverage, pruning", [("both", 20, {}), ("long", 5, {"max_drawdown": 0.2})])
+def test_envelope_batch_matches_single_runs(mode, leverage, pruning):
+    params_list = [
+        {"average_type": "SMA", "average_period": 5, "envelopes": envelopes, "stop_loss_pct": stop_loss_pct,
+         "position_size_percentage": 100, "mode": mode, **price_jump}
+        for envelopes in ([0.02, 0.04, 0.06], [0.05]) for stop_loss_pct in (0.05, 0.3) for price_jump in ({}, {"price_jump_pct": 0.04})
+    ]
+    batch = envelope.BatchStrategy(params_list, ohlcv())
+    batch.run_backtest(1000, leverage, 0.0002, 0.0006, **pruning)
+
+    for k, params in enumerate(params_list):
+        strategy = envelope.Strategy(copy.deepcopy(params), ohlcv())
+        strategy.run_backtest(1000, leverage, 0.0002, 0.0006, prune_liquidation=True, **pruning)
+        assert_same_backtest(batch.result(k), strategy)
+    assert batch.summary()["status"].tolist() == batch.status
+    assert set(batch.status) - {"completed"}  # liquidated or pruned configurations stop trading
@@ -0,0 +1,52 @@
+# test_equity_curve.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies import MACDcross, envelope
+from strategies import tools as ut
+
+STRATEGIES = [
+    (envelope, {"average_type": "SMA", "average_period": 5, "envelopes": [0.02, 0.04], "stop_loss_pct": 0.1, "position_size_percentage": 100}),
+    (MACDcross, {"stop_loss_pct": 0.05, "position_size_fixed_amount": 500}),
+]
+
+
+def ohlcv(rows: int = 1500) -> pd.DataFrame:
+    index = pd.date_range("2024-01-01", periods=rows, freq="1h", name="date")
+    close = 100 + np.random.default_rng(0).normal(0, 1, rows).cumsum()
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+@pytest.mark.parametrize("strategy_module, params", STRATEGIES)
+def test_equity_curve_matches_the_equity_computed_on_every_bar(strategy_module, params):
+    strategy = strategy_module.Strategy(dict(params), ohlcv())
+    equity = []
+    evaluate_orders = strategy.evaluate_orders
+
+    def evaluate_and_compute_equity(time, row):
+        evaluate_orders(time, row)
+        equity.append(ut.compute_equity(strategy.position, strategy.balance, row["close"]))
+
+    strategy.evaluate_orders = evaluate_and_compute_equity
+    strategy.run_backtest(initial_balance=1000, leverage=2, open_fee_rate=0.0002, close_fee_rate=0.0006)
+
+    curve = strategy.equity_curve(0)
+    assert len(strategy.trades_info) > 10
+    pd.testing.assert_index_equal(curve.index, strategy.data.index, check_names=False)
+    np.testing.assert_allclose(curve["equity"], equity, rtol=1e-12)
+    np.testing.assert_array_equal(curve["price"], strategy.data["close"])
+
+    # The equity record samples the same curve, one bar per equity_update_interval
+    record = strategy.equity_record
+    pd.testing.assert_frame_equal(record, curve.loc[record.index])
+    pd.testing.assert_frame_equal(strategy.equity_curve(), record)
+    daily = strategy.equity_curve("1d")
+    assert daily.index.tolist() == pd.date_range("2024-01-01", periods=len(daily), freq="1d").tolist()
@@ -0,0 +1,40 @@
+# test_exchange_registry.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import ccxt
+import pytest
+
+import exchange_registry
+from exchange_registry import ExchangeRegistry
+
+
+def test_exchange_object_is_built_on_first_use_only():
+    registry = ExchangeRegistry({"binance": {"limit_size_request": 1000, "ccxt_config": {"enableRateLimit": True}}})
+    settings = registry["binance"]
+
+    assert settings["limit_size_request"] == 1000 and settings.get("weight_limit") is None
+    assert "exchange_object" not in settings and not settings.is_built() and registry.built() == []
+    with pytest.raises(KeyError):
+        settings["weight_limit"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:  # concurrent first reads build a single client
+        exchanges = list(executor.map(lambda _: settings["exchange_object"], range(8)))
+
+    assert isinstance(exchanges[0], ccxt.binance) and exchanges[0].enableRateLimit
+    assert all(exchange is exchanges[0] for exchange in exchanges)
+    assert settings.is_built() and registry.built() == ["binance"]
+    assert exchange_registry.BUILD_TIMES["binance"] > 0
+
+
+def test_config_import_does_not_import_ccxt():
+    script = "import sys; sys.path.append('./config'); import config; print(sorted(config.EXCHANGES), 'ccxt' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", script], cwd=CODE_PATH, capture_output=True, text=True, check=True)
+    assert output.stdout.strip().endswith("False")
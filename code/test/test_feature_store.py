@@ -0,0 +1,110 @@
+# test_feature_store.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+
+from utilities import feature_store
+from utilities.data_manager import DataManager
+
+DATA_PATH = CODE_PATH / "data" / "4h" / "BTC-USDT.csv"
+
+
+def ohlcv() -> pd.DataFrame:
+    df = pd.read_csv(DATA_PATH, usecols=["date", "open", "high", "low", "close", "volume"], parse_dates=["date"])
+    df = df.set_index("date").iloc[-1000:]
+    df.iloc[300:303, df.columns.get_loc("close")] = df["open"].iloc[300:303]  # dojis are red candles
+    return df
+
+
+def row_loop_fundamentals(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The fundamentals as DataManager computed them, row by row, before feature_store.fundamentals.
+    """
+    df = df.copy()
+    df = df.sort_index()
+
+    for window in [20, 50, 200]:
+        df[f'sma_{window}'] = df['close'].rolling(window=window).mean()
+        df[f'ema_{window}'] = df['close'].ewm(span=window, adjust=False).mean()
+
+    df['ema_12'] = df['close'].ewm(span=12, adjust=False).mean()
+    df['ema_26'] = df['close'].ewm(span=26, adjust=False).mean()
+    df['macd'] = df['ema_12'] - df['ema_26']
+    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    df['rsi'] = 100 - (100 / (1 + rs))
+
+    df['bb_middle'] = df['close'].rolling(window=20).mean()
+    df['bb_std'] = df['close'].rolling(window=20).std()
+    df['bb_upper'] = df['bb_middle'] + (2 * df['bb_std'])
+    df['bb_lower'] = df['bb_middle'] - (2 * df['bb_std'])
+
+    df['bullish'] = df['close'] > df['sma_200']
+    df['candle_color'] = ['green' if c > o else 'red' for c, o in zip(df['close'], df['open'])]
+    df['candle_streak_count'] = df['candle_color'].ne(df['candle_color'].shift()).cumsum()
+    df['candle_streak_count'] = df.groupby('candle_streak_count').cumcount() + 1
+
+    def determine_trend(row):
+        if row['close'] > row['sma_200'] and row['ema_12'] > row['ema_26']:
+            return 'uptrend'
+        elif row['close'] < row['sma_200'] and row['ema_12'] < row['ema_26']:
+            return 'downtrend'
+        else:
+            return 'sideways'
+
+    df['trend'] = df.apply(determine_trend, axis=1)
+    return df
+
+
+def test_fundamentals_match_the_row_loop():
+    df = ohlcv()
+    expected = row_loop_fundamentals(df)
+    pd.testing.assert_frame_equal(feature_store.fundamentals(df), expected)
+    assert set(expected["trend"]) == {"uptrend", "downtrend", "sideways"}
+
+
+def test_fundamentals_of_new_bars_use_the_history_for_their_windows():
+    df = ohlcv()
+    pd.testing.assert_frame_equal(feature_store.fundamentals(df.iloc[800:], history=df.iloc[:800]),
+                                  feature_store.fundamentals(df).iloc[800:])
+
+
+def synthetic_ohlcv(rows: int, start: str = "2024-01-01") -> pd.DataFrame:
+    index = pd.date_range(start, periods=rows, freq="4h", name="date")
+    close = 100 + np.random.default_rng(0).normal(0, 1, rows).cumsum()
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+def test_features_are_cached_until_the_stored_ohlcv_changes(tmp_path, monkeypatch):
+    computed = []
+    fundamentals = feature_store.fundamentals
+    monkeypatch.setitem(feature_store.FEATURES, "fundamentals", lambda df, **params: computed.append(len(df)) or fundamentals(df, **params))
+    data = DataManager("binance", storage="parquet")
+    data.path = tmp_path
+    history = synthetic_ohlcv(700)
+    data.save_to_master_db(history.iloc[:600], "BTC/USDT", "4h")
+
+    first = data.features("BTC/USDT", "4h")
+    window = data.features("BTC/USDT", "4h", "2024-02-01", "2024-02-10", columns=["close", "rsi"])
+    assert computed == [600]
+    pd.testing.assert_frame_equal(window, first.loc["2024-02-01":"2024-02-10 00:00", ["close", "rsi"]])
+
+    data.append_to_master_db(history.iloc[600:], "BTC/USDT", "4h")
+    updated = data.features("BTC/USDT", "4h")
+    assert computed == [600, 700]
+    pd.testing.assert_frame_equal(updated, fundamentals(history), check_freq=False)
+    assert len(list(tmp_path.joinpath(feature_store.FEATURES_FOLDER).rglob("fundamentals-*"))) == 1  # the stale entry is removed
+
+    data.features("BTC/USDT", "4h", rsi_period=7)  # other params, cached next to the default ones
+    assert computed == [600, 700, 700]
+    assert len(list(tmp_path.joinpath(feature_store.FEATURES_FOLDER).rglob("fundamentals-*"))) == 2
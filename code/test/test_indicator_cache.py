@@ -0,0 +1,53 @@
+# test_indicator_cache.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+import ta
+
+from strategies import envelope
+from strategies.indicator_cache import INDICATOR_CACHE, IndicatorCache, fingerprint
+
+PARAMS = {"average_type": "EMA", "average_period": 10, "envelopes": [0.03], "stop_loss_pct": 0.2, "position_size_percentage": 100}
+
+
+def ohlcv(rows: int = 500, seed: int = 0) -> pd.DataFrame:
+    index = pd.date_range("2024-01-01", periods=rows, freq="4h", name="date")
+    close = 100 + np.random.default_rng(seed).normal(0, 1, rows).cumsum()
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+def test_strategies_on_the_same_prices_share_their_indicators():
+    INDICATOR_CACHE.clear()
+    first = envelope.Strategy(dict(PARAMS), ohlcv())
+    second = envelope.Strategy(dict(PARAMS, envelopes=[0.05, 0.1]), ohlcv())
+    assert (INDICATOR_CACHE.hits, INDICATOR_CACHE.misses) == (1, 1)
+
+    expected = ta.trend.ema_indicator(ohlcv()["close"], window=10).shift(1)
+    pd.testing.assert_series_equal(second.data["average"], expected, check_names=False)
+    pd.testing.assert_series_equal(first.data["average"], second.data["average"])
+
+    envelope.Strategy(dict(PARAMS), ohlcv(seed=1))  # other prices
+    envelope.Strategy(dict(PARAMS, average_period=20), ohlcv())  # other parameters
+    assert (INDICATOR_CACHE.hits, INDICATOR_CACHE.misses) == (1, 3)
+
+
+def test_fingerprint_ignores_the_derived_columns():
+    df = ohlcv()
+    assert fingerprint(df.assign(average=1.0)) == fingerprint(df)
+    assert fingerprint(df.assign(close=df["close"] + 1)) != fingerprint(df)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IndicatorCache(max_entries=2)
+    for name in ("a", "b", "a", "c"):
+        cache.get("data", name, {"window": 5}, lambda: pd.Series([1.0]))
+
+    assert [key[1] for key in cache.entries] == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+    assert (cache.hits, cache.misses) == (1, 3)
@@ -0,0 +1,50 @@
+# test_load_cache.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+
+from utilities import frame_cache, ohlcv_store
+from utilities.data_manager import DataManager
+
+
+def ohlcv(rows: int, start: str = "2024-01-01") -> pd.DataFrame:
+    index = pd.date_range(start, periods=rows, freq="4h", name="date")
+    close = np.linspace(100, 200, rows)
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+def data_manager(tmp_path: Path, monkeypatch, max_bytes: int) -> tuple:
+    monkeypatch.setattr(DataManager, "load_cache", frame_cache.FrameCache(max_bytes))
+    reads = []
+    read_ohlcv = ohlcv_store.read_ohlcv
+    monkeypatch.setattr(ohlcv_store, "read_ohlcv", lambda *args: reads.append(args[2:]) or read_ohlcv(*args))
+    data = DataManager("binance", storage="parquet", partition="month")
+    data.path = tmp_path
+    data.save_to_master_db(ohlcv(600), "BTC/USDT", "4h")  # January to April
+    return data, reads
+
+
+def test_history_is_read_once_and_cached(tmp_path, monkeypatch):
+    data, reads = data_manager(tmp_path, monkeypatch, 1 << 20)
+    first = data.load("BTC/USDT", "4h", "2024-02-01", "2024-02-10")
+    second = data.load("BTC/USDT", "4h", "2024-03-01", "2024-03-10")
+
+    assert reads == [(None, None)]
+    assert DataManager.load_cache.stats()["entries"] == 1
+    assert len(first) == len(second) == 9 * 6 + 1
+
+
+def test_history_too_large_to_be_cached_reads_the_range_only(tmp_path, monkeypatch):
+    data, reads = data_manager(tmp_path, monkeypatch, 1000)
+    df = data.load("BTC/USDT", "4h", "2024-02-01", "2024-02-10")
+
+    assert reads == [("2024-02-01", "2024-02-10")]
+    assert DataManager.load_cache.stats()["entries"] == 0
+    # The same rows as a slice of the cached history
+    pd.testing.assert_frame_equal(df, frame_cache.date_slice(ohlcv(600), "2024-02-01", "2024-02-10"), check_freq=False)
@@ -0,0 +1,94 @@
+# test_market_cache.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import json
+import time
+
+import pytest
+
+import config
+from utilities import market_cache
+from utilities.data_manager import DataManager
+
+MARKETS = {"BTC/USDT": {"symbol": "BTC/USDT", "limits": {"amount": {"min": 0.001}}}}
+
+
+@pytest.fixture
+def new_process(monkeypatch):
+    """
+    Forgets the markets read by this process, as a new process would.
+    """
+    def forget():
+        monkeypatch.setattr(market_cache, "_markets", {})
+    forget()
+    return forget
+
+
+def age(folder: Path, seconds: float) -> None:
+    file_path = folder / "binance.json"
+    content = json.loads(file_path.read_text())
+    content["fetched_at"] -= seconds
+    file_path.write_text(json.dumps(content))
+
+
+def test_markets_are_downloaded_again_once_older_than_the_ttl(tmp_path, new_process):
+    downloads = []
+    fetch = lambda: downloads.append(1) or MARKETS
+
+    assert market_cache.load_markets("binance", fetch, tmp_path) == MARKETS
+    new_process()
+    assert market_cache.load_markets("binance", fetch, tmp_path) == MARKETS  # from the file of the first process
+    assert len(downloads) == 1
+    assert market_cache.min_amount(market_cache.cached_markets("binance", tmp_path), "BTC/USDT") == 0.001
+
+    age(tmp_path, config.MARKETS_TTL - 60)
+    new_process()
+    assert market_cache.cached_markets("binance", tmp_path) == MARKETS
+    assert market_cache.cached_markets("binance", tmp_path, ttl=30) is None
+
+    age(tmp_path, 120)
+    new_process()
+    assert market_cache.cached_markets("binance", tmp_path) is None
+    market_cache.load_markets("binance", fetch, tmp_path)
+    assert len(downloads) == 2
+    assert time.time() - json.loads((tmp_path / "binance.json").read_text())["fetched_at"] < 60
+
+    market_cache.load_markets("binance", fetch, tmp_path, reload=True)
+    assert len(downloads) == 3
+
+
+def test_corrupted_cache_is_downloaded_again(tmp_path, new_process):
+    (tmp_path / "binance.json").write_text('{"fetched_at": ')
+    assert market_cache.cached_markets("binance", tmp_path) is None
+    assert market_cache.load_markets("binance", lambda: MARKETS, tmp_path) == MARKETS
+
+
+def test_data_manager_reads_its_markets_from_the_cache(tmp_path, new_process):
+    class Exchange:
+        markets = None
+        loads = 0
+
+        def load_markets(self, reload=False):
+            self.loads += 1
+            return MARKETS
+
+        def set_markets(self, markets):
+            self.markets = markets
+
+    data = DataManager("binance", storage="parquet")
+    data.path = tmp_path
+    data.exchange = Exchange()
+    data.fetch_markets()
+    new_process()
+    other = DataManager("binance", storage="parquet")
+    other.path = tmp_path
+    other.exchange = data.exchange
+    other.fetch_markets()
+
+    assert data.exchange.loads == 1
+    assert other.available_symbols == ["BTC/USDT"] and other.fetch_symbol_min_amount("BTC/USDT") == 0.001
@@ -0,0 +1,87 @@
+# test_ohlcv_append.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+
+from utilities import ohlcv_store
+
+
+def ohlcv(start: str, rows: int) -> pd.DataFrame:
+    dates = pd.date_range(start, periods=rows, freq="4h")
+    close = np.arange(rows, dtype=float) + 100
+    return pd.DataFrame({"date": dates, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0})
+
+
+def snapshot(files):
+    return {path.name: (path.read_bytes(), path.stat().st_mtime_ns) for path in files}
+
+
+def test_parquet_append_leaves_the_stored_file_untouched(tmp_path):
+    file_path = tmp_path / "BTC-USDT.parquet"
+    stored = ohlcv("2024-01-01", 100)
+    ohlcv_store.write_ohlcv(stored, file_path)
+    before = snapshot([file_path])
+
+    appended = [ohlcv("2024-01-17 16:00", 10), ohlcv("2024-01-19 08:00", 10)]
+    for df in appended:
+        ohlcv_store.append_ohlcv(df, file_path)
+
+    assert snapshot([file_path]) == before
+    assert len(ohlcv_store.part_files(file_path)) == 2
+    expected = pd.concat([stored] + appended, ignore_index=True)
+    pd.testing.assert_frame_equal(ohlcv_store.read_ohlcv(file_path), expected)
+    assert ohlcv_store.last_date(file_path) == expected["date"].iloc[-1]
+    assert len(ohlcv_store.read_ohlcv(file_path, ["close"], "2024-01-17", "2024-01-18")) == 7
+
+
+def test_partitioned_append_leaves_the_stored_partitions_untouched(tmp_path):
+    file_path = tmp_path / "BTC-USDT.parquet"
+    stored = ohlcv("2024-01-01", 400)  # January to March
+    ohlcv_store.write_ohlcv(stored, file_path, "month")
+    before = snapshot(ohlcv_store.partition_files(file_path))
+
+    appended = ohlcv(stored["date"].iloc[-1] + pd.Timedelta("4h"), 200)  # into March and April
+    ohlcv_store.append_ohlcv(appended, file_path)
+
+    files = ohlcv_store.partition_files(file_path)
+    assert [path.stem for path in files] == ["2024-01", "2024-02", "2024-03", "2024-04"]
+    assert snapshot(files[:3]) == before
+    assert [path.name for path in ohlcv_store.part_files(files[2])] == ["2024-03.part000001.parquet"]
+    pd.testing.assert_frame_equal(ohlcv_store.read_ohlcv(file_path), pd.concat([stored, appended], ignore_index=True))
+
+
+def test_parts_are_merged_and_replaced_by_a_rewrite(tmp_path, monkeypatch):
+    monkeypatch.setattr(ohlcv_store, "PARQUET_MAX_PARTS", 3)
+    file_path = tmp_path / "BTC-USDT.parquet"
+    ohlcv_store.write_ohlcv(ohlcv("2024-01-01", 10), file_path)
+    before = snapshot([file_path])
+    for i in range(5):
+        ohlcv_store.append_ohlcv(ohlcv(pd.Timestamp("2024-01-02 16:00") + i * pd.Timedelta("8h"), 2), file_path)
+
+    assert snapshot([file_path]) == before
+    assert [path.name for path in ohlcv_store.part_files(file_path)] == ["BTC-USDT.part000004.parquet", "BTC-USDT.part000005.parquet"]
+    df = ohlcv_store.read_ohlcv(file_path)
+    assert len(df) == 20 and df["date"].is_monotonic_increasing and df["date"].is_unique
+
+    ohlcv_store.write_ohlcv(df, file_path)
+    assert ohlcv_store.part_files(file_path) == []
+    pd.testing.assert_frame_equal(ohlcv_store.read_ohlcv(file_path), df)
+
+
+def test_parts_are_removed_after_the_rewrite_is_swapped_in(tmp_path, monkeypatch):
+    file_path = tmp_path / "BTC-USDT.parquet"
+    ohlcv_store.write_ohlcv(ohlcv("2024-01-01", 10), file_path)
+    ohlcv_store.append_ohlcv(ohlcv("2024-01-02 16:00", 2), file_path)
+    parts_at_swap = []
+    replace = ohlcv_store.os.replace
+    monkeypatch.setattr(ohlcv_store.os, "replace", lambda *args: parts_at_swap.append(len(ohlcv_store.part_files(file_path))) or replace(*args))
+
+    ohlcv_store.write_ohlcv(ohlcv_store.read_ohlcv(file_path), file_path)
+    assert parts_at_swap == [1]
+    assert ohlcv_store.part_files(file_path) == []
@@ -0,0 +1,58 @@
+# test_ohlcv_arrays.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import json
+import numpy as np
+import pandas as pd
+
+from utilities import ohlcv_store
+from utilities.data_manager import DataManager
+
+
+def ohlcv(rows: int, start: str = "2024-01-01") -> pd.DataFrame:
+    index = pd.date_range(start, periods=rows, freq="4h", name="date")
+    close = np.linspace(100, 200, rows)
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+def data_manager(tmp_path: Path) -> DataManager:
+    data = DataManager("binance", storage="parquet")
+    data.path = tmp_path
+    return data
+
+
+def test_arrays_are_swapped_in_together(tmp_path):
+    folder = tmp_path / "BTC-USDT.arrays"
+    ohlcv_store.write_ohlcv_arrays(ohlcv(10), folder, [["a", 1, 1]])
+    first = ohlcv_store.open_ohlcv_arrays(folder)
+    ohlcv_store.write_ohlcv_arrays(ohlcv(20), folder, [["a", 2, 2]])
+
+    # The manifest names one export: its time and values always have the same length
+    manifest = json.loads((folder / ohlcv_store.ARRAYS_MANIFEST).read_text())
+    times = np.load(folder / f"time.{manifest['stamp']}.npy")
+    values = np.load(folder / f"values.{manifest['stamp']}.npy")
+    assert len(times) == values.shape[1] == 20
+    assert ohlcv_store.arrays_version(folder) == json.dumps([["a", 2, 2]])
+    # The frame opened before the export still reads the previous arrays
+    assert len(first) == 10 and first["close"].iloc[-1] == 200
+
+    ohlcv_store.write_ohlcv_arrays(ohlcv(30), folder)
+    assert len(list(folder.glob("time.*.npy"))) == 2  # the current and previous exports only
+    assert len(ohlcv_store.open_ohlcv_arrays(folder)) == 30
+
+
+def test_load_arrays_reexports_a_changed_master_db(tmp_path):
+    data = data_manager(tmp_path)
+    data.save_to_master_db(ohlcv(50), "BTC/USDT", "4h")
+    pd.testing.assert_frame_equal(data.load_arrays("BTC/USDT", "4h"), data.load("BTC/USDT", "4h"), check_freq=False)
+
+    data.append_to_master_db(ohlcv(5, "2024-01-09 08:00"), "BTC/USDT", "4h")
+    arrays = data.load_arrays("BTC/USDT", "4h")
+    assert len(arrays) == 55
+    assert ohlcv_store.arrays_version(data._arrays_path("BTC/USDT", "4h")) == \
+        json.dumps(ohlcv_store.data_version(data._master_db_path("BTC/USDT", "4h")))
@@ -0,0 +1,61 @@
+# test_ohlcv_partitions.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utilities import ohlcv_store
+
+
+def ohlcv(start: str, rows: int) -> pd.DataFrame:
+    dates = pd.date_range(start, periods=rows, freq="4h")
+    close = np.arange(rows, dtype=float) + 100
+    return pd.DataFrame({"date": dates, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0})
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    paths = []
+    read_file = ohlcv_store._read_file
+    monkeypatch.setattr(ohlcv_store, "_read_file", lambda path, *args: paths.append(path.stem) or read_file(path, *args))
+    return paths
+
+
+@pytest.mark.parametrize("storage", ["csv", "parquet"])
+def test_range_reads_only_open_the_overlapping_partitions(tmp_path, opened, storage):
+    stored = ohlcv("2024-01-01", 720)  # January to April
+    file_path = tmp_path / f"BTC-USDT{ohlcv_store.EXTENSIONS[storage]}"
+    ohlcv_store.write_ohlcv(stored, file_path, "month")
+    assert [path.stem for path in ohlcv_store.partition_files(file_path)] == ["2024-01", "2024-02", "2024-03", "2024-04"]
+
+    df = ohlcv_store.read_ohlcv(file_path, ["close"], "2024-02-10", "2024-03-01")
+
+    assert opened == ["2024-02", "2024-03"]
+    expected = stored.loc[stored["date"].between("2024-02-10", "2024-03-01"), ["date", "close"]].reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["date"].iloc[-1] == pd.Timestamp("2024-03-01")  # the end date is included
+
+    opened.clear()
+    pd.testing.assert_frame_equal(ohlcv_store.read_ohlcv(file_path), stored)
+    assert opened == ["2024-01", "2024-02", "2024-03", "2024-04"]
+
+
+def test_range_outside_of_the_partitions_is_empty(tmp_path, opened):
+    stored = ohlcv("2023-06-01", 2000)  # June 2023 to April 2024
+    file_path = tmp_path / "BTC-USDT.parquet"
+    ohlcv_store.write_ohlcv(stored, file_path, "year")
+
+    df = ohlcv_store.read_ohlcv(file_path, ["close"], "2025-01-01", "2025-02-01")
+
+    assert df.empty and list(df.columns) == ["date", "close"]
+    assert opened == ["2024"]  # only the last partition, for the columns of the empty result
+    opened.clear()
+    df = ohlcv_store.read_ohlcv(file_path, start_date="2024-01-01")
+    pd.testing.assert_frame_equal(df, stored[stored["date"] >= "2024-01-01"].reset_index(drop=True))
+    assert opened == ["2024"]
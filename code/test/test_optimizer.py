@@ -0,0 +1,48 @@
+# test_optimizer.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from utilities import optimizer
+
+DATA_PATH = CODE_PATH / "data" / "4h" / "BTC-USDT.csv"
+SCENARIO = SimpleNamespace(
+    strategy_name="envelope",
+    strategy_params={"average_type": "SMA", "average_period": 5, "envelopes": [0.03, 0.05], "stop_loss_pct": 0.2,
+                     "position_size_percentage": 100},
+    initial_balance=1000, leverage=1, open_fee_rate=0.0002, close_fee_rate=0.0006,
+)
+PARAM_RANGES = {"average_period": [5, 10], "stop_loss_pct": [0.1, 0.3], "leverage": [1, 5]}
+
+
+def ohlcv() -> pd.DataFrame:
+    df = pd.read_csv(DATA_PATH, usecols=["date", "open", "high", "low", "close", "volume"], parse_dates=["date"])
+    return df.set_index("date").iloc[-2000:]
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+def test_optimize_runs_every_combination(memmap):
+    results = optimizer.optimize(SCENARIO, PARAM_RANGES, ohlcv=ohlcv(), max_workers=2, pruning={"max_drawdown": 0.5}, memmap=memmap)
+
+    assert len(results) == len(optimizer.parameter_grid(PARAM_RANGES))
+    assert results["error"].isna().all()
+    # The pruned combinations rank after the completed ones, which are sorted by sharpe ratio
+    completed = results["status"].eq("completed")
+    assert completed.tolist() == [True] * 4 + [False] * 4
+    assert set(results["status"][4:]) == {"max_drawdown"}
+    assert results["sharpe_ratio"][:4].is_monotonic_decreasing
+
+    # Same metrics as a backtest of the combination in this process
+    row = results.iloc[0]
+    combination = {key: row[key] for key in PARAM_RANGES}
+    strategy_params, execution = optimizer.split_combination(SCENARIO, combination)
+    strategy = optimizer.run_combination("envelope", strategy_params, execution, ohlcv(), pruning={"max_drawdown": 0.5})
+    assert optimizer.analysis_metrics(strategy)["final_balance"] == row["final_balance"]
@@ -0,0 +1,114 @@
+# test_throughput.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import asyncio
+
+import ccxt
+import pytest
+
+from utilities.throughput import FULL_PAGES_BEFORE_GROWTH, ThroughputController
+
+INTERVAL_MS = 3600 * 1000
+
+
+class ScriptedExchange:
+    """
+    Raises the scripted errors in turn, then serves full pages of hourly bars.
+    """
+    rateLimit = 1
+
+    def __init__(self, errors=(), max_limit=None) -> None:
+        self.errors = list(errors)
+        self.max_limit = max_limit
+        self.limits = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.limits.append(limit)
+        if self.errors:
+            raise self.errors.pop(0)
+        if self.max_limit is not None and limit > self.max_limit:
+            raise ccxt.BadRequest(f"limit {limit} is too large")
+        return [[since + k * INTERVAL_MS, 1.0, 1.0, 1.0, 1.0, 1.0] for k in range(limit)]
+
+    def parse_timeframe(self, timeframe):
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self):
+        return 10**15
+
+
+class AsyncExchange:
+    """
+    Async client over a ScriptedExchange.
+    """
+
+    def __init__(self, exchange: ScriptedExchange) -> None:
+        self.exchange = exchange
+        self.rateLimit = exchange.rateLimit
+
+    async def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        return self.exchange.fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def parse_timeframe(self, timeframe):
+        return self.exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self):
+        return self.exchange.milliseconds()
+
+
+def controller(**kwargs) -> ThroughputController:
+    return ThroughputController("binance", rate=10, max_rate=20, page_size=100, backoff=0, **kwargs)
+
+
+def test_throttled_requests_are_retried_at_half_the_rate():
+    throughput = controller()
+    exchange = ScriptedExchange([ccxt.RateLimitExceeded("429"), ccxt.DDoSProtection("418"), ccxt.NetworkError("reset")])
+
+    ohlcv = throughput.fetch_ohlcv(exchange, "BTC/USDT", "1h", 0)
+
+    assert len(ohlcv) == 100 and len(exchange.limits) == 4
+    assert (throughput.errors, throughput.throttled, throughput.requests) == (3, 2, 1)
+    # Halved once for the two throttled responses in the same second, then one additive step back up
+    assert throughput.rate == pytest.approx(5 + 10 / 20)
+    assert exchange.rateLimit == pytest.approx(1000 / 5)
+
+
+def test_requests_raise_once_the_retries_are_spent():
+    throughput = controller(max_retries=2)
+    exchange = ScriptedExchange([ccxt.RateLimitExceeded("429")] * 3)
+    with pytest.raises(ccxt.RateLimitExceeded):
+        asyncio.run(throughput.fetch_ohlcv_async(AsyncExchange(exchange), "BTC/USDT", "1h", 0))
+    assert len(exchange.limits) == 3
+
+    with pytest.raises(ccxt.AuthenticationError):  # not worth retrying
+        throughput.fetch_ohlcv(ScriptedExchange([ccxt.AuthenticationError("key")]), "BTC/USDT", "1h", 0)
+
+
+def test_page_size_grows_after_full_pages_and_steps_down_when_rejected():
+    throughput = controller()
+    exchange = ScriptedExchange(max_limit=150)
+    for _ in range(FULL_PAGES_BEFORE_GROWTH):
+        throughput.fetch_ohlcv(exchange, "BTC/USDT", "1h", 0)
+    assert throughput.page_size == 200
+
+    ohlcv = throughput.fetch_ohlcv(exchange, "BTC/USDT", "1h", 0)
+
+    assert exchange.limits[-2:] == [200, 100] and len(ohlcv) == 100
+    assert throughput.page_size == throughput.max_page_size == 100
+    for _ in range(FULL_PAGES_BEFORE_GROWTH):
+        throughput.fetch_ohlcv(exchange, "BTC/USDT", "1h", 0)
+    assert throughput.page_size == 100  # never probes the rejected size again
+
+
+def test_page_size_is_capped_to_the_pages_the_exchange_returns():
+    throughput = controller()
+    exchange = ScriptedExchange()
+    exchange.fetch_ohlcv = lambda symbol, timeframe, since, limit: [[since + k * INTERVAL_MS] + [1.0] * 5 for k in range(60)]
+    throughput.fetch_ohlcv(exchange, "BTC/USDT", "1h", 0)
+    assert throughput.page_size == throughput.max_page_size == 60
+
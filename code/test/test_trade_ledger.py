@@ -0,0 +1,72 @@
+# test_trade_ledger.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies import envelope
+from strategies import tools as ut
+
+PARAMS = {"average_type": "SMA", "average_period": 5, "envelopes": [0.02, 0.04], "stop_loss_pct": 0.1, "position_size_percentage": 100}
+
+
+def ohlcv(rows: int = 1000, tz=None) -> pd.DataFrame:
+    index = pd.date_range("2024-01-01", periods=rows, freq="4h", name="date", tz=tz)
+    close = 100 + np.random.default_rng(0).normal(0, 1, rows).cumsum()
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+@pytest.mark.parametrize("engine", ["rows", "events"])
+def test_trades_info_matches_the_info_of_the_closed_positions(engine, monkeypatch):
+    closed = []
+    close_trade = ut.BacktestEngine.close_trade
+
+    def recording_close_trade(self, time, price, reason):
+        open_balance = self.balance
+        close_trade(self, time, price, reason)
+        closed.append({**self.position.info(), "open_balance": open_balance, "close_balance": self.balance})
+
+    monkeypatch.setattr(ut.BacktestEngine, "close_trade", recording_close_trade)
+    strategy = envelope.Strategy(dict(PARAMS), ohlcv())
+    strategy.run_backtest(initial_balance=1000, leverage=2, open_fee_rate=0.0002, close_fee_rate=0.0006, engine=engine)
+
+    assert len(closed) > 10
+    expected = pd.DataFrame(closed).drop(columns="tp_price")
+    pd.testing.assert_frame_equal(strategy.trades_info, expected[strategy.trades_info.columns])
+
+
+def test_trades_info_keeps_the_timezone_of_the_data():
+    strategy = envelope.Strategy(dict(PARAMS), ohlcv(tz="UTC"))
+    strategy.run_backtest(initial_balance=1000, leverage=1, open_fee_rate=0.0002, close_fee_rate=0.0006)
+    assert str(strategy.trades_info["open_time"].dt.tz) == "UTC"
+    assert strategy.trades_info["close_time"].isin(strategy.data.index).all()
+
+
+def test_ledger_grows_past_its_capacity():
+    ledger = ut.TradeLedger(capacity=2)
+    position = ut.Position(leverage=1, fee_rate=0.001)
+    for k in range(5):
+        position.open(pd.Timestamp("2024-01-01") + pd.Timedelta(hours=k), "long", 100, 10 + k, f"Open {k % 2}")
+        position.close(pd.Timestamp("2024-01-01") + pd.Timedelta(hours=k, minutes=30), 11 + k, "Exit")
+        ledger.append(position, 1000, 1000 + k)
+
+    trades = ledger.to_frame()
+    assert len(ledger) == 5 and ledger.times.shape[1] == 8
+    assert trades["open_price"].tolist() == [10, 11, 12, 13, 14]
+    assert trades["open_reason"].tolist() == ["Open 0", "Open 1", "Open 0", "Open 1", "Open 0"]
+    assert trades["close_balance"].tolist() == [1000, 1001, 1002, 1003, 1004]
+
+    ledger.truncate(pd.Timestamp("2024-01-01 02:30"))
+    assert len(ledger.to_frame()) == 3
+
+
+def test_position_has_no_instance_dict():
+    position = ut.Position(leverage=1, fee_rate=0.001)
+    with pytest.raises(AttributeError):
+        position.unknown_attribute = 1
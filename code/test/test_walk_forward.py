@@ -0,0 +1,63 @@
+# test_walk_forward.py
+import sys
+from pathlib import Path
+
+CODE_PATH = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(CODE_PATH))
+sys.path.append(str(CODE_PATH / "config"))
+
+from types import SimpleNamespace
+
+import pandas as pd
+
+from utilities import optimizer, walk_forward
+
+DATA_PATH = CODE_PATH / "data" / "4h" / "BTC-USDT.csv"
+SCENARIO = SimpleNamespace(
+    strategy_name="envelope",
+    strategy_params={"average_type": "SMA", "average_period": 5, "envelopes": [0.03, 0.05], "stop_loss_pct": 0.2,
+                     "position_size_percentage": 100},
+    initial_balance=1000, leverage=1, open_fee_rate=0.0002, close_fee_rate=0.0006,
+)
+PARAM_RANGES = {"average_period": [5, 10], "envelopes": [[0.03, 0.05], [0.05, 0.1]]}
+
+
+def ohlcv() -> pd.DataFrame:
+    df = pd.read_csv(DATA_PATH, usecols=["date", "open", "high", "low", "close", "volume"], parse_dates=["date"])
+    return df.set_index("date").iloc[-2000:]
+
+
+def test_walk_forward_windows():
+    index = pd.date_range("2024-01-01", "2024-12-31", freq="1D")
+    windows = walk_forward.walk_forward_windows(index, "90D", "30D")
+    assert windows[0] == tuple(pd.Timestamp(date) for date in ("2024-01-01", "2024-03-30", "2024-03-31", "2024-04-29"))
+    for (_, _, _, test_end), (_, _, next_test_start, _) in zip(windows, windows[1:]):
+        assert next_test_start == test_end + pd.Timedelta("1D")  # the out-of-sample windows follow each other
+    assert windows[-1][3] == index[-1]
+
+    anchored = walk_forward.walk_forward_windows(index, "90D", "30D", anchored=True)
+    assert [window[0] for window in anchored] == [index[0]] * len(windows)
+    assert [window[2:] for window in anchored] == [window[2:] for window in windows]
+
+
+def test_walk_forward_backtests_the_best_combination_of_each_fold_out_of_sample():
+    data = ohlcv()
+    result = walk_forward.walk_forward(SCENARIO, PARAM_RANGES, "120D", "60D", ohlcv=data, max_workers=2)
+
+    folds = result.folds
+    assert len(folds) == len(walk_forward.walk_forward_windows(data.index, "120D", "60D"))
+    assert len(result.in_sample) == len(folds) * len(optimizer.parameter_grid(PARAM_RANGES))
+    assert folds["error"].isna().all()
+    assert result.equity_record.index[0] == folds["test_start"].iloc[0]
+    assert result.equity_record.index[-1] <= folds["test_end"].iloc[-1]
+
+    fold = folds.iloc[0]
+    in_sample = result.in_sample[result.in_sample["fold"] == 0]
+    assert fold["in_sample_sharpe_ratio"] == in_sample["sharpe_ratio"].max()
+
+    # The out-of-sample trades of the fold are those of a backtest of the window
+    strategy_params, execution = optimizer.split_combination(SCENARIO, fold["combination"])
+    strategy = optimizer.build_strategy("envelope", strategy_params, data).window(fold["test_start"], fold["test_end"])
+    optimizer.run_execution(strategy, execution)
+    trades_info = result.trades_info[result.trades_info["fold"] == 0].drop(columns="fold")
+    pd.testing.assert_frame_equal(trades_info, strategy.trades_info)
@@ -1,8 +1,5 @@
-import pandas as pd
 import io
-from datetime import datetime, date
-import matplotlib.pyplot as plt
-from lightweight_charts import JupyterChart
+from datetime import datetime
 from typing import Optional
 import csv
 import os
@@ -10,10 +7,25 @@ import sys
 sys.path.append('./config')
 import config
 
+# Plotting functions of utilities.backtest_plots, that module (matplotlib, lightweight_charts) is only imported when one is used
+PLOTS = ("plot_equity", "plot_drawdown", "plot_monthly_performance", "plot_candlestick")
+
+
+def __getattr__(name: str):
+    if name in PLOTS:
+        from utilities import backtest_plots
+        return getattr(backtest_plots, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class BacktestAnalysis:
+    """
+    Metrics of a backtested strategy. Only the plot_* methods load the plotting backends (see backtest_plots),
+    computing, printing or saving the metrics does not.
+    """
 
     def __init__(self, strategy) -> None:
-        self.data = strategy.data.copy()
+        self.data = strategy.data  # not copied, only plot_candlestick reads it (from a copy)
         self.trades = strategy.trades_info.copy()
         self.wallet = strategy.equity_record.copy()
         '''
@@ -110,12 +122,15 @@ class BacktestAnalysis:
         self.return_over_max_drawdown = self.roi / abs(self.max_drawdown_equity)
 
     def plot_equity(self, path: Optional[str] = None, plot_price: bool = True) -> None:
+        from utilities.backtest_plots import plot_equity
         plot_equity(self.wallet, plot_price, path)
 
     def plot_drawdown(self, path: Optional[str] = None) -> None:
+        from utilities.backtest_plots import plot_drawdown
         plot_drawdown(self.wallet, path)
 
     def plot_monthly_performance(self, path: Optional[str] = None, year: str = "all") -> None:
+        from utilities.backtest_plots import plot_monthly_performance
         if year == "all":
             years = self.wallet.index.year.unique()
             for yr in years:
@@ -124,7 +139,8 @@ class BacktestAnalysis:
             plot_monthly_performance(self.wallet, year=year, path=path)
 
     def plot_candlestick(self, indicators: Optional[dict] = None, show_volume: bool = False) -> None:
-        plot_candlestick(self.trades, self.data, indicators, show_volume)
+        from utilities.backtest_plots import plot_candlestick
+        plot_candlestick(self.trades, self.data.copy(), indicators, show_volume)
 
     def print_metrics(self, path: Optional[str] = None) -> None:
 
@@ -259,200 +275,3 @@ class BacktestAnalysis:
                 writer.writeheader()
     
             writer.writerow(metrics)
-
-
-# --- Utilities ---
-def plot_equity(equity_record: pd.DataFrame, plot_price: bool = True, path: Optional[str] = None) -> None:
-    config = {
-        'fig_size': (8, 4),
-        'color': {
-            'price': '#800080',
-            'equity': '#089981',
-        },
-        'font_size': {
-            'title': 13,
-            'axis_label': 11,
-            'tick_params': 10,
-            'legend': 10
-        },
-        'line_width': 1,
-        'alpha': 0.2
-    }
-
-    data = equity_record
-    fig, ax_price = plt.subplots(figsize=config['fig_size'])
-    ax_equity = ax_price.twinx()
-
-    plt.title("Equity Value" + (" vs Asset Price" if plot_price else ""), fontsize=config['font_size']['title'])
-
-    if plot_price:
-        ax_price.plot(data.index, data['price'], color=config['color']['price'], lw=config['line_width'],
-                      label="Asset Price")
-        ax_price.set_ylabel("Asset Price in Quote", color=config['color']['price'],
-                            fontsize=config['font_size']['axis_label'])
-        ax_price.tick_params(axis='y', colors=config['color']['price'], labelsize=config['font_size']['tick_params'])
-        price_range = data['price'].max() - data['price'].min()
-        ax_price.set_ylim(data['price'].min() - price_range * 0.1, data['price'].max() + price_range * 0.1)
-        ax_equity.tick_params(axis='y', colors=config['color']['equity'], labelsize=config['font_size']['tick_params'])
-        ax_equity.set_ylabel("Equity Value in Quote", color=config['color']['equity'],
-                             fontsize=config['font_size']['axis_label'])
-    else:
-        ax_price.get_yaxis().set_visible(False)
-        ax_equity.tick_params(axis='y', labelsize=config['font_size']['tick_params'])
-        ax_equity.set_ylabel("Equity Value in Quote", fontsize=config['font_size']['axis_label'])
-
-    ax_equity.plot(data.index, data['equity'], color=config['color']['equity'], lw=config['line_width'],
-                   label="Equity Value")
-    ax_equity.fill_between(data.index, data['equity'], alpha=config['alpha'], color=config['color']['equity'])
-    ax_equity.axhline(y=data.iloc[0]['equity'], color='black', lw=config['line_width'], ls='--')
-    equity_range = data['equity'].max() - data['equity'].min()
-    ax_equity.set_ylim(data['equity'].min() - equity_range * 0.1, data['equity'].max() + equity_range * 0.1)
-    ax_equity.set_xlim(data.index.min(), data.index.max())
-
-    if plot_price:
-        handles, labels = [], []
-        for ax in [ax_equity, ax_price]:
-            for handle, label in zip(*ax.get_legend_handles_labels()):
-                handles.append(handle)
-                labels.append(label)
-        ax_equity.legend(handles, labels, loc="upper left", fontsize=config['font_size']['legend'])
-
-    plt.tight_layout()
-    if path:
-        plt.savefig(f"{path}_plot_equity.png")
-    else:
-        plt.show()
-
-
-def plot_drawdown(equity_record: pd.DataFrame, path: Optional[str] = None) -> None:
-    config = {
-        'fig_size': (8, 4),
-        'color': {
-            'drawdown': 'indianred',
-            'line': 'black'
-        },
-        'font_size': {
-            'title': 13,
-            'axis_label': 11,
-            'tick_params': 10,
-            'legend': 10
-        },
-        'line_width': 1,
-        'alpha': 0.2
-    }
-
-    fig, ax = plt.subplots(figsize=config['fig_size'])
-    data = equity_record
-
-    ax.title.set_text("Drawdown")
-    ax.plot(-data['drawdown_pct'] * 100, color=config['color']['drawdown'], lw=config['line_width'])
-    ax.fill_between(data.index, -data['drawdown_pct'] * 100, alpha=config['alpha'], color=config['color']['drawdown'])
-    ax.axhline(y=0, color=config['color']['line'], alpha=0.3, lw=config['line_width'])
-    ax.set_ylabel("%", color=config['color']['line'], fontsize=config['font_size']['axis_label'])
-    ax.tick_params(axis='y', labelsize=config['font_size']['tick_params'])
-    ax.set_xlim(data.index.min(), data.index.max())
-
-    plt.tight_layout()
-
-    if path:
-        plt.savefig(f"{path}_plot_drawdown.png")
-    else:
-        plt.show()
-
-
-def plot_monthly_performance(equity_record: pd.DataFrame, year: int, path: Optional[str] = None) -> None:
-    config = {
-        'fig_size': (8, 4),
-        'colors': {
-            'positive': '#089981',
-            'negative': '#F23645'
-        },
-        'title_font_size': 13,
-        'axis_label_font_size': 11,
-        'tick_params_font_size': 10,
-        'bar_text_font_size': 9,
-        'text_color': 'black',
-        'line_color': 'black',
-        'alpha': 0.5,
-        'rotation': 45,
-    }
-
-    year = int(year)
-    yearly_data = equity_record[equity_record.index.year == year]
-
-    if yearly_data.empty:
-        print(f"No data available for the year {year}.")
-        return
-
-    yearly_performance = 0
-    if not yearly_data.empty:
-        yearly_performance = ((yearly_data['equity'].iloc[-1] - yearly_data['equity'].iloc[0]) /
-                              yearly_data['equity'].iloc[0]) * 100
-
-    monthly_performances = []
-    for month in range(1, 13):
-        monthly_data = yearly_data[yearly_data.index.month == month]
-
-        if not monthly_data.empty:
-            monthly_performance = ((monthly_data['equity'].iloc[-1] - monthly_data['equity'].iloc[0]) /
-                                   monthly_data['equity'].iloc[0]) * 100
-        else:
-            monthly_performance = 0
-
-        monthly_performances.append(monthly_performance)
-
-    months = [date(1900, month, 1).strftime('%B') for month in range(1, 13)]
-
-    fig, ax = plt.subplots(figsize=config['fig_size'])
-    bars = ax.bar(months, monthly_performances,
-                  color=[config['colors']['positive'] if x >= 0 else config['colors']['negative'] for x in
-                         monthly_performances])
-
-    plt.title(f"{year} (Cumulative Performance: {round(yearly_performance, 2)}%)", fontsize=config['title_font_size'])
-    ax.axhline(0, color=config['line_color'], alpha=config['alpha'])
-    ax.set_ylabel('Performance (%)', fontsize=config['axis_label_font_size'])
-
-    for bar in bars:
-        height = bar.get_height()
-        ax.annotate(f'{round(height, 2)}%',
-                    xy=(bar.get_x() + bar.get_width() / 2, height),
-                    xytext=(0, 0 if height >= 0 else -2),
-                    textcoords="offset points",
-                    ha='center', va='bottom' if height >= 0 else 'top', fontsize=config['bar_text_font_size'],
-                    color=config['text_color'])
-
-    plt.xticks(rotation=config['rotation'])
-    ax.tick_params(axis='x', which='major', labelsize=config['tick_params_font_size'])
-    ax.tick_params(axis='y', which='major', labelsize=config['tick_params_font_size'])
-
-    performance_range = max(monthly_performances) - min(monthly_performances)
-    lower_limit = min(monthly_performances) - (performance_range * 0.15)
-    upper_limit = max(monthly_performances) + (performance_range * 0.15)
-    ax.set_ylim(lower_limit, upper_limit)
-
-    plt.tight_layout()
-
-    if path:
-        plt.savefig(f"{path}_plot_performance_{year}.png")
-    else:
-        plt.show()
-
-
-def plot_candlestick(trades: pd.DataFrame, ohlcv: pd.DataFrame, indicators: Optional[dict] = None, show_volume: bool = False) -> None:
-    chart = JupyterChart(width=900, height=400)
-    if not show_volume:
-        ohlcv = ohlcv.copy()
-        del ohlcv['volume']
-
-    chart.set(ohlcv)
-
-    if indicators is not None:
-        for name, ind in indicators.items():
-            line = chart.create_line(name, ind['color'], price_line=False)
-            line.set(ind['df'])
-
-    for index, row in trades.iterrows():
-        chart.marker(time=row['open_time'], position="below", shape="arrow_up", color="white", text=row['open_reason'])
-        chart.marker(time=row['close_time'], position="above", shape="arrow_down", color="white", text=row['close_reason'])
-
-    chart.load()
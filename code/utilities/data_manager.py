@@ -1,37 +1,96 @@
-import ccxt
+import json
+import time
+import asyncio
+import shutil
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
+from functools import cached_property, lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 import sys
 sys.path.append('./config')
 import config
 
 #from config import EXCHANGES, TIMEFRAMES, BASE_DATA_PATH, ALPACA_API_KEY, ALPACA_SECRET_KEY
-from alpaca_trade_api.rest import REST, TimeFrame
 
-alpaca_rest = REST(config.ALPACA_API_KEY, config.ALPACA_SECRET_KEY, base_url="https://paper-api.alpaca.markets")
+from utilities import ohlcv_store, feature_store, market_cache, frame_cache
+
+# Downloads of download_many in flight at a time, their requests are also throttled by the rate limit of the exchange
+DOWNLOAD_CONCURRENCY = 16
+
+def shard_ranges(start_ms: int, end_ms: int, interval_ms: int, shards: int) -> List[tuple]:
+    """
+    [start_ms, end_ms) split into at most shards consecutive ranges of whole bars of interval_ms, the first
+    one starting at the first bar open at or after start_ms.
+    """
+    start_ms = -(-start_ms // interval_ms) * interval_ms
+    bars = -(-(end_ms - start_ms) // interval_ms)
+    if bars <= 0:
+        return []
+    shard_ms = -(-bars // shards) * interval_ms
+    return [(shard_start, min(shard_start + shard_ms, end_ms)) for shard_start in range(start_ms, end_ms, shard_ms)]
+
+
+@lru_cache(maxsize=None)
+def alpaca_rest():
+    """
+    Alpaca REST client, created (and alpaca_trade_api imported) on first use.
+    """
+    from alpaca_trade_api.rest import REST
+    return REST(config.ALPACA_API_KEY, config.ALPACA_SECRET_KEY, base_url="https://paper-api.alpaca.markets")
+
 
 class DataManager:
-    def __init__(self, name: str, path: str = "../data") -> None:
+    # Frames read by load, shared by all the DataManager of the process: DataManager.load_cache.stats()
+    load_cache = frame_cache.FrameCache(config.LOAD_CACHE_MAX_BYTES)
+
+    def __init__(self, name: str, path: str = "../data", storage: str = config.DATA_STORAGE,
+                 partition: Optional[str] = config.DATA_PARTITION) -> None:
+        ohlcv_store.check_storage(storage)
+        ohlcv_store.check_partition(partition)
         self.name = name
+        self.storage = storage
+        self.partition = partition
         self.path = Path(__file__).parent.joinpath(config.BASE_DATA_PATH).resolve()
-        if name != 'alpaca':
-            self.exchange = config.EXCHANGES[self.name]["exchange_object"]
         self._check_support()
         self._create_directory(self.path)
         self.markets = None
         self.available_symbols = None
 
+    @cached_property
+    def exchange(self):
+        """
+        ccxt client of the exchange, created the first time it is used (loading the master db does not need it).
+        """
+        exchange = config.EXCHANGES[self.name]["exchange_object"]
+        if self.markets and not exchange.markets:
+            exchange.set_markets(self.markets)  # from the market cache, ccxt does not download them again
+        return exchange
+
+    @cached_property
+    def controller(self):
+        """
+        ThroughputController shared by the downloads from the exchange, see utilities/throughput.py.
+        """
+        from utilities import throughput
+        return throughput.get_controller(self.name)
+
     def _check_support(self) -> None:
         if self.name != 'alpaca' and self.name not in config.EXCHANGES:
             raise ValueError(f"The exchange {self.name} is not supported.")
 
-    def fetch_markets(self):
+    def fetch_markets(self, reload: bool = False) -> None:
+        """
+        Markets of the exchange from the market cache of the data tree (see utilities/market_cache.py), they are
+        only downloaded when the cache is older than config.MARKETS_TTL, or with reload.
+        """
         if self.name != 'alpaca':
-            self.markets = self.exchange.load_markets()
-            self.available_symbols = list(self.markets.keys())
+            # The client may hold markets set from an older cache: a stale cache is downloaded again
+            self._set_markets(market_cache.load_markets(
+                self.name, lambda: self.exchange.load_markets(reload=True), self._markets_folder(), reload=reload))
 
     def fetch_symbol_markets_info(self, symbol: str) -> None:
         if not self.markets:
@@ -43,32 +102,30 @@ class DataManager:
             self.fetch_markets()
         return self.markets[symbol]['limits']
 
+    def fetch_symbol_min_amount(self, symbol: str) -> float:
+        if not self.markets:
+            self.fetch_markets()
+        return market_cache.min_amount(self.markets, symbol)
+
     def fetch_symbol_ticker_info(self, symbol: str, params={}) -> None:
         return self.exchange.fetch_ticker(symbol, params)
 
     def download(self, symbol: str, timeframe: str, start_date: Optional[str] = None,
-                 end_date: Optional[str] = None) -> None:
+                 end_date: Optional[str] = None, incremental: bool = False) -> None:
+        """
+        Downloads the OHLCV between start_date and end_date into the master db.
+        With incremental, only the bars after the last stored one are fetched and appended to the master db
+        (start_date is then ignored), see append_to_master_db.
+        """
         if self.name != 'alpaca' and not self.markets:
             self.fetch_markets()
 
-        if self.name != 'alpaca' and symbol not in self.available_symbols:
-            raise ValueError(f"The trading pair {symbol} either does not exist on {self.name} or the format is wrong.")
-
-        if timeframe not in config.TIMEFRAMES:
-            raise ValueError(f"The timeframe {timeframe} is not supported.")
-
-        # Date format fallback
-        try:
-            if timeframe.endswith("d"):
-                start_date = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime(2017, 1, 1)
-                end_date = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now()
-            else:
-                start_date = datetime.strptime(start_date, "%Y-%m-%d %H:%M:%S") if start_date else datetime(2017, 1, 1)
-                end_date = datetime.strptime(end_date, "%Y-%m-%d %H:%M:%S") if end_date else datetime.now()
-        except ValueError:
-            raise ValueError(f"Date format mismatch. Use '%%Y-%%m-%%d' for daily or '%%Y-%%m-%%d %%H:%%M:%%S' for intraday.")
+        start_ms, end_ms, last_date = self._download_range(symbol, timeframe, start_date, end_date, incremental)
+        if start_ms is None:
+            return
 
         if self.name == 'alpaca':
+            from alpaca_trade_api.rest import TimeFrame
             tf = {
                 '1m': TimeFrame.Minute,
                 '5m': TimeFrame(5, TimeFrame.Unit.Minute),
@@ -77,11 +134,11 @@ class DataManager:
                 '1d': TimeFrame.Day
             }.get(timeframe, TimeFrame.Day)
 
-            bars = alpaca_rest.get_crypto_bars(
+            bars = alpaca_rest().get_crypto_bars(
                 symbol.replace('USDT', 'USD'),
                 timeframe=tf,
-                start=start_date.isoformat() + 'Z',
-                end=end_date.isoformat() + 'Z'
+                start=pd.to_datetime(start_ms, unit='ms').isoformat() + 'Z',
+                end=pd.to_datetime(end_ms, unit='ms').isoformat() + 'Z'
             ).df
 
             bars = bars.reset_index()
@@ -90,130 +147,432 @@ class DataManager:
             ohlcv = bars[['date', 'open', 'high', 'low', 'close', 'volume']]
             ohlcv.set_index('date', inplace=True)
         else:
-            ohlcv_raw = self._get_ohlcv(symbol, timeframe, start_date, end_date)
-            ohlcv = pd.DataFrame(ohlcv_raw, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            ohlcv['date'] = pd.to_datetime(ohlcv['timestamp'], unit='ms')
-            ohlcv = ohlcv[ohlcv['date'].notna()]
-            ohlcv['close'] = pd.to_numeric(ohlcv['close'], errors='coerce')
-            ohlcv = ohlcv[ohlcv['close'].notna()]
-            ohlcv.set_index('date', inplace=True)
-            ohlcv = ohlcv[~ohlcv.index.duplicated(keep='first')]
-            del ohlcv['timestamp']
-            ohlcv = ohlcv.sort_index()
-            ohlcv = ohlcv.iloc[:-1]
-
-        ohlcv = ohlcv.sort_index()
-        ohlcv = self.fundamentals(ohlcv)
-        self.save_to_master_db(ohlcv, symbol, timeframe)
-
-    def load(self, symbol: str, timeframe: str, start_date: Optional[str] = None,
-             end_date: Optional[str] = None) -> pd.DataFrame:
-        file_path = self.path.joinpath(timeframe, symbol.replace('/', '-').replace(':', '-') + ".csv")
-        if not file_path.exists():
-            raise FileNotFoundError(f"No data found at {file_path}. Please run .download() first.")
-
-        df = pd.read_csv(file_path, parse_dates=['date'])
-        df.columns = df.columns.str.strip()
-
-        if start_date:
-            start_date_dt = pd.to_datetime(start_date)
-            df = df[df['date'] >= start_date_dt]
-        if end_date:
-            end_date_dt = pd.to_datetime(end_date)
-            df = df[df['date'] <= end_date_dt]
+            ohlcv = self._ohlcv_frame(self._get_ohlcv(symbol, timeframe, start_ms, end_ms))
+
+        self._store_download(ohlcv, symbol, timeframe, last_date)
+
+    def download_many(self, symbols: List[str], timeframes: List[str], start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, incremental: bool = False,
+                      max_concurrency: int = DOWNLOAD_CONCURRENCY) -> pd.DataFrame:
+        """
+        Downloads every symbol in every timeframe concurrently, see download_many_async.
+        Also works from a notebook, whose event loop is already running.
+        """
+        return self._run_coroutine(
+            self.download_many_async(symbols, timeframes, start_date, end_date, incremental, max_concurrency)
+        )
+
+    async def download_many_async(self, symbols: List[str], timeframes: List[str], start_date: Optional[str] = None,
+                                  end_date: Optional[str] = None, incremental: bool = False,
+                                  max_concurrency: int = DOWNLOAD_CONCURRENCY) -> pd.DataFrame:
+        """
+        Downloads every symbol in every timeframe (see download), at most max_concurrency at a time, over a
+        single async session of the exchange: its rate limit throttles the requests of all the downloads.
+        Returns the throughput of every download (rows, requests, seconds, rows_per_second) and its error,
+        a failed download does not stop the others.
+        """
+        if self.name == 'alpaca':
+            raise ValueError("Concurrent downloads are not supported for alpaca, use download.")
 
-        df.set_index('date', inplace=True)
-        df.sort_index(inplace=True)
-        return df
-
-    def fundamentals(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-        df = df.sort_index()
-
-        for window in [20, 50, 200]:
-            df[f'sma_{window}'] = df['close'].rolling(window=window).mean()
-            df[f'ema_{window}'] = df['close'].ewm(span=window, adjust=False).mean()
-
-        df['ema_12'] = df['close'].ewm(span=12, adjust=False).mean()
-        df['ema_26'] = df['close'].ewm(span=26, adjust=False).mean()
-        df['macd'] = df['ema_12'] - df['ema_26']
-        df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
-
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        df['bb_std'] = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (2 * df['bb_std'])
-        df['bb_lower'] = df['bb_middle'] - (2 * df['bb_std'])
-
-        df['bullish'] = df['close'] > df['sma_200']
-        df['candle_color'] = ['green' if c > o else 'red' for c, o in zip(df['close'], df['open'])]
-        df['candle_streak_count'] = df['candle_color'].ne(df['candle_color'].shift()).cumsum()
-        df['candle_streak_count'] = df.groupby('candle_streak_count').cumcount() + 1
-
-        def determine_trend(row):
-            if row['close'] > row['sma_200'] and row['ema_12'] > row['ema_26']:
-                return 'uptrend'
-            elif row['close'] < row['sma_200'] and row['ema_12'] < row['ema_26']:
-                return 'downtrend'
-            else:
-                return 'sideways'
+        exchange = self._async_exchange()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        try:
+            await self._load_markets_async(exchange)
+            report = await asyncio.gather(*(
+                self._download_async(exchange, semaphore, symbol, timeframe, start_date, end_date, incremental)
+                for symbol in dict.fromkeys(symbols) for timeframe in dict.fromkeys(timeframes)
+            ))
+        finally:
+            await exchange.close()
+        return pd.DataFrame(report)
+
+    def backfill(self, symbol: str, timeframe: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                 shards: int = DOWNLOAD_CONCURRENCY) -> pd.DataFrame:
+        """
+        Downloads the history of a symbol as concurrent shards, see backfill_async.
+        Also works from a notebook, whose event loop is already running.
+        """
+        return self._run_coroutine(self.backfill_async(symbol, timeframe, start_date, end_date, shards))
+
+    async def backfill_async(self, symbol: str, timeframe: str, start_date: Optional[str] = None,
+                             end_date: Optional[str] = None, shards: int = DOWNLOAD_CONCURRENCY) -> pd.DataFrame:
+        """
+        Downloads the OHLCV between start_date and end_date into the master db (see download), split into shards
+        of whole bars (see shard_ranges) that are paged concurrently over a single async session of the exchange,
+        within its rate limit.
+
+        The shards are merged in order: the bars a shard fetches outside of its range are dropped (they belong
+        to its neighbours) and the bars missing since the end of the previous shard are counted and printed.
+        Returns the shards with their rows, requests, seconds and missing_bars.
+        """
+        if self.name == 'alpaca':
+            raise ValueError("Concurrent downloads are not supported for alpaca, use download.")
+        if shards < 1:
+            raise ValueError("The number of shards must be positive.")
 
-        df['trend'] = df.apply(determine_trend, axis=1)
-        return df
+        exchange = self._async_exchange()
+        try:
+            await self._load_markets_async(exchange)
+            start_ms, end_ms, _ = self._download_range(symbol, timeframe, start_date, end_date, False)
+            interval_ms = config.TIMEFRAMES[timeframe]["interval_ms"]
+            ranges = shard_ranges(start_ms, end_ms, interval_ms, shards)
+            results = await asyncio.gather(*(
+                self._fetch_shard(exchange, symbol, timeframe, shard, start_ms, end_ms)
+                for shard, (start_ms, end_ms) in enumerate(ranges)
+            ))
+        finally:
+            await exchange.close()
+
+        ohlcv_raw = []
+        report = []
+        for shard_report, shard_ohlcv in results:
+            if shard_ohlcv:
+                times = np.array(([ohlcv_raw[-1][0]] if ohlcv_raw else []) + [row[0] for row in shard_ohlcv])
+                shard_report["missing_bars"] = int((np.diff(times) // interval_ms - 1).sum())
+                if shard_report["missing_bars"]:
+                    print(f"{shard_report['missing_bars']} bars missing in shard {shard_report['shard']} of {symbol} {timeframe} "
+                          f"(up to {shard_report['end']})")
+            ohlcv_raw.extend(shard_ohlcv)
+            report.append(shard_report)
+
+        self._store_download(self._ohlcv_frame(ohlcv_raw), symbol, timeframe, None)
+        report = pd.DataFrame(report)
+        seconds = report["seconds"].max() if len(report) else 0.0
+        print(f"{symbol} {timeframe}: {len(ohlcv_raw)} rows in {report['requests'].sum() if len(report) else 0} requests "
+              f"over {len(report)} shards, {seconds:.1f}s")
+        return report
+
+    def load(self, symbol: str, timeframe: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+             columns: Optional[List[str]] = None, dtypes: Optional[str] = None) -> pd.DataFrame:
+        """
+        OHLCV of the master db between start_date and end_date, indexed by date.
+        columns restricts the columns read (all the OHLCV by default, a strategy reads its required_columns),
+        derived features are served by features. dtypes "compact" loads them with the compact dtype profile
+        (float32 prices and volumes), see ohlcv_store.compact_dtypes.
+
+        The whole stored history of the columns is read once and kept in load_cache until the file changes,
+        the date range is a slice of it that shares its rows (see frame_cache.date_slice): copy it before
+        modifying its values in place. A history too large for load_cache is not cached, only the date range
+        is read from the master db (skipping the partitions and row groups outside of it).
+        """
+        ohlcv_store.check_dtypes(dtypes)
+        file_path = self._master_db_path(symbol, timeframe)
+        columns = list(columns or ohlcv_store.OHLCV_COLUMNS)
+        key = (str(file_path), tuple(columns), dtypes)
+        version = ohlcv_store.data_version(file_path)
+        df = self.load_cache.lookup(key, version)
+        if df is None:
+            if not self.load_cache.fits(ohlcv_store.estimated_memory(file_path, columns)):
+                return self._read_master_db(file_path, columns, dtypes, start_date, end_date)
+            df = self._read_master_db(file_path, columns, dtypes)
+            self.load_cache.put(key, version, df)
+        return frame_cache.date_slice(df, start_date, end_date)
+
+    def features(self, symbol: str, timeframe: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                 name: str = "fundamentals", columns: Optional[List[str]] = None, dtypes: Optional[str] = None,
+                 **params) -> pd.DataFrame:
+        """
+        OHLCV with the feature set name (see feature_store.FEATURES, computed with params) between start_date
+        and end_date. The features are computed over the whole stored history on the first request and cached
+        on disk until the stored OHLCV changes, see feature_store.load_features.
+        columns restricts the OHLCV and feature columns read from the cache, dtypes as in load.
+        """
+        ohlcv_store.check_dtypes(dtypes)
+        file_path = self._master_db_path(symbol, timeframe)
+        version = ohlcv_store.data_version(file_path)
+        cache_folder = self.path.joinpath(feature_store.FEATURES_FOLDER, timeframe, ohlcv_store.file_stem(symbol))
+        df = feature_store.load_features(
+            cache_folder, name, params, version, lambda: self.load(symbol, timeframe), self.storage, start_date, end_date,
+            columns,
+        )
+        return ohlcv_store.compact_dtypes(df) if dtypes == "compact" else df
+
+    def fundamentals(self, df: pd.DataFrame, history: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Derived columns of the OHLCV of df, see feature_store.fundamentals.
+        """
+        return feature_store.fundamentals(df, history)
 
     def save_to_master_db(self, df: pd.DataFrame, symbol: str, timeframe: str):
-        folder_path = self.path.joinpath(timeframe)
-        folder_path.mkdir(parents=True, exist_ok=True)
-
-        filename = symbol.replace('/', '-').replace(':', '-') + ".csv"
-        file_path = folder_path.joinpath(filename)
+        file_path = self._file_path(symbol, timeframe)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
 
-        df = df.copy()
-        df['exchange'] = self.name
-        df['pair'] = symbol
-        df['timeframe'] = timeframe
-        df['date_downloaded'] = datetime.now()
-        df.reset_index(inplace=True)
+        df = df[list(ohlcv_store.OHLCV_COLUMNS)].reset_index()
 
-        if file_path.exists():
-            existing_df = pd.read_csv(file_path, parse_dates=['date'])
+        existing_path = self._stored_file_path(symbol, timeframe)
+        if existing_path is not None:
+            existing_df = ohlcv_store.read_ohlcv(existing_path, list(ohlcv_store.OHLCV_COLUMNS))
             combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df.drop_duplicates(subset=['pair', 'timeframe', 'date'], keep='last', inplace=True)
+            combined_df.drop_duplicates(subset=['date'], keep='last', inplace=True)
         else:
             combined_df = df
 
         combined_df['date'] = pd.to_datetime(combined_df['date'], errors='coerce', utc=True).dt.tz_localize(None)
-        numeric_cols = combined_df.select_dtypes(include=['float64', 'float32', 'int']).columns
-        combined_df[numeric_cols] = combined_df[numeric_cols].round(2)
         combined_df.sort_values(by='date', inplace=True)
-        combined_df.to_csv(file_path, index=False)
+        ohlcv_store.write_ohlcv(combined_df, file_path, self.partition)
         print(f"Saved {len(df)} new rows to {file_path.name}")
 
+    def append_to_master_db(self, ohlcv: pd.DataFrame, symbol: str, timeframe: str) -> None:
+        """
+        Appends OHLCV bars later than the last stored one to the master db, without reading or rewriting the
+        stored rows (see ohlcv_store.append_ohlcv). Falls back to save_to_master_db for a file saved with the
+        derived features, which rewrites it with the OHLCV only.
+        """
+        if ohlcv.empty:
+            print(f"No new rows for {symbol} {timeframe}")
+            return
+
+        file_path = self._stored_file_path(symbol, timeframe)
+        df = ohlcv[list(ohlcv_store.OHLCV_COLUMNS)].reset_index()
+        if set(df.columns) != set(ohlcv_store.read_column_names(file_path)):
+            self.save_to_master_db(ohlcv, symbol, timeframe)
+            return
+        ohlcv_store.append_ohlcv(df, file_path)
+        print(f"Appended {len(df)} new rows to {file_path.name}")
+
+    def last_stored_date(self, symbol: str, timeframe: str) -> Optional[pd.Timestamp]:
+        """
+        Date of the last bar of the master db, None if nothing is stored.
+        """
+        file_path = self._stored_file_path(symbol, timeframe)
+        return ohlcv_store.last_date(file_path) if file_path is not None else None
+
+    def export_arrays(self, symbol: str, timeframe: str) -> Path:
+        """
+        Writes the OHLCV of the master db as memory-mappable arrays, see ohlcv_store.write_ohlcv_arrays.
+        """
+        folder = self._arrays_path(symbol, timeframe)
+        version = ohlcv_store.data_version(self._master_db_path(symbol, timeframe))  # before reading, a later write re-exports
+        ohlcv = self.load(symbol, timeframe)
+        ohlcv_store.write_ohlcv_arrays(ohlcv, folder, version)
+        return folder
+
+    def load_arrays(self, symbol: str, timeframe: str, start_date: Optional[str] = None,
+                    end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        OHLCV between start_date and end_date backed by read-only memory maps, shared by all the processes
+        that load it (e.g. the workers of a sweep). The arrays are (re)exported when they were not exported
+        from the current version of the master db (see ohlcv_store.data_version).
+        """
+        folder = self._arrays_path(symbol, timeframe)
+        file_path = self._stored_file_path(symbol, timeframe)
+        exported_version = ohlcv_store.arrays_version(folder)
+        if exported_version is None or (file_path is not None and exported_version != json.dumps(ohlcv_store.data_version(file_path))):
+            self.export_arrays(symbol, timeframe)
+        return ohlcv_store.open_ohlcv_arrays(folder, start_date, end_date)
+
+    def convert_master_db(self, symbol: str, timeframe: str) -> Path:
+        """
+        Rewrites the master db of the symbol in the storage and partition of the DataManager (e.g. a single
+        file as monthly partitions) with the raw OHLCV only, returns the written file or folder.
+        """
+        existing_path = self._master_db_path(symbol, timeframe)
+        file_path = self._file_path(symbol, timeframe)
+        ohlcv_store.write_ohlcv(ohlcv_store.read_ohlcv(existing_path, list(ohlcv_store.OHLCV_COLUMNS)), file_path, self.partition)
+        if existing_path != file_path:
+            shutil.rmtree(existing_path) if existing_path.is_dir() else existing_path.unlink()
+        return file_path
+
+    def convert_csv_files(self, remove_csv: bool = False) -> List[Path]:
+        """
+        Converts the CSV files of the data folder to the columnar storage, see ohlcv_store.convert_csv_tree.
+        """
+        return ohlcv_store.convert_csv_tree(self.path, remove_csv)
+
+    def _download_range(self, symbol: str, timeframe: str, start_date: Optional[str], end_date: Optional[str],
+                        incremental: bool) -> tuple:
+        """
+        (start_ms, end_ms, last stored date if incremental) of a download, in milliseconds since the epoch,
+        start_ms is None when the master db is already up to date.
+        """
+        if self.name != 'alpaca' and symbol not in self.available_symbols:
+            raise ValueError(f"The trading pair {symbol} either does not exist on {self.name} or the format is wrong.")
+
+        if timeframe not in config.TIMEFRAMES:
+            raise ValueError(f"The timeframe {timeframe} is not supported.")
+
+        # Date format fallback
+        try:
+            if timeframe.endswith("d"):
+                start_date = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime(2017, 1, 1)
+                end_date = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now()
+            else:
+                start_date = datetime.strptime(start_date, "%Y-%m-%d %H:%M:%S") if start_date else datetime(2017, 1, 1)
+                end_date = datetime.strptime(end_date, "%Y-%m-%d %H:%M:%S") if end_date else datetime.now()
+        except ValueError:
+            raise ValueError(f"Date format mismatch. Use '%%Y-%%m-%%d' for daily or '%%Y-%%m-%%d %%H:%%M:%%S' for intraday.")
+
+        start_ms = int(start_date.timestamp() * 1000)
+        end_ms = int(end_date.timestamp() * 1000)
+        last_date = self.last_stored_date(symbol, timeframe) if incremental else None
+        if last_date is not None:
+            start_ms = last_date.value // 10**6 + 1  # the stored dates are UTC, not local times like start_date
+            if start_ms >= end_ms:
+                print(f"{symbol} {timeframe} is up to date ({last_date})")
+                return None, end_ms, last_date
+        return start_ms, end_ms, last_date
+
+    async def _download_async(self, exchange, semaphore: asyncio.Semaphore, symbol: str, timeframe: str,
+                              start_date: Optional[str], end_date: Optional[str], incremental: bool) -> Dict[str, Any]:
+        report = {"symbol": symbol, "timeframe": timeframe, "rows": 0, "requests": 0, "seconds": 0.0, "error": None}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                start, end, last_date = self._download_range(symbol, timeframe, start_date, end_date, incremental)
+                if start is not None:
+                    ohlcv_raw = await self._get_ohlcv_async(exchange, symbol, timeframe, start, end, report)
+                    # Off the event loop, so that the other downloads keep fetching meanwhile
+                    report["rows"] = await asyncio.to_thread(self._store_download, self._ohlcv_frame(ohlcv_raw), symbol, timeframe, last_date)
+            except Exception as e:  # a failed download must not stop the others
+                report["error"] = repr(e)
+            report["seconds"] = time.perf_counter() - started
+
+        report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+        print(f"{symbol} {timeframe}: {report['rows']} rows in {report['requests']} requests, "
+              f"{report['seconds']:.1f}s ({report['rows_per_second']:.0f} rows/s)" + (f", {report['error']}" if report["error"] else ""))
+        return report
+
+    async def _fetch_shard(self, exchange, symbol: str, timeframe: str, shard: int, start_ms: int,
+                           end_ms: int) -> tuple:
+        report = {"shard": shard, "start": pd.to_datetime(start_ms, unit='ms'), "end": pd.to_datetime(end_ms, unit='ms'),
+                  "rows": 0, "requests": 0, "seconds": 0.0, "missing_bars": 0}
+        started = time.perf_counter()
+        ohlcv = await self._get_ohlcv_async(exchange, symbol, timeframe, start_ms, end_ms, report)
+        ohlcv = [row for row in ohlcv if start_ms <= row[0] < end_ms]
+        report["rows"] = len(ohlcv)
+        report["seconds"] = time.perf_counter() - started
+        return report, ohlcv
+
+    def _async_exchange(self):
+        """
+        New async ccxt client of the exchange, a session shared by the concurrent downloads of a call.
+        """
+        import ccxt.async_support as ccxt_async
+        return getattr(ccxt_async, self.exchange.id)(config=dict(config.EXCHANGES[self.name].get("ccxt_config", {})))
+
+    async def _load_markets_async(self, exchange) -> None:
+        """
+        Markets of an async session of the exchange, from the market cache when it is fresh (see fetch_markets).
+        """
+        markets = market_cache.cached_markets(self.name, self._markets_folder())
+        if markets is None:
+            markets = market_cache.store_markets(self.name, await exchange.load_markets(), self._markets_folder())
+        else:
+            exchange.set_markets(markets)
+        self._set_markets(markets)
+
+    def _set_markets(self, markets: Dict[str, dict]) -> None:
+        self.markets = markets
+        self.available_symbols = list(markets.keys())
+        if config.EXCHANGES[self.name].is_built() and not self.exchange.markets:
+            self.exchange.set_markets(markets)
+
+    def _run_coroutine(self, coroutine):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        with ThreadPoolExecutor(max_workers=1) as executor:  # a notebook already runs an event loop in this thread
+            return executor.submit(asyncio.run, coroutine).result()
+
+    def _ohlcv_frame(self, ohlcv_raw: List[List[Any]]) -> pd.DataFrame:
+        ohlcv = pd.DataFrame(ohlcv_raw, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        ohlcv['date'] = pd.to_datetime(ohlcv['timestamp'], unit='ms')
+        ohlcv = ohlcv[ohlcv['date'].notna()]
+        ohlcv['close'] = pd.to_numeric(ohlcv['close'], errors='coerce')
+        ohlcv = ohlcv[ohlcv['close'].notna()]
+        ohlcv.set_index('date', inplace=True)
+        ohlcv = ohlcv[~ohlcv.index.duplicated(keep='first')]
+        del ohlcv['timestamp']
+        ohlcv = ohlcv.sort_index()
+        return ohlcv.iloc[:-1]
+
+    def _store_download(self, ohlcv: pd.DataFrame, symbol: str, timeframe: str, last_date: Optional[pd.Timestamp]) -> int:
+        """
+        Saves downloaded bars to the master db, returns the number of new bars.
+        """
+        ohlcv = ohlcv.sort_index()
+        if last_date is not None:
+            ohlcv = ohlcv[ohlcv.index > last_date]
+            self.append_to_master_db(ohlcv, symbol, timeframe)
+            return len(ohlcv)
+        self.save_to_master_db(ohlcv, symbol, timeframe)
+        return len(ohlcv)
+
+    def _file_path(self, symbol: str, timeframe: str, storage: Optional[str] = None) -> Path:
+        return self.path.joinpath(timeframe, ohlcv_store.file_name(symbol, storage or self.storage))
+
+    def _arrays_path(self, symbol: str, timeframe: str) -> Path:
+        return self.path.joinpath(timeframe, ohlcv_store.file_stem(symbol) + ohlcv_store.ARRAYS_EXTENSION)
+
+    def _read_master_db(self, file_path: Path, columns: List[str], dtypes: Optional[str] = None,
+                        start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+        df = ohlcv_store.read_ohlcv(file_path, columns, start_date, end_date)
+        df.set_index('date', inplace=True)
+        df.sort_index(inplace=True)
+        return ohlcv_store.compact_dtypes(df) if dtypes == "compact" else df
+
+    def _markets_folder(self) -> Path:
+        return self.path.joinpath(config.MARKETS_FOLDER)
+
+    def _master_db_path(self, symbol: str, timeframe: str) -> Path:
+        file_path = self._stored_file_path(symbol, timeframe)
+        if file_path is None:
+            file_path = self._file_path(symbol, timeframe)
+            raise FileNotFoundError(f"No data found at {file_path}. Please run .download() first.")
+        return file_path
+
+    def _stored_file_path(self, symbol: str, timeframe: str) -> Optional[Path]:
+        """
+        File of the symbol in the storage of the DataManager, else in any other storage (e.g. a CSV saved
+        before the switch to Parquet), None if there is none.
+        """
+        for storage in (self.storage,) + tuple(s for s in ohlcv_store.STORAGE_FORMATS if s != self.storage):
+            file_path = self._file_path(symbol, timeframe, storage)
+            if file_path.exists():
+                return file_path
+        return None
+
     def _create_directory(self, path: Path) -> None:
         path.mkdir(parents=True, exist_ok=True)
 
-    def _get_ohlcv(self, symbol: str, timeframe: str, start_date: datetime, end_date: datetime) -> List[List[Any]]:
-        current_date_ms = int(start_date.timestamp() * 1000)
-        end_date_ms = int(end_date.timestamp() * 1000)
+    def _check_end_of_data(self, symbol: str, timeframe: str, current_date_ms: int, end_date_ms: int) -> None:
+        """
+        Warns when the exchange has no bars after current_date_ms although the end of the download (or now)
+        is several bars away, e.g. a delisted symbol: the download stops there.
+        """
+        interval_ms = config.TIMEFRAMES[timeframe]["interval_ms"]
+        if current_date_ms < min(end_date_ms, self.exchange.milliseconds()) - 2 * interval_ms:
+            print(f"Warning: no {symbol} {timeframe} bars after {pd.to_datetime(current_date_ms, unit='ms')} on {self.name}, "
+                  f"the download stops before {pd.to_datetime(end_date_ms, unit='ms')}")
+
+    def _get_ohlcv(self, symbol: str, timeframe: str, current_date_ms: int, end_date_ms: int) -> List[List[Any]]:
         ohlcv = []
 
         while current_date_ms < end_date_ms:
-            fetched_data = self.exchange.fetch_ohlcv(
-                symbol=symbol,
-                timeframe=timeframe,
-                since=current_date_ms,
-                limit=config.EXCHANGES[self.name]["limit_size_request"]
-            )
+            fetched_data = self.controller.fetch_ohlcv(self.exchange, symbol, timeframe, current_date_ms)
             if fetched_data:
                 ohlcv.extend(fetched_data)
                 current_date_ms = fetched_data[-1][0] + 1
                 print(f"fetched {self.name} ohlcv data for {symbol} from {datetime.fromtimestamp(current_date_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')}")
             else:
+                self._check_end_of_data(symbol, timeframe, current_date_ms, end_date_ms)
+                break
+
+        return ohlcv
+
+    async def _get_ohlcv_async(self, exchange, symbol: str, timeframe: str, current_date_ms: int, end_date_ms: int,
+                               report: Dict[str, Any]) -> List[List[Any]]:
+        ohlcv = []
+
+        while current_date_ms < end_date_ms:
+            report["requests"] += 1
+            fetched_data = await self.controller.fetch_ohlcv_async(exchange, symbol, timeframe, current_date_ms)
+            if fetched_data:
+                ohlcv.extend(fetched_data)
+                current_date_ms = fetched_data[-1][0] + 1
+            else:
+                self._check_end_of_data(symbol, timeframe, current_date_ms, end_date_ms)
                 break
 
         return ohlcv
@@ -0,0 +1,118 @@
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utilities import ohlcv_store
+
+# Folder of the data tree that holds the cached features, one sub folder per timeframe and symbol
+FEATURES_FOLDER = "features"
+
+
+def fundamentals(
+        df: pd.DataFrame,
+        history: Optional[pd.DataFrame] = None,
+        windows: Tuple[int, ...] = (20, 50, 200),
+        rsi_period: int = 14,
+        bb_period: int = 20,
+        bb_deviations: float = 2,
+) -> pd.DataFrame:
+    """
+    Adds the derived columns (moving averages, MACD, RSI, Bollinger bands, trend, candle color and streaks)
+    to the OHLCV of df, with column operations only. bullish and trend compare the close to the longest
+    moving average of windows.
+    history are the bars preceding df, the windows are computed over them but only the rows of df are returned.
+    """
+    df = df.sort_index()
+    if history is not None and len(history):
+        df = pd.concat([history[df.columns].sort_index(), df])
+    else:
+        df = df.copy()
+        history = None
+    close = df['close']
+
+    for window in windows:
+        df[f'sma_{window}'] = close.rolling(window=window).mean()
+        df[f'ema_{window}'] = close.ewm(span=window, adjust=False).mean()
+
+    df['ema_12'] = close.ewm(span=12, adjust=False).mean()
+    df['ema_26'] = close.ewm(span=26, adjust=False).mean()
+    df['macd'] = df['ema_12'] - df['ema_26']
+    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=rsi_period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean()
+    rs = gain / loss
+    df['rsi'] = 100 - (100 / (1 + rs))
+
+    df['bb_middle'] = df[f'sma_{bb_period}'] if bb_period in windows else close.rolling(window=bb_period).mean()
+    df['bb_std'] = close.rolling(window=bb_period).std()
+    df['bb_upper'] = df['bb_middle'] + (bb_deviations * df['bb_std'])
+    df['bb_lower'] = df['bb_middle'] - (bb_deviations * df['bb_std'])
+
+    trend_ma = df[f'sma_{max(windows)}']
+    df['bullish'] = close > trend_ma
+    green = (close > df['open']).to_numpy()
+    df['candle_color'] = np.where(green, 'green', 'red').astype(object)
+    # Position in the run of same colored candles: distance to the first candle of the run
+    position = np.arange(len(df))
+    run_start = np.ones(len(df), dtype=bool)
+    run_start[1:] = green[1:] != green[:-1]
+    df['candle_streak_count'] = position - np.maximum.accumulate(np.where(run_start, position, 0)) + 1
+
+    above = (close > trend_ma) & (df['ema_12'] > df['ema_26'])
+    below = (close < trend_ma) & (df['ema_12'] < df['ema_26'])
+    df['trend'] = np.select([above, below], ['uptrend', 'downtrend'], 'sideways').astype(object)
+
+    if history is not None:
+        df = df.iloc[len(history):]
+    return df
+
+
+# Feature sets that can be requested from the cache: name -> function(ohlcv, **params) returning the ohlcv with its features
+FEATURES: Dict[str, Callable[..., pd.DataFrame]] = {
+    "fundamentals": fundamentals,
+}
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def load_features(
+        cache_folder: Path,
+        name: str,
+        params: Dict[str, Any],
+        version: List[Any],
+        load_ohlcv: Callable[[], pd.DataFrame],
+        storage: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Feature set name (see FEATURES) of an OHLCV history between start_date and end_date, indexed by date.
+    columns restricts the OHLCV and feature columns read from the cache (all of them by default).
+
+    The features are computed over the whole history (given by load_ohlcv) the first time they are requested
+    with these params for this version of the stored OHLCV, and cached in cache_folder. Later requests only
+    read the requested range of the cache. The entries of older versions with the same params are removed.
+    """
+    if name not in FEATURES:
+        raise ValueError(f"Wrong feature set. Can either be {', '.join(FEATURES)}.")
+
+    params_key = _digest([name, params])
+    file_path = cache_folder.joinpath(f"{name}-{params_key}-{_digest(version)}{ohlcv_store.EXTENSIONS[storage]}")
+    if not file_path.exists():
+        df = FEATURES[name](load_ohlcv(), **params)
+        cache_folder.mkdir(parents=True, exist_ok=True)
+        ohlcv_store.write_ohlcv(df.reset_index(), file_path)  # swapped in, concurrent readers never see a half written entry
+        for stale_path in cache_folder.glob(f"{name}-{params_key}-*{file_path.suffix}"):
+            if stale_path != file_path and ".tmp" not in stale_path.suffixes:
+                stale_path.unlink(missing_ok=True)
+
+    df = ohlcv_store.read_ohlcv(file_path, columns, start_date, end_date)
+    return df.set_index('date').sort_index()
@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class FrameCache:
+    """
+    Least recently used cache of DataFrames within a memory budget of max_bytes, see DataManager.load.
+
+    An entry is stored with the version of its source (e.g. ohlcv_store.data_version of the file) and only
+    served while the source has that version. The least recently used entries are evicted once the cached
+    frames exceed max_bytes, a frame larger than max_bytes is not cached.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (version, frame, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Any, load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Cached frame of key, loaded with load when it is not cached or its version changed.
+        """
+        df = self.lookup(key, version)
+        if df is None:
+            df = load()
+            self.put(key, version, df)
+        return df
+
+    def lookup(self, key: Hashable, version: Any) -> Optional[pd.DataFrame]:
+        """
+        Cached frame of key, None when it is not cached or its version changed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, version: Any, df: pd.DataFrame) -> None:
+        """
+        Caches df as the frame of key at version, evicting the least recently used entries beyond max_bytes.
+        """
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self._remove(key)
+            if self.fits(size):
+                self._entries[key] = (version, df, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+
+    def fits(self, size: int) -> bool:
+        """
+        Whether a frame of size bytes can be cached.
+        """
+        return size <= self.max_bytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+
+def date_slice(df: pd.DataFrame, start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Rows of df (indexed by sorted dates) between start_date and end_date, both included, found by binary search.
+    The rows are not copied: the returned frame shares them with df, new columns can be added to it freely.
+    """
+    dates = df.index.to_numpy()
+    first = np.searchsorted(dates, pd.Timestamp(start_date).to_datetime64(), side="left") if start_date else 0
+    last = np.searchsorted(dates, pd.Timestamp(end_date).to_datetime64(), side="right") if end_date else len(df)
+    return df.iloc[first:last].copy(deep=False)
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import sys
+sys.path.append('./config')
+import config
+
+# Folder of the cached markets shared by the DataManager and the live scripts, one file per exchange
+MARKETS_PATH = Path(__file__).parent.joinpath(config.BASE_DATA_PATH, config.MARKETS_FOLDER).resolve()
+
+# Markets already read by this process, cache file -> (fetched_at, markets)
+_markets: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+def cached_markets(exchange_name: str, folder: Optional[Path] = None, ttl: float = config.MARKETS_TTL) -> Optional[Dict[str, dict]]:
+    """
+    Markets of exchange_name (symbol -> ccxt market with its limits and precision) cached in folder
+    (MARKETS_PATH by default), None when there are none or they are older than ttl seconds.
+    """
+    folder = Path(folder or MARKETS_PATH)
+    file_path = folder.joinpath(f"{exchange_name}.json")
+    entry = _markets.get(str(file_path))
+    if entry is None and file_path.exists():
+        try:
+            with open(file_path, "r") as file:
+                content = json.load(file)
+            entry = _markets[str(file_path)] = (content["fetched_at"], content["markets"])
+        except (ValueError, KeyError):  # a corrupted cache is downloaded again
+            return None
+    if entry is None or time.time() - entry[0] >= ttl:
+        return None
+    return entry[1]
+
+
+def store_markets(exchange_name: str, markets: Dict[str, dict], folder: Optional[Path] = None) -> Dict[str, dict]:
+    """
+    Caches the markets of exchange_name in folder (MARKETS_PATH by default) and returns them.
+    """
+    folder = Path(folder or MARKETS_PATH)
+    file_path = folder.joinpath(f"{exchange_name}.json")
+    fetched_at = time.time()
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f"{file_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump({"fetched_at": fetched_at, "markets": markets}, file, default=str)
+    os.replace(tmp_path, file_path)  # swapped in, concurrent readers never see a half written cache
+    _markets[str(file_path)] = (fetched_at, markets)
+    return markets
+
+
+def load_markets(exchange_name: str, fetch: Callable[[], Dict[str, dict]], folder: Optional[Path] = None,
+                 ttl: float = config.MARKETS_TTL, reload: bool = False) -> Dict[str, dict]:
+    """
+    Markets of exchange_name from the cache of folder (MARKETS_PATH by default), only downloaded with fetch
+    (e.g. exchange.load_markets) when the cache is missing or older than ttl seconds, or with reload.
+    """
+    with _lock:  # the threads of a process download them once
+        markets = None if reload else cached_markets(exchange_name, folder, ttl)
+        if markets is None:
+            markets = store_markets(exchange_name, fetch(), folder)
+    return markets
+
+
+def min_amount(markets: Dict[str, dict], symbol: str) -> Any:
+    """
+    Smallest order amount of symbol allowed by the exchange.
+    """
+    return markets[symbol]["limits"]["amount"]["min"]
@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Any, List, Optional
+
+STORAGE_FORMATS = ("parquet", "csv")
+EXTENSIONS = {"parquet": ".parquet", "csv": ".csv"}
+
+# Columns of the master db files (besides "date"), derived features are served by feature_store
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Columns of the master db files that hold timestamps ("date_downloaded" in files saved with the derived features)
+DATE_COLUMNS = ("date", "date_downloaded")
+
+# Partitioned layout: the master db file is a folder of the same name (e.g. 4h/BTC-USDT.parquet/) holding one
+# file per period (2021-03.parquet), partition -> pandas period frequency
+PARTITIONS = {"month": "M", "year": "Y"}
+
+# Dtype profiles of the loaded frames (None keeps the stored dtypes), see compact_dtypes
+DTYPE_PROFILES = ("compact",)
+
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 16_384
+# Appended rows of a Parquet file are written as part files next to it (BTC-USDT.part000001.parquet, or
+# 2021-03.part000001.parquet in a partitioned master db), merged into one part beyond this number of parts
+PARQUET_MAX_PARTS = 32
+
+# Memory-mapped arrays: a folder per symbol with the int64 epoch (ns) index and the float64 OHLCV columns,
+# and the manifest that names the current export
+ARRAYS_EXTENSION = ".arrays"
+ARRAYS_MANIFEST = "arrays.json"
+ARRAY_COLUMNS = OHLCV_COLUMNS
+
+
+def check_storage(storage: str) -> None:
+    if storage not in STORAGE_FORMATS:
+        raise ValueError(f"Wrong storage format. Can either be {', '.join(STORAGE_FORMATS)}.")
+
+
+def file_stem(symbol: str) -> str:
+    return symbol.replace('/', '-').replace(':', '-')
+
+
+def file_name(symbol: str, storage: str) -> str:
+    return file_stem(symbol) + EXTENSIONS[storage]
+
+
+def check_partition(partition: Optional[str]) -> None:
+    if partition is not None and partition not in PARTITIONS:
+        raise ValueError(f"Wrong partition. Can either be None, {', '.join(PARTITIONS)}.")
+
+
+def check_dtypes(dtypes: Optional[str]) -> None:
+    if dtypes is not None and dtypes not in DTYPE_PROFILES:
+        raise ValueError(f"Wrong dtypes. Can either be None, {', '.join(DTYPE_PROFILES)}.")
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The "compact" dtype profile of df: float32 prices and volumes (about 7 significant digits), downcast
+    integers, boolean signals as bool and the other strings as categories. The dates are kept.
+    """
+    df = df.copy(deep=False)
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_float_dtype(values):
+            df[column] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values):
+            df[column] = pd.to_numeric(values, downcast="integer")
+        elif values.dtype == object:
+            if values.notna().all() and values.map(type).isin([bool, np.bool_]).all():
+                df[column] = values.astype(bool)
+            else:
+                df[column] = values.astype("category")
+    return df
+
+
+def partition_files(folder: Path) -> List[Path]:
+    """
+    Partition files of a partitioned master db, in chronological order.
+    """
+    return sorted(path for path in folder.glob("*" + folder.suffix) if len(path.suffixes) == 1)
+
+
+def part_files(file_path: Path) -> List[Path]:
+    """
+    Part files holding the rows appended to a Parquet file, in the order they were written.
+    """
+    return sorted(
+        path for path in file_path.parent.glob(f"{file_path.stem}.part*{file_path.suffix}")
+        if path.suffixes[-2][len(".part"):].isdigit()
+    )
+
+
+def read_ohlcv(
+        file_path: Path,
+        columns: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Rows of a master db file between start_date and end_date (both included), with a "date" column.
+    columns restricts the columns read from disk ("date" is always read). Parquet files only decode the
+    requested columns and skip the row groups outside of the date range. A partitioned master db only
+    opens the partitions that overlap the date range.
+    """
+    if columns is not None:
+        columns = ["date"] + [column for column in columns if column != "date"]
+    if file_path.is_dir():
+        return _read_partitions(file_path, columns, start_date, end_date)
+    return _read_file(file_path, columns, start_date, end_date)
+
+
+def write_ohlcv(df: pd.DataFrame, file_path: Path, partition: Optional[str] = None) -> None:
+    """
+    Writes a master db file (with a "date" column, sorted by date) in the format given by its extension,
+    or a folder of that name with a file per partition period ("month" or "year"). The written file or
+    folder is swapped in for the previous one, whatever its layout, and replaces its part files.
+    """
+    tmp_path = file_path.with_name(f"{file_path.stem}.{os.getpid()}.tmp{file_path.suffix}")
+    if partition is None:
+        _write_file(df, tmp_path)
+    else:
+        tmp_path.mkdir()
+        periods = df["date"].dt.to_period(PARTITIONS[partition]).astype(str)
+        for period, part in df.groupby(periods, sort=True):
+            _write_file(part, tmp_path.joinpath(period + file_path.suffix))
+
+    parts = part_files(file_path)
+    if file_path.is_dir() or (file_path.exists() and partition is not None):
+        # os.replace cannot swap a folder in for a file, nor replace a folder that is not empty
+        old_path = file_path.with_name(f"{file_path.stem}.{os.getpid()}.old{file_path.suffix}")
+        os.replace(file_path, old_path)
+        os.replace(tmp_path, file_path)
+        shutil.rmtree(old_path) if old_path.is_dir() else old_path.unlink()
+    else:
+        os.replace(tmp_path, file_path)
+
+    # Only once the rows of the parts are in the new file: readers that still see both drop the duplicates (see _read_file)
+    for path in parts:
+        path.unlink(missing_ok=True)
+
+
+def read_column_names(file_path: Path) -> List[str]:
+    """
+    Columns of a master db file, without reading its rows.
+    """
+    if file_path.is_dir():
+        return read_column_names(partition_files(file_path)[-1])
+    if file_path.suffix == EXTENSIONS["parquet"]:
+        return pq.read_schema(file_path).names
+    return pd.read_csv(file_path, nrows=0).columns.str.strip().tolist()
+
+
+def last_date(file_path: Path) -> Optional[pd.Timestamp]:
+    """
+    Date of the last row of a master db file (sorted by date), None if it has no rows. Only the statistics of
+    the last Parquet row group (of the last part), or the last line of a CSV file, are read (of the last partition).
+    """
+    if file_path.is_dir():
+        files = partition_files(file_path)
+        return last_date(files[-1]) if files else None
+
+    if file_path.suffix == EXTENSIONS["parquet"]:
+        parts = part_files(file_path)
+        if parts:
+            file_path = parts[-1]
+        metadata = pq.ParquetFile(file_path).metadata
+        if metadata.num_rows == 0:
+            return None
+        statistics = metadata.row_group(metadata.num_row_groups - 1).column(read_column_names(file_path).index("date")).statistics
+        if statistics is not None and statistics.has_min_max:
+            return pd.Timestamp(statistics.max)
+        return pd.Timestamp(pq.read_table(file_path, columns=["date"])["date"].to_pandas().max())
+
+    with open(file_path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 4096))
+        lines = f.read().splitlines()
+    if len(lines) < 2:  # header only
+        return None
+    date_position = read_column_names(file_path).index("date")
+    return pd.Timestamp(lines[-1].decode().split(",")[date_position])
+
+
+def append_ohlcv(df: pd.DataFrame, file_path: Path) -> None:
+    """
+    Appends rows later than the last stored one, with the columns of the file, to a master db file, without
+    rewriting the stored rows. CSV files are appended in place. A Parquet file cannot be reopened for
+    writing: the rows are written as a new part file next to it (see part_files), and beyond
+    PARQUET_MAX_PARTS the parts (never the file itself) are merged into one.
+    A partitioned master db only appends to its last partition, and writes the partitions of new periods.
+    """
+    df = df[read_column_names(file_path)]
+    if not file_path.is_dir():
+        _append_file(df, file_path)
+        return
+
+    last_partition = partition_files(file_path)[-1]
+    periods = df["date"].dt.to_period(pd.Period(last_partition.stem).freq).astype(str)
+    for period, part in df.groupby(periods, sort=True):
+        partition_path = file_path.joinpath(period + file_path.suffix)
+        if partition_path.exists():
+            _append_file(part, partition_path)
+        else:
+            _write_file(part, partition_path)
+
+
+def data_version(file_path: Path) -> List[Any]:
+    """
+    Name, size and modification time of a master db file (of each partition and part), changed by every write.
+    """
+    files = partition_files(file_path) if file_path.is_dir() else [file_path]
+    files = [path for base_path in files for path in [base_path] + part_files(base_path)]
+    return [(path.name, path.stat().st_size, path.stat().st_mtime_ns) for path in files]
+
+
+def estimated_memory(file_path: Path, columns: Optional[List[str]] = None) -> int:
+    """
+    Estimated memory (bytes) of the whole history of a master db file read with read_ohlcv, without reading
+    its rows: 8 bytes per value of the rows counted in the Parquet footers, the size on disk of a CSV file.
+    """
+    files = partition_files(file_path) if file_path.is_dir() else [file_path]
+    files = [path for base_path in files for path in [base_path] + part_files(base_path)]
+    if file_path.suffix != EXTENSIONS["parquet"]:
+        return sum(path.stat().st_size for path in files)
+    rows = sum(pq.ParquetFile(path).metadata.num_rows for path in files)
+    values_per_row = len(set(columns) | {"date"}) if columns is not None else len(read_column_names(file_path))
+    return rows * values_per_row * 8
+
+
+def _read_file(file_path: Path, columns: Optional[List[str]], start_date: Optional[str],
+               end_date: Optional[str]) -> pd.DataFrame:
+    if file_path.suffix == EXTENSIONS["parquet"]:
+        filters = []
+        if start_date:
+            filters.append(("date", ">=", pd.Timestamp(start_date)))
+        if end_date:
+            filters.append(("date", "<=", pd.Timestamp(end_date)))
+        parts = part_files(file_path)
+        df = pd.read_parquet(file_path, columns=columns, filters=filters or None)
+        if not parts:
+            return df
+        df = pd.concat([df] + [pd.read_parquet(path, columns=columns, filters=filters or None) for path in parts], ignore_index=True)
+        # Rows also in the file or in an earlier part were seen during a rewrite or a merge of the parts
+        return df.drop_duplicates(subset="date", keep="first", ignore_index=True)
+
+    df = pd.read_csv(file_path, usecols=columns, parse_dates=['date'])
+    df.columns = df.columns.str.strip()
+    for column in DATE_COLUMNS[1:]:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce', format='mixed')
+    if start_date:
+        df = df[df['date'] >= pd.to_datetime(start_date)]
+    if end_date:
+        df = df[df['date'] <= pd.to_datetime(end_date)]
+    return df
+
+
+def _read_partitions(folder: Path, columns: Optional[List[str]], start_date: Optional[str],
+                     end_date: Optional[str]) -> pd.DataFrame:
+    start = pd.Timestamp(start_date) if start_date else None
+    end = pd.Timestamp(end_date) if end_date else None
+    files = partition_files(folder)
+    selected = [
+        path for path in files
+        if (start is None or pd.Period(path.stem).end_time >= start) and (end is None or pd.Period(path.stem).start_time <= end)
+    ]
+    frames = [_read_file(path, columns, None, None) for path in selected] or [_read_file(files[-1], columns, None, None).iloc[:0]]
+    df = pd.concat(frames, ignore_index=True)
+
+    # The partitions are sorted: the bounds of the range are found by binary search
+    dates = df["date"].to_numpy()
+    first = np.searchsorted(dates, start.to_datetime64(), side="left") if start is not None else 0
+    last = np.searchsorted(dates, end.to_datetime64(), side="right") if end is not None else len(df)
+    return df.iloc[first:last].reset_index(drop=True)
+
+
+def _write_file(df: pd.DataFrame, file_path: Path) -> None:
+    if file_path.suffix == EXTENSIONS["parquet"]:
+        df.to_parquet(file_path, index=False, compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    else:
+        df.to_csv(file_path, index=False)
+
+
+def _append_file(df: pd.DataFrame, file_path: Path) -> None:
+    if file_path.suffix == EXTENSIONS["parquet"]:
+        schema = pq.read_schema(file_path)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        parts = part_files(file_path)
+        merged = parts if len(parts) >= PARQUET_MAX_PARTS else []
+        if merged:
+            table = pa.concat_tables([pq.read_table(path, schema=schema) for path in merged] + [table])
+        number = int(parts[-1].suffixes[-2][len(".part"):]) + 1 if parts else 1
+        tmp_path = file_path.with_name(f"{file_path.stem}.{os.getpid()}.append.tmp{file_path.suffix}")
+        pq.write_table(table, tmp_path, compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        os.replace(tmp_path, file_path.with_name(f"{file_path.stem}.part{number:06d}{file_path.suffix}"))
+        for path in merged:
+            path.unlink(missing_ok=True)
+    else:
+        df.to_csv(file_path, mode="a", header=False, index=False)
+
+
+def convert_csv_tree(root: Path, remove_csv: bool = False) -> List[Path]:
+    """
+    One-shot conversion of the CSV files of the data tree (<timeframe>/*.csv and <exchange>/<timeframe>/*.csv)
+    to Parquet files next to them, with the raw OHLCV only (the derived columns of older files are dropped,
+    see feature_store). Returns the written files.
+    """
+    written = []
+    for csv_path in sorted(Path(root).rglob("*" + EXTENSIONS["csv"])):
+        # Neither the files of the root nor the feature cache (see feature_store) are OHLCV files,
+        # partitioned master dbs are converted with their DataManager (see DataManager.convert_master_db)
+        if csv_path.parent == Path(root) or "features" in csv_path.relative_to(root).parts or csv_path.is_dir() \
+                or csv_path.parent.suffix == EXTENSIONS["csv"]:
+            continue
+        df = read_ohlcv(csv_path, list(OHLCV_COLUMNS))
+        df = df[df["date"].notna()].sort_values("date", kind="stable")
+        parquet_path = csv_path.with_suffix(EXTENSIONS["parquet"])
+        write_ohlcv(df, parquet_path)
+        written.append(parquet_path)
+        print(f"Converted {csv_path.name} ({len(df)} rows) to {parquet_path.name}")
+        if remove_csv:
+            csv_path.unlink()
+    return written
+
+
+def write_ohlcv_arrays(df: pd.DataFrame, folder: Path, version: Optional[List[Any]] = None) -> None:
+    """
+    Writes the OHLCV of a DataFrame indexed by date as time.<stamp>.npy (int64 ns since epoch) and
+    values.<stamp>.npy (float64, one row per column of ARRAY_COLUMNS), then points the manifest of the folder
+    (ARRAYS_MANIFEST) to them with a single atomic swap: readers always map the time and values of the same
+    export. version (the data_version of the exported master db) is kept in the manifest, see arrays_version.
+    The exports older than the previous one are removed.
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    manifest_path = folder.joinpath(ARRAYS_MANIFEST)
+    previous = _read_arrays_manifest(folder)
+    stamp = f"{time.time_ns()}-{os.getpid()}"
+    np.save(folder.joinpath(f"time.{stamp}.npy"), df.index.asi8.astype(np.int64))
+    np.save(folder.joinpath(f"values.{stamp}.npy"), np.ascontiguousarray(df[list(ARRAY_COLUMNS)].to_numpy(dtype=np.float64).T))
+
+    tmp_path = folder.joinpath(f"{ARRAYS_MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump({"stamp": stamp, "version": json.dumps(version)}, file)
+    os.replace(tmp_path, manifest_path)
+
+    # A reader may still be opening the previous export
+    kept = {stamp, previous["stamp"] if previous else None}
+    for path in list(folder.glob("time.*.npy")) + list(folder.glob("values.*.npy")) + [folder.joinpath("time.npy"), folder.joinpath("values.npy")]:
+        if path.name.split(".")[1] not in kept:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:  # still mapped (Windows), removed by a later export
+                pass
+
+
+def arrays_version(folder: Path) -> Optional[str]:
+    """
+    Version of the master db the arrays of folder were exported from (as JSON), None when there are none.
+    """
+    manifest = _read_arrays_manifest(folder)
+    return manifest["version"] if manifest else None
+
+
+def _read_arrays_manifest(folder: Path) -> Optional[dict]:
+    try:
+        with open(folder.joinpath(ARRAYS_MANIFEST), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def open_ohlcv_arrays(folder: Path, start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    OHLCV DataFrame (indexed by date) between start_date and end_date, backed by read-only memory maps of
+    the arrays: nothing is copied, and the processes that open the same arrays share one page-cache copy.
+    """
+    manifest = _read_arrays_manifest(folder)
+    if manifest is None:
+        raise FileNotFoundError(f"No arrays found at {folder}. Please run .export_arrays() first.")
+    times = np.load(folder.joinpath(f"time.{manifest['stamp']}.npy"), mmap_mode="r")
+    values = np.load(folder.joinpath(f"values.{manifest['stamp']}.npy"), mmap_mode="r")
+
+    start = np.searchsorted(times, pd.Timestamp(start_date).value) if start_date else 0
+    stop = np.searchsorted(times, pd.Timestamp(end_date).value, side="right") if end_date else len(times)
+    index = pd.DatetimeIndex(times[start:stop].view("datetime64[ns]"), name="date", copy=False)
+    return pd.DataFrame(values[:, start:stop].T, index=index, columns=list(ARRAY_COLUMNS), copy=False)
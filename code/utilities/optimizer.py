@@ -0,0 +1,220 @@
+import os
+import sys
+import tempfile
+import itertools
+import importlib
+import pandas as pd
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append('./config')
+import config
+
+from utilities import ohlcv_store
+from utilities.backtest_analysis import BacktestAnalysis
+
+# Scenario attributes given to run_backtest rather than to the strategy
+EXECUTION_KEYS = ("initial_balance", "leverage", "open_fee_rate", "close_fee_rate")
+
+# BacktestAnalysis attributes reported for each combination
+METRICS = (
+    "final_balance",
+    "roi",
+    "hodl_pct",
+    "performance_vs_hodl",
+    "total_trades",
+    "global_win_rate",
+    "max_drawdown_trades",
+    "max_drawdown_equity",
+    "profit_factor",
+    "return_over_max_drawdown",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "calmar_ratio",
+    "avg_pnl_pct",
+    "mean_trades_per_day",
+    "time_in_position_ratio",
+    "total_fee",
+)
+
+# OHLCV of the worker process, loaded once by _init_worker
+_worker_ohlcv = None
+
+
+def parameter_grid(param_ranges: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Every combination of the parameter ranges, e.g. {"average_period": [5, 10], "envelopes": [[0.05], [0.05, 0.1]]}.
+    """
+    keys = list(param_ranges)
+    return [dict(zip(keys, values)) for values in itertools.product(*param_ranges.values())]
+
+
+def default_engine(strategy) -> str:
+    return "vectorized" if "vectorized" in strategy.valid_engines else "events"
+
+
+def split_combination(scenario, combination: Dict[str, Any]):
+    """
+    (strategy_params, execution) of the scenario with the values of the combination applied.
+    """
+    strategy_params = dict(scenario.strategy_params)
+    execution = {key: getattr(scenario, key) for key in EXECUTION_KEYS}
+    for key, value in combination.items():
+        if key in EXECUTION_KEYS:
+            execution[key] = value
+        else:
+            strategy_params[key] = value
+    return strategy_params, execution
+
+
+def build_strategy(strategy_name: str, strategy_params: Dict[str, Any], ohlcv: pd.DataFrame):
+    strat = importlib.import_module(f"strategies.{strategy_name}")
+    return strat.Strategy(dict(strategy_params), ohlcv)
+
+
+def run_execution(
+        strategy,
+        execution: Dict[str, float],
+        engine: Optional[str] = None,
+        pruning: Optional[Dict[str, float]] = None,
+) -> None:
+    """
+    Backtests the strategy, pruning is given to run_backtest (max_drawdown, min_equity).
+    A liquidation always ends the backtest with the "liquidated" status rather than the process.
+    """
+    strategy.run_backtest(
+        initial_balance=execution["initial_balance"],
+        leverage=execution["leverage"],
+        open_fee_rate=execution["open_fee_rate"],
+        close_fee_rate=execution["close_fee_rate"],
+        engine=engine or default_engine(strategy),
+        prune_liquidation=True,
+        **(pruning or {}),
+    )
+
+
+def run_combination(
+        strategy_name: str,
+        strategy_params: Dict[str, Any],
+        execution: Dict[str, float],
+        ohlcv: pd.DataFrame,
+        engine: Optional[str] = None,
+        pruning: Optional[Dict[str, float]] = None,
+):
+    strategy = build_strategy(strategy_name, strategy_params, ohlcv)
+    run_execution(strategy, execution, engine, pruning)
+    return strategy
+
+
+def analysis_metrics(strategy) -> Dict[str, Any]:
+    """
+    METRICS of the BacktestAnalysis of a backtested strategy.
+    """
+    analysis = BacktestAnalysis(strategy)
+    metrics = {metric: getattr(analysis, metric) for metric in METRICS}
+    metrics["status"] = strategy.status
+    return metrics
+
+
+def _init_worker(ohlcv, exchange_name, symbol, timeframe, start_date, end_date, memmap=False, arrays_folder=None) -> None:
+    global _worker_ohlcv
+    if arrays_folder is not None:
+        ohlcv = ohlcv_store.open_ohlcv_arrays(Path(arrays_folder))
+    elif ohlcv is None:
+        from utilities.data_manager import DataManager
+        data_manager = DataManager(exchange_name)
+        if memmap:
+            ohlcv = data_manager.load_arrays(symbol, timeframe, start_date, end_date)
+        else:
+            ohlcv = data_manager.load(symbol, timeframe, start_date, end_date)
+    _worker_ohlcv = ohlcv
+
+
+@contextmanager
+def worker_pool(
+        max_workers: int,
+        ohlcv: Optional[pd.DataFrame],
+        exchange_name: str,
+        symbol: Optional[str],
+        timeframe: Optional[str],
+        start_date: Optional[str],
+        end_date: Optional[str],
+        memmap: bool = False,
+):
+    """
+    ProcessPoolExecutor whose workers hold the OHLCV in _worker_ohlcv, loaded once per worker.
+    With memmap, the workers map the OHLCV arrays (DataManager.load_arrays, or a temporary copy of the
+    OHLCV columns of the given ohlcv) and share one page-cache copy instead of a pickled frame each.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        initargs = (ohlcv, exchange_name, symbol, timeframe, start_date, end_date, memmap)
+        if memmap and ohlcv is not None:
+            ohlcv_store.write_ohlcv_arrays(ohlcv, Path(tmp_dir))
+            initargs = (None, exchange_name, symbol, timeframe, start_date, end_date, memmap, tmp_dir)
+        elif memmap:
+            from utilities.data_manager import DataManager
+            DataManager(exchange_name).load_arrays(symbol, timeframe)  # exports the arrays once, before the workers map them
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=initargs) as executor:
+            yield executor
+
+
+def _evaluate(task) -> Dict[str, Any]:
+    strategy_name, combination, strategy_params, execution, engine, pruning = task
+    result = dict(combination)
+    try:
+        strategy = run_combination(strategy_name, strategy_params, execution, _worker_ohlcv, engine, pruning)
+        result.update(analysis_metrics(strategy))
+        result["error"] = None
+    except (Exception, SystemExit) as e:  # a failed combination must not stop the sweep
+        result["status"] = None
+        result["error"] = repr(e)
+    return result
+
+
+def optimize(
+        scenario,
+        param_ranges: Dict[str, List[Any]],
+        symbol: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        exchange_name: str = config.EXCHANGE_NAME,
+        ohlcv: Optional[pd.DataFrame] = None,
+        sort_by: str = "sharpe_ratio",
+        max_workers: Optional[int] = None,
+        engine: Optional[str] = None,
+        pruning: Optional[Dict[str, float]] = None,
+        memmap: bool = False,
+) -> pd.DataFrame:
+    """
+    Backtests every combination of param_ranges on top of the scenario, across a pool of processes.
+
+    param_ranges may hold strategy parameters (average_type, average_period, envelopes, stop_loss_pct,
+    fast_ma, slow_ma, signal_ma, ...) as well as execution ones (leverage, fee rates, initial_balance).
+    Each worker loads the OHLCV once, with DataManager(exchange_name).load(...) or from the given ohlcv,
+    or maps the shared OHLCV arrays with memmap (see worker_pool).
+    pruning, e.g. {"max_drawdown": 0.5, "min_equity": 200}, ends hopeless backtests early (see BacktestEngine).
+    Returns one row per combination with its BacktestAnalysis metrics and status, ranked by sort_by
+    after the combinations that ran to the last bar.
+    """
+    if ohlcv is None and symbol is None:
+        raise ValueError("Either give the ohlcv or the symbol/timeframe to load it from.")
+
+    tasks = []
+    for combination in parameter_grid(param_ranges):
+        strategy_params, execution = split_combination(scenario, combination)
+        tasks.append((scenario.strategy_name, combination, strategy_params, execution, engine, pruning))
+
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (max_workers * 4))
+    with worker_pool(max_workers, ohlcv, exchange_name, symbol, timeframe, start_date, end_date, memmap) as executor:
+        results = list(executor.map(_evaluate, tasks, chunksize=chunksize))
+
+    results = pd.DataFrame(results)
+    if sort_by in results.columns:
+        results = results.sort_values(sort_by, ascending=False, na_position="last")
+        results = results.sort_values("status", key=lambda status: status.ne("completed"), kind="stable")
+    return results.reset_index(drop=True)
@@ -7,6 +7,7 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from utilities.bitget_futures import BitgetFutures
+from utilities import market_cache
 
 
 # --- CONFIG ---
@@ -213,6 +214,8 @@ balance = params['balance_fraction'] * params['leverage'] * bitget.fetch_balance
 print(f"{datetime.now().strftime('%H:%M:%S')}: the trading balance is {balance}")
 
 # --- PLACE ORDERS DEPENDING ON HOW MANY BANDS HAVE ALREADY BEEN HIT ---
+markets = market_cache.load_markets('bitget', bitget.session.load_markets)  # from the shared market cache, see config.MARKETS_TTL
+min_amount = market_cache.min_amount(markets, params['symbol'])
 if open_position:
     long_ok = True if 'long' == position['side'] else False
     short_ok = True if 'short' == position['side'] else False
@@ -235,7 +238,6 @@ if long_ok:
         entry_limit_price = data[f'band_low_{i + 1}'].iloc[-1]
         entry_trigger_price = (1 + trigger_price_delta) * entry_limit_price
         amount = balance / len(params['envelopes']) / entry_limit_price
-        min_amount = bitget.fetch_min_amount_tradable(params['symbol'])
         if amount >= min_amount:
             # entry           
             bitget.place_trigger_limit_order(
@@ -276,7 +278,6 @@ if short_ok:
         entry_limit_price = data[f'band_high_{i + 1}'].iloc[-1]
         entry_trigger_price = (1 - trigger_price_delta) * entry_limit_price
         amount = balance / len(params['envelopes']) / entry_limit_price
-        min_amount = bitget.fetch_min_amount_tradable(params['symbol'])
         if amount >= min_amount:
             # entry     
             bitget.place_trigger_limit_order(
@@ -0,0 +1,194 @@
+import time
+import asyncio
+import threading
+import ccxt
+from typing import Any, Dict, List, Optional
+
+import sys
+sys.path.append('./config')
+import config
+
+# Largest page size the controller probes for, when the exchange keeps returning full pages
+MAX_PAGE_SIZE = 10_000
+# Full pages in a row before the page size is doubled
+FULL_PAGES_BEFORE_GROWTH = 3
+# Fraction of the request weight limit of the exchange above which the request rate is cut
+WEIGHT_THRESHOLD = 0.8
+# The rate does not grow while the latency is this many times above the fastest one seen (the exchange is struggling)
+LATENCY_SLOWDOWN = 4.0
+
+THROTTLING_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection)
+
+
+class ThroughputController:
+    """
+    Adaptive pacing and page size of the OHLCV requests to an exchange, shared by all its downloads (sync and
+    async, see get_controller).
+
+    The request rate starts at the rate limit of ccxt (1000 / exchange.rateLimit), grows additively after each
+    successful request up to max_rate, and is halved (at most once per second) on a throttling response
+    (429/418, ccxt.RateLimitExceeded or DDoSProtection) or when the request weight reported by the exchange
+    nears its weight_limit. Throttled and failed requests are retried with an exponential backoff and raise
+    after max_retries, they never end a download early.
+
+    The page size starts at the limit_size_request of the exchange, is doubled after full pages up to
+    MAX_PAGE_SIZE, and is capped to the size of the pages the exchange actually returns (a page shorter than
+    requested that ends before now) or halved when the exchange rejects it.
+    """
+
+    def __init__(self, exchange_name: str, rate: Optional[float] = None, max_rate: Optional[float] = None,
+                 page_size: Optional[int] = None, weight_header: Optional[str] = None,
+                 weight_limit: Optional[float] = None, max_retries: int = 8, backoff: float = 1.0) -> None:
+        settings = config.EXCHANGES[exchange_name]
+        self.exchange_name = exchange_name
+        self.rate = rate or 1000 / settings["exchange_object"].rateLimit
+        self.min_rate = self.rate / 64
+        self.max_rate = max_rate or settings.get("max_requests_per_second", self.rate * 4)
+        self.rate_step = self.rate / 20
+        self.page_size = page_size or settings["limit_size_request"]
+        self.configured_page_size = self.page_size
+        self.max_page_size = MAX_PAGE_SIZE
+        self.weight_header = (weight_header or settings.get("weight_header", "")).lower()
+        self.weight_limit = weight_limit or settings.get("weight_limit")
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.requests = 0
+        self.rows = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency = None
+        self.min_latency = None
+        self.weight = None
+        self._full_pages = 0
+        self._last_cut = 0.0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def fetch_ohlcv(self, exchange, symbol: str, timeframe: str, since: int) -> List[List[Any]]:
+        for attempt in range(self.max_retries + 1):
+            limit = self._before_request(exchange)
+            started = time.monotonic()
+            try:
+                ohlcv = exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, since=since, limit=limit)
+            except ccxt.BaseError as e:
+                time.sleep(self._on_error(e, attempt, limit, exchange))
+                continue
+            self._on_success(ohlcv, limit, time.monotonic() - started, exchange, timeframe)
+            return ohlcv
+
+    async def fetch_ohlcv_async(self, exchange, symbol: str, timeframe: str, since: int) -> List[List[Any]]:
+        for attempt in range(self.max_retries + 1):
+            limit = self._before_request(exchange)
+            started = time.monotonic()
+            try:
+                ohlcv = await exchange.fetch_ohlcv(symbol=symbol, timeframe=timeframe, since=since, limit=limit)
+            except ccxt.BaseError as e:
+                await asyncio.sleep(self._on_error(e, attempt, limit, exchange))
+                continue
+            self._on_success(ohlcv, limit, time.monotonic() - started, exchange, timeframe)
+            return ohlcv
+
+    def metrics(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        return {
+            "exchange": self.exchange_name,
+            "requests": self.requests,
+            "rows": self.rows,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "requests_per_second": self.requests / elapsed if elapsed else 0.0,
+            "rows_per_second": self.rows / elapsed if elapsed else 0.0,
+            "latency": self.latency,
+            "rate": self.rate,
+            "page_size": self.page_size,
+            "weight": self.weight,
+        }
+
+    def _before_request(self, exchange) -> int:
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+            # ccxt paces the requests of the exchange object (sync) or of its throttler (async)
+            exchange.rateLimit = 1000 / self.rate
+            if hasattr(exchange, "throttle") and hasattr(exchange.throttle, "config"):
+                exchange.throttle.config["refillRate"] = self.rate / 1000
+            return self.page_size
+
+    def _on_success(self, ohlcv: List[List[Any]], limit: int, latency: float, exchange, timeframe: str) -> None:
+        with self._lock:
+            self.requests += 1
+            self.rows += len(ohlcv)
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+
+            self.weight = self._used_weight(exchange)
+            if self.weight is not None and self.weight >= WEIGHT_THRESHOLD * self.weight_limit:
+                self._cut_rate()
+            elif self.latency < LATENCY_SLOWDOWN * self.min_latency:
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+            # A short page that ends well before now: there were more bars, the exchange caps its pages
+            if 0 < len(ohlcv) < limit and ohlcv[-1][0] + 2 * exchange.parse_timeframe(timeframe) * 1000 < exchange.milliseconds():
+                self.page_size = self.max_page_size = len(ohlcv)
+
+            self._full_pages = self._full_pages + 1 if len(ohlcv) >= limit else 0
+            if self._full_pages >= FULL_PAGES_BEFORE_GROWTH and self.page_size < self.max_page_size:
+                self.page_size = min(self.max_page_size, self.page_size * 2)
+                self._full_pages = 0
+
+    def _on_error(self, error: Exception, attempt: int, limit: int, exchange) -> float:
+        """
+        Seconds to wait before retrying the request that raised error, raises it once there are no retries left.
+        """
+        with self._lock:
+            self.errors += 1
+            if isinstance(error, ccxt.BadRequest) and limit > self.configured_page_size:
+                # The probed page size is too large for the exchange: go back below it for good
+                self.page_size = self.max_page_size = max(self.configured_page_size, limit // 2)
+            elif isinstance(error, THROTTLING_ERRORS):
+                self.throttled += 1
+                self._cut_rate()
+            elif not isinstance(error, ccxt.NetworkError):
+                raise error
+            if attempt >= self.max_retries:
+                raise error
+
+            retry_after = self._header(exchange, "retry-after")
+            try:
+                return float(retry_after)
+            except (TypeError, ValueError):
+                return min(60.0, self.backoff * 2 ** attempt)
+
+    def _cut_rate(self) -> None:
+        now = time.monotonic()
+        if now - self._last_cut >= 1.0:  # the requests in flight when throttled only count once
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._last_cut = now
+
+    def _used_weight(self, exchange) -> Optional[float]:
+        if not self.weight_header or not self.weight_limit:
+            return None
+        try:
+            return float(self._header(exchange, self.weight_header))
+        except (TypeError, ValueError):
+            return None
+
+    def _header(self, exchange, name: str) -> Optional[str]:
+        headers = getattr(exchange, "last_response_headers", None) or {}
+        for key, value in headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+
+_controllers = {}
+
+
+def get_controller(exchange_name: str) -> ThroughputController:
+    """
+    The ThroughputController of an exchange, shared by all the DataManager of the exchange.
+    """
+    if exchange_name not in _controllers:
+        _controllers[exchange_name] = ThroughputController(exchange_name)
+    return _controllers[exchange_name]
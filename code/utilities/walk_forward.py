@@ -0,0 +1,221 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+sys.path.append('./config')
+import config
+
+from utilities import optimizer
+
+
+def walk_forward_windows(
+        index: pd.DatetimeIndex,
+        train_period: str,
+        test_period: str,
+        step: Optional[str] = None,
+        anchored: bool = False,
+) -> List[tuple]:
+    """
+    (train_start, train_end, test_start, test_end) index labels of the walk-forward folds, both ends included.
+
+    The in-sample window covers train_period and is followed by test_period of out-of-sample bars.
+    Folds move forward by step (test_period by default). With anchored, every in-sample window starts
+    at the first bar instead of rolling.
+    """
+    train_period = pd.Timedelta(train_period)
+    test_period = pd.Timedelta(test_period)
+    step = pd.Timedelta(step) if step is not None else test_period
+    if step <= pd.Timedelta(0):
+        raise ValueError("The walk-forward step must be positive.")
+
+    windows = []
+    origin = index[0]
+    while True:
+        train_start = index[0] if anchored else origin
+        test_start = origin + train_period
+        first_test_bar = index.searchsorted(test_start)
+        if first_test_bar == len(index):
+            break
+        first_train_bar = index.searchsorted(train_start)
+        last_test_bar = index.searchsorted(test_start + test_period) - 1
+        windows.append((index[first_train_bar], index[first_test_bar - 1], index[first_test_bar], index[last_test_bar]))
+        origin += step
+    return windows
+
+
+def stitch_equity_records(equity_records: List[pd.DataFrame], initial_balances: List[float]) -> pd.DataFrame:
+    """
+    Chains the equity records of consecutive out-of-sample windows, backtested from their initial_balances:
+    a window is scaled so that it starts from the final equity of the previous one.
+    """
+    parts = []
+    balance = initial_balances[0]
+    for equity_record, initial_balance in zip(equity_records, initial_balances):
+        part = equity_record.copy()
+        part["equity"] = part["equity"] * balance / initial_balance
+        balance = part["equity"].iloc[-1]
+        parts.append(part)
+    return pd.concat(parts)
+
+
+def _run_windows(strategy, execution, engine, pruning, windows) -> List[Dict[str, Any]]:
+    results = []
+    for start, end in windows:
+        try:
+            window = strategy.window(start, end)
+            optimizer.run_execution(window, execution, engine, pruning)
+            result = optimizer.analysis_metrics(window)
+            result["error"] = None
+        except (Exception, SystemExit) as e:  # a failed window must not stop the walk-forward
+            result = {"status": None, "error": repr(e)}
+        results.append(result)
+    return results
+
+
+def _evaluate_in_sample(task) -> List[Dict[str, Any]]:
+    strategy_name, combination_id, combination, strategy_params, execution, engine, pruning, windows = task
+    try:
+        # Indicators are computed once over the whole history and shared by every in-sample window
+        strategy = optimizer.build_strategy(strategy_name, strategy_params, optimizer._worker_ohlcv)
+        results = _run_windows(strategy, execution, engine, pruning, windows)
+    except (Exception, SystemExit) as e:
+        results = [{"status": None, "error": repr(e)}] * len(windows)
+    return [dict(combination, combination_id=combination_id, fold=fold, **result) for fold, result in enumerate(results)]
+
+
+def _evaluate_out_of_sample(task) -> Dict[str, Any]:
+    strategy_name, fold, strategy_params, execution, engine, start, end = task
+    result = {"fold": fold, "initial_balance": execution["initial_balance"]}
+    try:
+        strategy = optimizer.build_strategy(strategy_name, strategy_params, optimizer._worker_ohlcv)
+        window = strategy.window(start, end)
+        optimizer.run_execution(window, execution, engine)
+        result["trades_info"] = window.trades_info
+        result["equity_record"] = window.equity_record
+        result.update(optimizer.analysis_metrics(window))
+        result["error"] = None
+    except (Exception, SystemExit) as e:
+        result["status"] = None
+        result["error"] = repr(e)
+    return result
+
+
+def walk_forward(
+        scenario,
+        param_ranges: Dict[str, List[Any]],
+        train_period: str,
+        test_period: str,
+        step: Optional[str] = None,
+        anchored: bool = False,
+        symbol: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        exchange_name: str = config.EXCHANGE_NAME,
+        ohlcv: Optional[pd.DataFrame] = None,
+        sort_by: str = "sharpe_ratio",
+        max_workers: Optional[int] = None,
+        engine: Optional[str] = None,
+        pruning: Optional[Dict[str, float]] = None,
+        memmap: bool = False,
+) -> SimpleNamespace:
+    """
+    Walk-forward optimization of the scenario over param_ranges (see optimizer.optimize).
+
+    Every combination is backtested on the in-sample window of every fold (see walk_forward_windows),
+    the best one by sort_by is then backtested on the out-of-sample window that follows. Only the
+    in-sample runs that reach the end of their window are candidates, pruning (see optimizer.optimize)
+    ends the others early. With memmap, the workers share the OHLCV arrays (see optimizer.worker_pool).
+    Each pool task builds its strategy once over the whole history and backtests the windows with
+    strategy.window, so the indicators are shared by all the overlapping windows of a combination.
+
+    Returns:
+        folds: one row per fold with its windows, the chosen combination, its in-sample score
+            and its out-of-sample metrics.
+        in_sample: the in-sample metrics of every combination on every fold.
+        trades_info, equity_record, final_equity, data: the out-of-sample results, stitched together,
+            that can be given to BacktestAnalysis.
+    """
+    if ohlcv is None and symbol is None:
+        raise ValueError("Either give the ohlcv or the symbol/timeframe to load it from.")
+
+    if ohlcv is None:
+        from utilities.data_manager import DataManager
+        if memmap:
+            ohlcv = DataManager(exchange_name).load_arrays(symbol, timeframe, start_date, end_date)
+        else:
+            ohlcv = DataManager(exchange_name).load(symbol, timeframe, start_date, end_date)
+        worker_ohlcv = None
+    else:
+        worker_ohlcv = ohlcv
+
+    windows = walk_forward_windows(ohlcv.index, train_period, test_period, step, anchored)
+    if not windows:
+        raise ValueError("The data is too short for a single walk-forward fold.")
+    train_windows = [(train_start, train_end) for train_start, train_end, _, _ in windows]
+
+    combinations = optimizer.parameter_grid(param_ranges)
+    tasks = []
+    for combination_id, combination in enumerate(combinations):
+        strategy_params, execution = optimizer.split_combination(scenario, combination)
+        tasks.append((scenario.strategy_name, combination_id, combination, strategy_params, execution, engine, pruning, train_windows))
+
+    max_workers = max_workers or os.cpu_count()
+    with optimizer.worker_pool(max_workers, worker_ohlcv, exchange_name, symbol, timeframe, start_date, end_date, memmap) as executor:
+        chunksize = max(1, len(tasks) // (max_workers * 4))
+        in_sample = pd.DataFrame([row for rows in executor.map(_evaluate_in_sample, tasks, chunksize=chunksize) for row in rows])
+
+        folds = []
+        out_of_sample_tasks = []
+        for fold, (train_start, train_end, test_start, test_end) in enumerate(windows):
+            candidates = in_sample.loc[(in_sample["fold"] == fold) & in_sample["error"].isna() & in_sample["status"].eq("completed")]
+            if sort_by in candidates.columns:
+                candidates = candidates.loc[np.isfinite(candidates[sort_by].astype(float))]
+            row = {"fold": fold, "train_start": train_start, "train_end": train_end, "test_start": test_start, "test_end": test_end}
+            if candidates.empty:
+                row["combination"] = None
+                folds.append(row)
+                continue
+
+            best = candidates[sort_by].astype(float).idxmax()
+            combination = combinations[candidates.loc[best, "combination_id"]]
+            row["combination"] = combination
+            row[f"in_sample_{sort_by}"] = candidates.loc[best, sort_by]
+            folds.append(row)
+
+            strategy_params, execution = optimizer.split_combination(scenario, combination)
+            out_of_sample_tasks.append((scenario.strategy_name, fold, strategy_params, execution, engine, test_start, test_end))
+
+        out_of_sample = list(executor.map(_evaluate_out_of_sample, out_of_sample_tasks))
+
+    folds = pd.DataFrame(folds).set_index("fold")
+    for result in out_of_sample:
+        for metric in optimizer.METRICS + ("status", "error"):
+            if metric in result:
+                folds.loc[result["fold"], metric] = result[metric]
+    folds = folds.reset_index()
+
+    out_of_sample = sorted((result for result in out_of_sample if result["error"] is None), key=lambda result: result["fold"])
+    if not out_of_sample:
+        raise ValueError("No walk-forward fold could be backtested out of sample.")
+
+    trades_info = pd.concat(
+        [result["trades_info"].assign(fold=result["fold"]) for result in out_of_sample],
+        ignore_index=True,
+    )
+    equity_record = stitch_equity_records(
+        [result["equity_record"] for result in out_of_sample],
+        [result["initial_balance"] for result in out_of_sample],
+    )
+
+    return SimpleNamespace(
+        folds=folds,
+        in_sample=in_sample,
+        data=ohlcv.loc[equity_record.index[0]:equity_record.index[-1]],
+        trades_info=trades_info,
+        equity_record=equity_record,
+        final_equity=round(equity_record.iloc[-1]["equity"], 2),
+    )